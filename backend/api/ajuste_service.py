@@ -0,0 +1,204 @@
+"""
+Ajuste masivo de existencias.
+
+Aplica en una sola transacción una lista de ajustes
+``{id | producto_codigo, cantidad | delta}`` (p. ej. la sincronización de
+stock del ERP):
+
+- las filas se resuelven con una consulta por lote (por ``id`` de
+  Inventario o por código de producto) y se bloquean en orden de llave con
+  ``select_for_update`` para que los ``delta`` no pierdan escrituras;
+- los cambios se guardan con ``bulk_update`` en lotes, fijando
+  ``fecha_actualizacion`` a mano (``auto_now`` no aplica en
+  ``bulk_update``), de modo que el análisis incremental los ve;
+- ``bulk_update`` no dispara señales, así que al final se recalcula el
+  ``ResumenInventario`` de cada empresa afectada.
+
+Un ajuste inválido no detiene a los demás: cada uno tiene su resultado.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from litethinking_domain.models import Inventario, ResumenInventario
+
+# Filas por consulta de resolución y por UPDATE de bulk_update
+TAMANIO_LOTE_AJUSTE = 1000
+
+
+def _entero(valor):
+    # bool es subclase de int, pero True no es una cantidad
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise ValueError
+    return valor
+
+
+def _normalizar(ajuste):
+    """
+    Tupla ((campo, valor) de la fila, cantidad, delta) de un ajuste.
+
+    Raises:
+        ValueError: con el mensaje de error del ajuste
+    """
+    if not isinstance(ajuste, dict):
+        raise ValueError('Cada ajuste debe ser un objeto')
+
+    if ajuste.get('id') is not None:
+        try:
+            fila = ('id', _entero(ajuste['id']))
+        except ValueError:
+            raise ValueError('id debe ser un entero') from None
+    elif ajuste.get('producto_codigo'):
+        fila = ('producto_codigo', str(ajuste['producto_codigo']))
+    else:
+        raise ValueError('Se requiere id o producto_codigo')
+
+    tiene_cantidad = ajuste.get('cantidad') is not None
+    tiene_delta = ajuste.get('delta') is not None
+    if tiene_cantidad == tiene_delta:
+        raise ValueError('Se requiere cantidad o delta (solo uno)')
+    if tiene_cantidad:
+        try:
+            cantidad = _entero(ajuste['cantidad'])
+        except ValueError:
+            raise ValueError('cantidad debe ser un entero') from None
+        if cantidad < 0:
+            raise ValueError('cantidad no puede ser negativa')
+        return fila, cantidad, None
+    try:
+        return fila, None, _entero(ajuste['delta'])
+    except ValueError:
+        raise ValueError('delta debe ser un entero') from None
+
+
+def _lotes(valores):
+    valores = list(valores)
+    for inicio in range(0, len(valores), TAMANIO_LOTE_AJUSTE):
+        yield valores[inicio:inicio + TAMANIO_LOTE_AJUSTE]
+
+
+def _resolver(ids, codigos, empresa_nit=None):
+    """
+    Filas de Inventario bloqueadas, por id y por código de producto.
+
+    Las filas se bloquean en orden de llave (primero se buscan sus ids sin
+    bloquear): dos sincronizaciones con filas en común esperan una a la
+    otra en vez de bloquearse mutuamente (deadlock).
+
+    Returns:
+        Tupla (dict id → Inventario, dict código → lista de Inventario)
+    """
+    filas = Inventario.objects.all()
+    if empresa_nit:
+        filas = filas.filter(producto__empresa_id=empresa_nit)
+
+    condiciones = [Q(pk__in=lote) for lote in _lotes(ids)]
+    condiciones += [Q(producto__codigo__in=lote) for lote in _lotes(codigos)]
+    encontrados = set()
+    for condicion in condiciones:
+        encontrados.update(filas.filter(condicion).order_by().values_list('pk', flat=True))
+
+    consulta = (
+        filas.select_for_update(of=('self',))
+        .order_by('pk')
+        .only('id', 'cantidad', 'fecha_actualizacion',
+              'producto__codigo', 'producto__empresa_id')
+        .select_related('producto')
+    )
+    por_id = {}
+    por_codigo = {}
+    for lote in _lotes(sorted(encontrados)):
+        for inventario in consulta.filter(pk__in=lote):
+            por_id[inventario.pk] = inventario
+    for inventario in por_id.values():
+        por_codigo.setdefault(inventario.producto.codigo, []).append(inventario)
+    return por_id, por_codigo
+
+
+def aplicar_ajustes(ajustes, empresa_nit=None):
+    """
+    Aplica ajustes de existencias en una transacción.
+
+    Args:
+        ajustes: lista de dicts con ``id`` (de Inventario) o
+            ``producto_codigo``, y ``cantidad`` (absoluta) o ``delta``
+        empresa_nit: si se indica, solo se ajustan filas de esa empresa
+
+    Returns:
+        dict con ``actualizados``, ``sin_cambios``, ``errores`` y
+        ``resultados`` (uno por ajuste, en el mismo orden)
+    """
+    resultados = []
+    normalizados = []
+    for indice, ajuste in enumerate(ajustes):
+        try:
+            normalizados.append((indice, *_normalizar(ajuste)))
+            resultados.append(None)
+        except ValueError as error:
+            resultados.append({'indice': indice, 'estado': 'error', 'error': str(error)})
+
+    ids = {valor for _, (campo, valor), _, _ in normalizados if campo == 'id'}
+    codigos = {valor for _, (campo, valor), _, _ in normalizados if campo == 'producto_codigo'}
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        por_id, por_codigo = _resolver(ids, codigos, empresa_nit)
+        anteriores = {}
+        for indice, (campo, valor), cantidad, delta in normalizados:
+            if campo == 'id':
+                inventario = por_id.get(valor)
+            else:
+                filas = por_codigo.get(valor, [])
+                if len(filas) > 1:
+                    resultados[indice] = {
+                        'indice': indice,
+                        'estado': 'error',
+                        'error': 'El producto tiene varias filas de inventario; usa id',
+                    }
+                    continue
+                inventario = filas[0] if filas else None
+            if inventario is None:
+                resultados[indice] = {
+                    'indice': indice, 'estado': 'error', 'error': 'Inventario no encontrado'
+                }
+                continue
+
+            nueva = cantidad if delta is None else inventario.cantidad + delta
+            if nueva < 0:
+                resultados[indice] = {
+                    'indice': indice,
+                    'estado': 'error',
+                    'error': f'La cantidad quedaría negativa ({nueva})',
+                }
+                continue
+            anterior = inventario.cantidad
+            anteriores.setdefault(inventario.pk, anterior)
+            inventario.cantidad = nueva
+            resultados[indice] = {
+                'indice': indice,
+                'id': inventario.pk,
+                'producto_codigo': inventario.producto.codigo,
+                'cantidad_anterior': anterior,
+                'cantidad': nueva,
+                'estado': 'actualizado' if nueva != anterior else 'sin_cambios',
+            }
+
+        modificados = [
+            por_id[pk] for pk, anterior in anteriores.items()
+            if por_id[pk].cantidad != anterior
+        ]
+        for inventario in modificados:
+            inventario.fecha_actualizacion = ahora
+        Inventario.objects.bulk_update(
+            modificados, ['cantidad', 'fecha_actualizacion'], batch_size=TAMANIO_LOTE_AJUSTE
+        )
+        for empresa_id in {inventario.producto.empresa_id for inventario in modificados}:
+            ResumenInventario.recalcular(empresa_id)
+
+    estados = [resultado['estado'] for resultado in resultados]
+    return {
+        'actualizados': estados.count('actualizado'),
+        'sin_cambios': estados.count('sin_cambios'),
+        'errores': estados.count('error'),
+        'resultados': resultados,
+    }
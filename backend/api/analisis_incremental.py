@@ -0,0 +1,150 @@
+"""
+Análisis del inventario actualizado por deltas.
+
+El tablero IA se refresca cada minuto y el análisis completo relee todo el
+inventario de la empresa aunque solo hayan cambiado unas pocas filas. El
+estado de cada empresa se guarda en la base de datos, compartido por todos
+los procesos:
+
+- conteos por bucket, unidades y valor: ``ResumenInventario``, que las
+  señales ya mantienen al día por deltas;
+- filas que lista el análisis (sin stock y stock bajo) y la marca hasta la
+  que se aplicaron los cambios: ``EstadoAnalisisInventario``.
+
+En cada refresco solo se leen las filas de Inventario con
+``fecha_actualizacion`` posterior a la marca; cada una entra o sale de la
+lista según su cantidad actual.
+
+Lo que no cambia ``fecha_actualizacion`` se detecta aparte: los borrados
+dejan la lista con más filas que los conteos del resumen, y los cambios de
+Producto y las operaciones masivas (``ResumenInventario.recalcular``)
+invalidan el estado. En esos casos se releen solo las filas listadas.
+
+El estado se acota por filas: si la empresa tiene más de
+``ANALISIS_INCREMENTAL_MAX_FILAS`` filas listadas no se guarda, y cada
+análisis las lee de la base de datos.
+"""
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_EVEN
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from litethinking_domain.models import EstadoAnalisisInventario, ResumenInventario
+from .analitica import (
+    BUCKETS,
+    UMBRAL_STOCK_BAJO,
+    ColumnasInventario,
+    MetricasInventario,
+    bucket,
+)
+from .ia_service import analizar_inventario
+from .inventario_service import cargar_snapshot_inventario
+
+# Las filas con fecha hasta este margen antes de la marca se releen: una
+# transacción puede confirmar después de la lectura anterior con una fecha
+# anterior a la marca. Releer una fila ya aplicada no cambia el estado
+MARGEN_RELECTURA = timedelta(seconds=5)
+
+# Buckets cuyos productos lista el análisis
+BUCKETS_LISTADOS = ('sin_stock', 'stock_bajo')
+
+
+def _aplicar(filas, snapshot):
+    """
+    Agrega a ``filas`` (inventario_id -> fila) las filas de ``snapshot``
+    en un bucket listado y quita las demás.
+    """
+    for indice, inv_id in enumerate(snapshot.ids):
+        cantidad = snapshot.cantidades[indice]
+        if bucket(cantidad) not in BUCKETS_LISTADOS:
+            filas.pop(inv_id, None)
+            continue
+        filas[inv_id] = [
+            inv_id,
+            snapshot.fechas[indice].isoformat(),
+            snapshot.codigos[indice],
+            snapshot.nombres[indice],
+            cantidad,
+            snapshot.precios[indice],
+        ]
+
+
+def _coincide_con(filas, resumen):
+    """True si ``filas`` tiene tantas filas por bucket como ``resumen``."""
+    conteos = dict.fromkeys(BUCKETS_LISTADOS, 0)
+    for fila in filas.values():
+        conteos[bucket(fila[4])] += 1
+    return all(conteos[b] == getattr(resumen, f'productos_{b}') for b in BUCKETS_LISTADOS)
+
+
+def _metricas(empresa_nit, filas, resumen):
+    """``MetricasInventario`` con las filas listadas y los agregados del resumen."""
+    # Mismo orden que el inventario (fecha_actualizacion descendente)
+    listadas = sorted(
+        filas.values(),
+        key=lambda fila: (datetime.fromisoformat(fila[1]), fila[0]),
+        reverse=True,
+    )
+    columnas = ColumnasInventario.desde_filas(fila[2:] for fila in listadas)
+    return MetricasInventario.desde_agregados(
+        columnas,
+        {b: getattr(resumen, f'productos_{b}') for b in BUCKETS},
+        resumen.total_unidades,
+        int((resumen.valor_total * 100).to_integral_value(ROUND_HALF_EVEN)),
+        empresa_nit=empresa_nit,
+    )
+
+
+def metricas_incrementales(empresa_nit):
+    """
+    Métricas del inventario de la empresa leyendo solo las filas cambiadas
+    desde el análisis anterior.
+
+    Returns:
+        (MetricasInventario, True si bastó con los deltas)
+    """
+    maximo = getattr(settings, 'ANALISIS_INCREMENTAL_MAX_FILAS', 5000)
+    resumen = ResumenInventario.obtener(empresa_nit)
+    with transaction.atomic():
+        # Un análisis a la vez por empresa (la fila queda bloqueada)
+        estado, _ = (
+            EstadoAnalisisInventario.objects
+            .select_for_update()
+            .get_or_create(empresa_id=empresa_nit)
+        )
+        resumen.refresh_from_db()
+        ahora = timezone.now()
+        filas = {fila[0]: fila for fila in estado.filas}
+        incremental = estado.marca is not None
+        if incremental:
+            _aplicar(filas, cargar_snapshot_inventario(
+                empresa_nit,
+                fecha_actualizacion__gte=estado.marca - MARGEN_RELECTURA,
+            ))
+            incremental = _coincide_con(filas, resumen)
+        if not incremental:
+            filas = {}
+            _aplicar(filas, cargar_snapshot_inventario(
+                empresa_nit, cantidad__lte=UMBRAL_STOCK_BAJO
+            ))
+
+        if len(filas) <= maximo:
+            estado.marca = ahora
+            estado.filas = list(filas.values())
+        else:
+            estado.marca = None
+            estado.filas = []
+        estado.save()
+    return _metricas(empresa_nit, filas, resumen), incremental
+
+
+def analizar_inventario_incremental(empresa: dict) -> dict:
+    """
+    Igual que ``analizar_inventario`` con todo el inventario de la
+    empresa, pero leyendo solo las filas cambiadas desde la llamada
+    anterior.
+    """
+    metricas, _ = metricas_incrementales(empresa['nit'])
+    return analizar_inventario(empresa, metricas)
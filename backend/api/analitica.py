@@ -0,0 +1,311 @@
+"""
+Motor de métricas del inventario por columnas.
+
+``AnalisisInventarioIA`` clasificaba cada fila creando un ``Decimal`` y un
+dict por producto, aunque las alertas solo muestran unos pocos. Aquí las
+cantidades y precios se tratan como columnas: los buckets de stock, los
+totales y la valoración se calculan de una vez (con NumPy si está
+instalado) y los dicts de producto solo se construyen para las filas que
+realmente se muestran.
+
+La valoración se acumula en centavos enteros, así que es exacta para
+precios con hasta dos decimales (COP y USD) e igual con o sin NumPy.
+
+``MetricasInventario.desde_base_de_datos`` delega los conteos y la
+valoración a una consulta de agregación (``ResumenInventario.agregados``)
+y solo lee las filas que el análisis lista.
+"""
+import heapq
+from decimal import ROUND_HALF_EVEN, Decimal
+from itertools import islice
+
+from litethinking_domain.models import ResumenInventario
+from .inventario_service import iterar_filas_reporte
+
+# NumPy es opcional: sin él se usa el recorrido en Python puro
+try:
+    import numpy as np
+    NUMPY_DISPONIBLE = True
+except ImportError:
+    NUMPY_DISPONIBLE = False
+
+UMBRAL_STOCK_CRITICO = 0
+UMBRAL_STOCK_BAJO = 10
+UMBRAL_STOCK_MEDIO = 50
+
+BUCKETS = ('sin_stock', 'stock_bajo', 'stock_medio', 'stock_alto')
+
+# Filtros de Inventario de los buckets que solo se cuentan
+FILTROS_BUCKET = {
+    'stock_medio': {'cantidad__gt': UMBRAL_STOCK_BAJO, 'cantidad__lte': UMBRAL_STOCK_MEDIO},
+    'stock_alto': {'cantidad__gt': UMBRAL_STOCK_MEDIO},
+}
+
+
+def bucket(cantidad):
+    """Bucket de stock al que pertenece una cantidad."""
+    if cantidad == UMBRAL_STOCK_CRITICO:
+        return 'sin_stock'
+    if cantidad <= UMBRAL_STOCK_BAJO:
+        return 'stock_bajo'
+    if cantidad <= UMBRAL_STOCK_MEDIO:
+        return 'stock_medio'
+    return 'stock_alto'
+
+
+def _centavos(precio):
+    """Precio en centavos enteros (0 si no es un número válido)."""
+    if type(precio) is int:
+        return precio * 100
+    try:
+        return int((Decimal(str(precio or 0)) * 100).to_integral_value(ROUND_HALF_EVEN))
+    except (ArithmeticError, ValueError):
+        return 0
+
+
+class ColumnasInventario:
+    """
+    Columnas (código, nombre, cantidad, precio) de un inventario.
+
+    Con un ``SnapshotInventario`` se usan sus listas tal cual; con una
+    secuencia de dicts se recorren una vez para separar las columnas.
+    """
+
+    def __init__(self, codigos, nombres, cantidades, precios):
+        self.codigos = codigos
+        self.nombres = nombres
+        self.cantidades = cantidades
+        self.precios = precios
+
+    @classmethod
+    def desde(cls, inventarios):
+        if hasattr(inventarios, 'cantidades'):
+            return cls(
+                inventarios.codigos,
+                inventarios.nombres,
+                inventarios.cantidades,
+                inventarios.precios,
+            )
+        codigos, nombres, cantidades, precios = [], [], [], []
+        for inv in inventarios:
+            codigos.append(inv.get('producto_codigo', 'N/A'))
+            nombres.append(inv.get('producto_nombre', 'N/A'))
+            cantidades.append(inv.get('cantidad', 0))
+            precios.append(inv.get('producto_precio', 0))
+        return cls(codigos, nombres, cantidades, precios)
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Columnas de tuplas (código, nombre, cantidad, precio)."""
+        columnas = cls([], [], [], [])
+        for codigo, nombre, cantidad, precio in filas:
+            columnas.codigos.append(codigo)
+            columnas.nombres.append(nombre)
+            columnas.cantidades.append(cantidad)
+            columnas.precios.append(precio)
+        return columnas
+
+    def __len__(self):
+        return len(self.cantidades)
+
+    def producto(self, indice):
+        """Dict de detalle de la fila ``indice`` (formato histórico del análisis)."""
+        cantidad = self.cantidades[indice]
+        precio = Decimal(str(self.precios[indice] or 0))
+        return {
+            'codigo': self.codigos[indice],
+            'nombre': self.nombres[indice],
+            'cantidad': cantidad,
+            'precio': float(precio),
+            'valor': float(cantidad * precio),
+        }
+
+
+class MetricasInventario:
+    """
+    Totales y buckets de stock de un inventario.
+
+    Atributos:
+        total_productos, total_unidades: enteros
+        valor_total: Decimal
+        conteos: dict bucket -> número de productos
+    """
+
+    def __init__(self, inventarios):
+        self.columnas = ColumnasInventario.desde(inventarios)
+        self.total_productos = len(self.columnas)
+        # Posiciones de las filas sin stock y con stock bajo, en orden
+        self._indices = {'sin_stock': [], 'stock_bajo': []}
+        self.conteos = dict.fromkeys(BUCKETS, 0)
+        self.empresa_nit = None
+        if NUMPY_DISPONIBLE and self.total_productos:
+            self._calcular_numpy()
+        else:
+            self._calcular_python()
+
+    @classmethod
+    def desde_agregados(cls, columnas, conteos, total_unidades, valor_centavos, empresa_nit=None):
+        """
+        Métricas ya agregadas fuera de esta clase.
+
+        Args:
+            columnas: ``ColumnasInventario`` con solo las filas sin stock y
+                con stock bajo, en el orden del inventario
+            conteos: dict bucket -> número de productos
+            total_unidades: suma de cantidades
+            valor_centavos: valor total en centavos enteros
+            empresa_nit: empresa de la que se consultan las filas de
+                stock medio y alto si se piden
+        """
+        metricas = cls([])
+        metricas.empresa_nit = empresa_nit
+        metricas.columnas = columnas
+        for indice, cantidad in enumerate(columnas.cantidades):
+            metricas._indices[bucket(cantidad)].append(indice)
+        metricas.conteos.update(conteos)
+        metricas.total_productos = sum(metricas.conteos.values())
+        metricas.total_unidades = total_unidades
+        metricas._valor_centavos = valor_centavos
+        return metricas
+
+    @classmethod
+    def desde_base_de_datos(cls, empresa_nit):
+        """
+        Métricas del inventario de una empresa calculadas en la base de
+        datos: conteos, unidades y valor salen de una consulta de
+        agregación y solo se leen las filas sin stock o con stock bajo.
+        """
+        agregados = ResumenInventario.agregados(empresa_nit)
+        columnas = ColumnasInventario.desde_filas(
+            iterar_filas_reporte(empresa_nit, cantidad__lte=UMBRAL_STOCK_BAJO)
+        )
+        return cls.desde_agregados(
+            columnas,
+            {b: agregados[f'productos_{b}'] for b in BUCKETS},
+            agregados['total_unidades'],
+            int((agregados['valor_total'] * 100).to_integral_value(ROUND_HALF_EVEN)),
+            empresa_nit=empresa_nit,
+        )
+
+    def _calcular_numpy(self):
+        cantidades = np.fromiter(self.columnas.cantidades, dtype=np.int64, count=self.total_productos)
+        try:
+            precios = np.asarray(self.columnas.precios, dtype=np.float64)
+        except (TypeError, ValueError):
+            precios = None
+        if precios is not None:
+            with np.errstate(invalid='ignore', over='ignore'):
+                centavos = np.rint(precios * 100)
+            # None llega como NaN (e infinitos tampoco son precios): valen 0,
+            # como en _centavos; sin esto astype(int64) los vuelve INT64_MIN
+            centavos[~np.isfinite(centavos)] = 0
+            centavos = centavos.astype(np.int64)
+        else:
+            # Precios no numéricos (texto): conversión fila a fila
+            centavos = np.fromiter(
+                (_centavos(precio) for precio in self.columnas.precios),
+                dtype=np.int64,
+                count=self.total_productos,
+            )
+
+        sin_stock = cantidades == UMBRAL_STOCK_CRITICO
+        hasta_bajo = cantidades <= UMBRAL_STOCK_BAJO
+        stock_bajo = hasta_bajo & ~sin_stock
+        hasta_medio = cantidades <= UMBRAL_STOCK_MEDIO
+
+        self._indices['sin_stock'] = np.flatnonzero(sin_stock).tolist()
+        self._indices['stock_bajo'] = np.flatnonzero(stock_bajo).tolist()
+        self.conteos['sin_stock'] = len(self._indices['sin_stock'])
+        self.conteos['stock_bajo'] = len(self._indices['stock_bajo'])
+        self.conteos['stock_medio'] = int(np.count_nonzero(hasta_medio & ~hasta_bajo))
+        self.conteos['stock_alto'] = int(np.count_nonzero(~hasta_medio))
+
+        self.total_unidades = int(cantidades.sum())
+        cota = int(np.abs(cantidades).max()) * int(np.abs(centavos).sum())
+        if cota < 2 ** 63:
+            self._valor_centavos = int(np.dot(cantidades, centavos))
+        else:
+            # El producto no cabe en int64: se acumula con enteros de Python
+            self._valor_centavos = int(np.dot(cantidades.astype(object), centavos.astype(object)))
+
+    def _calcular_python(self):
+        sin_stock = self._indices['sin_stock']
+        stock_bajo = self._indices['stock_bajo']
+        medio = alto = unidades = valor = 0
+        for indice, (cantidad, precio) in enumerate(zip(self.columnas.cantidades, self.columnas.precios)):
+            unidades += cantidad
+            valor += cantidad * _centavos(precio)
+            if cantidad == UMBRAL_STOCK_CRITICO:
+                sin_stock.append(indice)
+            elif cantidad <= UMBRAL_STOCK_BAJO:
+                stock_bajo.append(indice)
+            elif cantidad <= UMBRAL_STOCK_MEDIO:
+                medio += 1
+            else:
+                alto += 1
+        self.conteos.update(
+            sin_stock=len(sin_stock),
+            stock_bajo=len(stock_bajo),
+            stock_medio=medio,
+            stock_alto=alto,
+        )
+        self.total_unidades = unidades
+        self._valor_centavos = valor
+
+    @property
+    def valor_total(self):
+        return Decimal(self._valor_centavos) / 100
+
+    def porcentaje(self, *buckets):
+        """Porcentaje de productos en ``buckets`` (0 sin productos)."""
+        if not self.total_productos:
+            return 0
+        return (sum(self.conteos[bucket] for bucket in buckets) / self.total_productos) * 100
+
+    def productos(self, bucket, limite=None):
+        """
+        Dicts de detalle de los productos de ``bucket``, en el orden del
+        inventario. Solo se construyen los ``limite`` primeros.
+        """
+        columnas = self.columnas
+        if bucket in self._indices:
+            indices = self._indices[bucket]
+            if limite is not None:
+                indices = indices[:limite]
+        elif self.empresa_nit is not None:
+            # Las filas de este bucket no se leyeron al agregar
+            filas = iterar_filas_reporte(self.empresa_nit, **FILTROS_BUCKET[bucket])
+            columnas = ColumnasInventario.desde_filas(islice(filas, limite))
+            indices = range(len(columnas))
+        else:
+            indices = self._indices_bucket(bucket, limite)
+        return [columnas.producto(indice) for indice in indices]
+
+    def mayores(self, k, clave, buckets=('sin_stock', 'stock_bajo')):
+        """
+        Los ``k`` productos de ``buckets`` (sin stock y stock bajo) con mayor
+        ``clave(cantidad, precio)``, de mayor a menor.
+        """
+        columnas = self.columnas
+        indices = [indice for bucket in buckets for indice in self._indices[bucket]]
+        elegidos = heapq.nlargest(
+            k,
+            indices,
+            key=lambda i: clave(columnas.cantidades[i], columnas.precios[i]),
+        )
+        return [columnas.producto(indice) for indice in elegidos]
+
+    def _indices_bucket(self, bucket, limite):
+        # stock_medio / stock_alto: solo se cuentan; las posiciones se
+        # buscan si alguien pide el detalle
+        if bucket == 'stock_medio':
+            incluir = lambda c: UMBRAL_STOCK_BAJO < c <= UMBRAL_STOCK_MEDIO
+        else:
+            incluir = lambda c: c > UMBRAL_STOCK_MEDIO
+        indices = []
+        for indice, cantidad in enumerate(self.columnas.cantidades):
+            if incluir(cantidad):
+                indices.append(indice)
+                if limite is not None and len(indices) >= limite:
+                    break
+        return indices
@@ -0,0 +1,115 @@
+"""
+Búsqueda de texto completo de productos.
+
+Usa el índice que crea la migración ``0008_busqueda_productos``:
+
+- SQLite: ``MATCH`` sobre la tabla FTS5 ``core_producto_busqueda`` con
+  cada palabra como prefijo (``"camis"*``), ordenada por ``bm25``;
+- PostgreSQL: ``to_tsquery('spanish', 'camis:*')`` sobre la columna
+  ``busqueda`` (GIN), ordenada por ``ts_rank``, más ``ILIKE`` sobre
+  ``codigo`` (índice de trigramas) para fragmentos de código.
+
+En ambos casos también coinciden los productos cuya empresa tiene el texto
+en el nombre (la tabla de empresas es pequeña). En otros motores
+``soporta_busqueda`` es False y se usa la búsqueda con ``icontains``.
+"""
+import re
+
+from django.db import NotSupportedError
+from django.db.models import Expression, FloatField
+from django.db.models.expressions import RawSQL
+
+TABLA_FTS = 'core_producto_busqueda'
+MOTORES = ('sqlite', 'postgresql')
+# Pesos de bm25 por columna de la tabla FTS5 (codigo, nombre, caracteristicas)
+PESOS_BM25 = (10.0, 5.0, 1.0)
+
+_PALABRA = re.compile(r'\w+')
+
+
+def soporta_busqueda(connection):
+    return connection.vendor in MOTORES
+
+
+def palabras(texto):
+    """Palabras del texto en minúsculas, sin signos ni operadores."""
+    return _PALABRA.findall((texto or '').lower())
+
+
+def _consulta_fts5(texto):
+    # Entre comillas para que ninguna palabra se lea como operador (AND, NEAR...)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras(texto))
+
+
+def _consulta_tsquery(texto):
+    return ' & '.join(f'{palabra}:*' for palabra in palabras(texto))
+
+
+def _patron_like(texto):
+    escapado = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escapado}%'
+
+
+def ids_coincidentes(connection, texto):
+    """
+    Subconsulta con los id de los productos que coinciden con ``texto``,
+    para usar como ``pk__in`` (o ``producto__in``).
+
+    Raises:
+        NotSupportedError: si el motor no tiene índice de búsqueda
+    """
+    texto = texto.strip()
+    if connection.vendor == 'sqlite':
+        return RawSQL(
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s '
+            "UNION SELECT id FROM core_producto WHERE empresa_id IN "
+            "(SELECT nit FROM core_empresa WHERE nombre LIKE %s ESCAPE '\\')",
+            [_consulta_fts5(texto), _patron_like(texto)],
+        )
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            "SELECT id FROM core_producto "
+            "WHERE busqueda @@ to_tsquery('spanish', %s) OR codigo ILIKE %s "
+            "OR empresa_id IN (SELECT nit FROM core_empresa WHERE nombre ILIKE %s)",
+            [_consulta_tsquery(texto), _patron_like(texto), _patron_like(texto)],
+        )
+    raise NotSupportedError(f'Búsqueda de texto no disponible en {connection.vendor}')
+
+
+class RangoBusqueda(Expression):
+    """
+    Relevancia del producto ``producto`` (expresión con su id) para
+    ``texto``; mayor es mejor y 0 si solo coincide por empresa o código.
+    """
+    output_field = FloatField()
+
+    def __init__(self, producto, texto):
+        super().__init__()
+        self.producto = producto
+        self.texto = texto
+
+    def get_source_expressions(self):
+        return [self.producto]
+
+    def set_source_expressions(self, expresiones):
+        self.producto, = expresiones
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(f'Búsqueda de texto no disponible en {connection.vendor}')
+
+    def as_sqlite(self, compiler, connection):
+        producto_sql, producto_params = compiler.compile(self.producto)
+        pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+        sql = (
+            f'COALESCE((SELECT -bm25({TABLA_FTS}, {pesos}) FROM {TABLA_FTS} '
+            f'WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = {producto_sql}), 0)'
+        )
+        return sql, [_consulta_fts5(self.texto), *producto_params]
+
+    def as_postgresql(self, compiler, connection):
+        producto_sql, producto_params = compiler.compile(self.producto)
+        sql = (
+            "COALESCE((SELECT ts_rank(b.busqueda, to_tsquery('spanish', %s)) "
+            f'FROM core_producto b WHERE b.id = {producto_sql}), 0)'
+        )
+        return sql, [_consulta_tsquery(self.texto), *producto_params]
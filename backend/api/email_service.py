@@ -4,9 +4,11 @@ import io
 import json
 import os
 from datetime import datetime
+from functools import lru_cache
 import locale
+from xml.sax.saxutils import escape
 
-import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.mail import EmailMessage
 from reportlab.lib import colors
@@ -14,6 +16,7 @@ from reportlab.lib.pagesizes import A4, letter
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import mm, inch
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
 from reportlab.platypus import (
     Paragraph,
@@ -26,11 +29,15 @@ from reportlab.platypus import (
     KeepTogether,
     PageBreak,
 )
+from reportlab.platypus.doctemplate import SetTopFlowables
 from reportlab.graphics.shapes import Drawing, Rect, String, Circle, Line
 from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 from reportlab.graphics import renderPDF
 
+from litethinking_domain.models import HistorialEnvio
+from .resend_client import HTTPX_DISPONIBLE, obtener_cliente, obtener_cliente_async
+
 # Intentar importar qrcode para generación de QR
 try:
     import qrcode
@@ -39,6 +46,10 @@ try:
 except ImportError:
     QR_DISPONIBLE = False
 
+# Versión del diseño del PDF. Forma parte de la llave de la caché de PDFs
+# (api/pdf_cache.py): incrementarla al cambiar el layout invalida la caché
+VERSION_PLANTILLA_PDF = '2'
+
 # Paleta de colores moderna y elegante
 COLORS = {
     # Colores principales
@@ -192,83 +203,133 @@ def _create_stat_card(label, value, color=None, width_card=42*mm):
     return table
 
 
-def generar_pdf_inventario(empresa, inventarios):
+# Filas del detalle por tabla en el modo por bloques
+FILAS_POR_BLOQUE_PDF = 200
+
+# Anchos de las columnas de la tabla de detalle
+ANCHOS_DETALLE = [12*mm, 28*mm, 58*mm, 22*mm, 25*mm, 25*mm]
+
+# Ancho útil (sin el padding de 6pt por lado) de las columnas de texto libre
+_ANCHO_UTIL_CODIGO = ANCHOS_DETALLE[1] - 12
+_ANCHO_UTIL_NOMBRE = ANCHOS_DETALLE[2] - 12
+
+
+class _FlowablesPorBloques(list):
     """
-    Genera un PDF profesional y minimalista del inventario
-    
-    Args:
-        empresa: dict con datos de la empresa (nit, nombre, direccion, telefono)
-        inventarios: lista de dicts con datos del inventario
-    
-    Returns:
-        bytes: Contenido del PDF
+    Lista de flowables que se rellena desde un generador a medida que
+    ReportLab la consume (``doc.build`` saca elementos del frente).
+    Así solo hay unos pocos bloques del detalle en memoria a la vez.
     """
-    buffer = io.BytesIO()
-    width, height = A4
-    
-    # Fecha de generación formateada
-    fecha_generacion = datetime.now().strftime('%d de %B, %Y').capitalize()
-    
-    # Crear el documento con márgenes personalizados
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=25*mm,
-        leftMargin=25*mm,
-        topMargin=95*mm,  # Espacio para el header
-        bottomMargin=30*mm  # Espacio para el footer
-    )
-    
-    # Estilos personalizados
+
+    def __init__(self, generador, minimo=2):
+        super().__init__()
+        self._generador = generador
+        self._minimo = minimo
+
+    def __len__(self):
+        while super().__len__() < self._minimo and self._generador is not None:
+            try:
+                self.append(next(self._generador))
+            except StopIteration:
+                self._generador = None
+        return super().__len__()
+
+
+@lru_cache(maxsize=None)
+def _estilos_reporte():
+    """Estilos de párrafo compartidos por las secciones del reporte (se crean una vez)"""
     styles = getSampleStyleSheet()
     
-    # Estilo para secciones
-    section_title_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Normal'],
-        fontSize=11,
-        fontName='Helvetica-Bold',
-        textColor=COLORS['text_primary'],
-        spaceBefore=8*mm,
-        spaceAfter=4*mm,
-        leftIndent=0,
-    )
-    
-    # Estilo para texto normal
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['Normal'],
-        fontSize=9,
-        fontName='Helvetica',
-        textColor=COLORS['text_secondary'],
-        leading=14,
-    )
-    
-    # Estilo para labels
-    label_style = ParagraphStyle(
-        'Label',
-        parent=styles['Normal'],
-        fontSize=8,
-        fontName='Helvetica',
-        textColor=COLORS['text_muted'],
-    )
-    
-    # Estilo para valores
-    value_style = ParagraphStyle(
-        'Value',
-        parent=styles['Normal'],
-        fontSize=10,
-        fontName='Helvetica-Bold',
-        textColor=COLORS['text_primary'],
-    )
-    
-    elements = []
-    
-    # ═══════════════════════════════════════════════════════════════
-    # SECCIÓN: INFORMACIÓN DE LA EMPRESA
-    # ═══════════════════════════════════════════════════════════════
-    
-    elements.append(Paragraph('INFORMACIÓN DE LA EMPRESA', section_title_style))
+    return {
+        # Estilo para secciones
+        'section_title': ParagraphStyle(
+            'SectionTitle',
+            parent=styles['Normal'],
+            fontSize=11,
+            fontName='Helvetica-Bold',
+            textColor=COLORS['text_primary'],
+            spaceBefore=8*mm,
+            spaceAfter=4*mm,
+            leftIndent=0,
+        ),
+        # Estilo para labels
+        'label': ParagraphStyle(
+            'Label',
+            parent=styles['Normal'],
+            fontSize=8,
+            fontName='Helvetica',
+            textColor=COLORS['text_muted'],
+        ),
+        # Estilo para valores
+        'value': ParagraphStyle(
+            'Value',
+            parent=styles['Normal'],
+            fontSize=10,
+            fontName='Helvetica-Bold',
+            textColor=COLORS['text_primary'],
+        ),
+        # Celdas del detalle que no caben en una línea
+        'cell': ParagraphStyle(
+            'TableCell',
+            fontSize=8,
+            fontName='Helvetica',
+            textColor=COLORS['text_primary'],
+        ),
+        'cell_codigo': ParagraphStyle(
+            'TableCellCodigo',
+            fontSize=8,
+            fontName='Courier-Bold',
+            textColor=COLORS['text_primary'],
+        ),
+    }
+
+
+class EstadisticasReporte:
+    """Acumula los totales del resumen fila por fila"""
+    
+    def __init__(self):
+        self.total_productos = 0
+        self.total_unidades = 0
+        self.stock_alto = 0
+        self.stock_bajo = 0
+        self.sin_stock = 0
+        # Valor total del inventario si hay precios
+        self.valor_total = 0
+    
+    def agregar(self, cantidad, precio):
+        self.total_productos += 1
+        self.total_unidades += cantidad
+        if cantidad > 10:
+            self.stock_alto += 1
+        elif cantidad > 0:
+            self.stock_bajo += 1
+        else:
+            self.sin_stock += 1
+        self.valor_total += cantidad * precio
+    
+    def como_dict(self):
+        return {
+            'total_productos': self.total_productos,
+            'total_unidades': self.total_unidades,
+            'stock_alto': self.stock_alto,
+            'stock_bajo': self.stock_bajo,
+            'sin_stock': self.sin_stock,
+            'valor_total': self.valor_total,
+        }
+
+
+def _estadisticas_inventario(inventarios):
+    """Totales del resumen calculados recorriendo las filas"""
+    estadisticas = EstadisticasReporte()
+    for inv in inventarios:
+        estadisticas.agregar(inv.get('cantidad', 0), inv.get('producto_precio', 0))
+    return estadisticas.como_dict()
+
+
+def _seccion_empresa(empresa, estilos):
+    label_style = estilos['label']
+    value_style = estilos['value']
+    elements = [Paragraph('INFORMACIÓN DE LA EMPRESA', estilos['section_title'])]
     
     # Tarjeta de información de empresa
     empresa_info = [
@@ -302,31 +363,22 @@ def generar_pdf_inventario(empresa, inventarios):
     ]))
     elements.append(empresa_table)
     elements.append(Spacer(1, 8*mm))
+    return elements
+
+
+def _seccion_resumen(stats, estilos):
+    elements = [Paragraph('RESUMEN DEL INVENTARIO', estilos['section_title'])]
     
-    # ═══════════════════════════════════════════════════════════════
-    # SECCIÓN: RESUMEN ESTADÍSTICO
-    # ═══════════════════════════════════════════════════════════════
-    
-    elements.append(Paragraph('RESUMEN DEL INVENTARIO', section_title_style))
-    
-    # Calcular estadísticas
-    total_productos = len(inventarios)
-    total_unidades = sum(inv.get('cantidad', 0) for inv in inventarios)
-    stock_alto = len([inv for inv in inventarios if inv.get('cantidad', 0) > 10])
-    stock_bajo = len([inv for inv in inventarios if 0 < inv.get('cantidad', 0) <= 10])
-    sin_stock = len([inv for inv in inventarios if inv.get('cantidad', 0) == 0])
-    
-    # Calcular valor total del inventario si hay precios
-    valor_total = sum(
-        inv.get('cantidad', 0) * inv.get('producto_precio', 0) 
-        for inv in inventarios
-    )
+    total_productos = stats['total_productos']
+    stock_alto = stats['stock_alto']
+    stock_bajo = stats['stock_bajo']
+    sin_stock = stats['sin_stock']
     
     # Tarjetas de estadísticas en fila
     stats_row = [
         [
             _create_stat_card('Productos', str(total_productos), COLORS['accent']),
-            _create_stat_card('Unidades', str(total_unidades), COLORS['primary']),
+            _create_stat_card('Unidades', str(stats['total_unidades']), COLORS['primary']),
             _create_stat_card('Stock Alto', str(stock_alto), COLORS['success']),
             _create_stat_card('Stock Bajo', str(stock_bajo), COLORS['warning']),
         ]
@@ -394,152 +446,238 @@ def generar_pdf_inventario(empresa, inventarios):
         elements.append(legend_table)
     
     elements.append(Spacer(1, 8*mm))
-    
-    # ═══════════════════════════════════════════════════════════════
-    # SECCIÓN: DETALLE DEL INVENTARIO
-    # ═══════════════════════════════════════════════════════════════
-    
-    elements.append(Paragraph('DETALLE DEL INVENTARIO', section_title_style))
-    
-    if inventarios:
-        # Header de la tabla con diseño moderno
-        header_style = ParagraphStyle(
-            'TableHeader',
-            fontSize=7,
-            fontName='Helvetica-Bold',
-            textColor=COLORS['white'],
-            alignment=TA_CENTER,
-        )
-        
-        cell_style = ParagraphStyle(
-            'TableCell',
-            fontSize=8,
-            fontName='Helvetica',
-            textColor=COLORS['text_primary'],
-        )
-        
-        cell_center_style = ParagraphStyle(
-            'TableCellCenter',
-            fontSize=8,
-            fontName='Helvetica',
-            textColor=COLORS['text_primary'],
-            alignment=TA_CENTER,
-        )
-        
-        # Construir datos de la tabla
-        table_data = [[
-            Paragraph('#', header_style),
-            Paragraph('CÓDIGO', header_style),
-            Paragraph('PRODUCTO', header_style),
-            Paragraph('CANTIDAD', header_style),
-            Paragraph('ESTADO', header_style),
-            Paragraph('PRECIO', header_style),
-        ]]
-        
-        for idx, inv in enumerate(inventarios, 1):
-            cantidad = inv.get('cantidad', 0)
-            status_color, status_bg, status_text = _get_status_color(cantidad)
-            precio = inv.get('producto_precio', 0)
-            
-            # Crear badge de estado
-            status_para = Paragraph(
-                f'<font size="7" color="{status_color.hexval()}">{status_text}</font>',
-                ParagraphStyle('StatusBadge', alignment=TA_CENTER)
-            )
-            
-            table_data.append([
-                Paragraph(f'<font size="8">{idx}</font>', cell_center_style),
-                Paragraph(f'<font size="8" name="Courier"><b>{inv.get("producto_codigo", "-")}</b></font>', cell_style),
-                Paragraph(f'<font size="8">{inv.get("producto_nombre", "-")}</font>', cell_style),
-                Paragraph(f'<font size="9"><b>{cantidad}</b></font>', cell_center_style),
-                status_para,
-                Paragraph(f'<font size="8">{_format_currency(precio)}</font>', cell_center_style),
-            ])
+    return elements
+
+
+def _fila_encabezado_detalle(estilos):
+    return ['#', 'CÓDIGO', 'PRODUCTO', 'CANTIDAD', 'ESTADO', 'PRECIO']
+
+
+def _celda_texto(texto, fuente, tamanio, ancho, estilo):
+    """
+    Celda de texto plano; solo si no cabe en la columna se usa un
+    Paragraph (que sí parte líneas).
+    """
+    texto = str(texto)
+    if stringWidth(texto, fuente, tamanio) <= ancho:
+        return texto
+    return Paragraph(escape(texto), estilo)
+
+
+def _fila_detalle(idx, codigo, nombre, cantidad, precio, estilos):
+    """
+    Fila de detalle con celdas de texto plano. Fuentes, colores y
+    alineación salen de los comandos por columna de ``_estilos_tabla_detalle``.
+    """
+    _, _, status_text = _get_status_color(cantidad)
+    
+    return [
+        str(idx),
+        _celda_texto(codigo, 'Courier-Bold', 8, _ANCHO_UTIL_CODIGO, estilos['cell_codigo']),
+        _celda_texto(nombre, 'Helvetica', 8, _ANCHO_UTIL_NOMBRE, estilos['cell']),
+        str(cantidad),
+        status_text,
+        _format_currency(precio),
+    ]
+
+
+def _fila_totales_detalle(stats, estilos):
+    return [
+        '',
+        '',
+        'TOTAL',
+        str(stats['total_unidades']),
+        '',
+        _format_currency(stats['valor_total']),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _comandos_base_detalle(con_encabezado, con_totales):
+    """Comandos de TableStyle que no dependen de las filas (se reutilizan)"""
+    inicio = 1 if con_encabezado else 0
+    fin_datos = -2 if con_totales else -1
+    
+    table_styles = [
+        # Cuerpo
+        ('FONTNAME', (0, inicio), (-1, fin_datos), 'Helvetica'),
+        ('FONTSIZE', (0, inicio), (-1, fin_datos), 8),
+        ('TEXTCOLOR', (0, inicio), (-1, -1), COLORS['text_primary']),
+        ('TOPPADDING', (0, inicio), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, inicio), (-1, -1), 6),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
         
-        # Fila de totales
-        table_data.append([
-            '',
-            '',
-            Paragraph('<font size="8"><b>TOTAL</b></font>', cell_style),
-            Paragraph(f'<font size="9"><b>{total_unidades}</b></font>', cell_center_style),
-            '',
-            Paragraph(f'<font size="8"><b>{_format_currency(valor_total)}</b></font>', cell_center_style),
-        ])
+        # Columnas: código en Courier, cantidad destacada, estado pequeño
+        ('FONTNAME', (1, inicio), (1, fin_datos), 'Courier-Bold'),
+        ('FONTNAME', (3, inicio), (3, fin_datos), 'Helvetica-Bold'),
+        ('FONTSIZE', (3, inicio), (3, fin_datos), 9),
+        ('FONTSIZE', (4, inicio), (4, fin_datos), 7),
         
-        # Crear tabla con anchos optimizados
-        inv_table = Table(
-            table_data, 
-            colWidths=[12*mm, 28*mm, 58*mm, 22*mm, 25*mm, 25*mm],
-            repeatRows=1  # Repetir header en cada página
-        )
+        # Alineaciones
+        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+        ('ALIGN', (3, 0), (3, -1), 'CENTER'),
+        ('ALIGN', (4, 0), (4, -1), 'CENTER'),
+        ('ALIGN', (5, 0), (5, -1), 'CENTER'),
         
-        # Estilos de la tabla
-        table_styles = [
+        # Bordes sutiles
+        ('LINEBELOW', (0, inicio), (-1, fin_datos), 0.25, COLORS['border']),
+    ]
+    
+    if con_encabezado:
+        table_styles[0:0] = [
             # Header
             ('BACKGROUND', (0, 0), (-1, 0), COLORS['primary']),
             ('TEXTCOLOR', (0, 0), (-1, 0), COLORS['white']),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 7),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
             ('TOPPADDING', (0, 0), (-1, 0), 8),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            
-            # Cuerpo
-            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -2), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Alineaciones
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (3, 0), (3, -1), 'CENTER'),
-            ('ALIGN', (4, 0), (4, -1), 'CENTER'),
-            ('ALIGN', (5, 0), (5, -1), 'CENTER'),
-            
-            # Bordes sutiles
-            ('LINEBELOW', (0, 0), (-1, 0), 1, COLORS['primary']),
-            ('LINEBELOW', (0, 1), (-1, -2), 0.25, COLORS['border']),
-            
+        ]
+        table_styles.insert(-1, ('LINEBELOW', (0, 0), (-1, 0), 1, COLORS['primary']))
+    
+    if con_totales:
+        table_styles += [
             # Fila de totales
             ('BACKGROUND', (0, -1), (-1, -1), COLORS['bg_light']),
             ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 8),
+            ('FONTSIZE', (3, -1), (3, -1), 9),
             ('LINEABOVE', (0, -1), (-1, -1), 1, COLORS['primary']),
         ]
-        
+    
+    return tuple(table_styles)
+
+
+def _estilos_tabla_detalle(cantidades, con_encabezado=True, con_totales=True, desplazamiento=0):
+    """
+    Comandos de TableStyle de la tabla de detalle.
+    
+    Args:
+        cantidades: cantidad de cada fila de datos, en orden
+        con_encabezado: la primera fila es el encabezado
+        con_totales: la última fila es la de totales
+        desplazamiento: filas de datos anteriores (numeración global en el
+            modo por bloques, para que el rayado no se reinicie)
+    """
+    inicio = 1 if con_encabezado else 0
+    table_styles = list(_comandos_base_detalle(con_encabezado, con_totales))
+    
+    for i, cantidad in enumerate(cantidades):
+        fila = inicio + i
         # Alternar colores de fila para mejor legibilidad
-        for i in range(1, len(table_data) - 1):
-            if i % 2 == 0:
-                table_styles.append(('BACKGROUND', (0, i), (-1, i), COLORS['bg_light']))
-        
-        # Colorear fondo de estados
-        for i, inv in enumerate(inventarios, 1):
-            cantidad = inv.get('cantidad', 0)
-            _, status_bg, _ = _get_status_color(cantidad)
-            table_styles.append(('BACKGROUND', (4, i), (4, i), status_bg))
-        
-        inv_table.setStyle(TableStyle(table_styles))
-        elements.append(inv_table)
-        
-    else:
-        # Estado vacío elegante
-        empty_data = [[
-            Paragraph(
-                '<font size="10" color="#94A3B8">No hay productos registrados en el inventario</font>',
-                ParagraphStyle('Empty', alignment=TA_CENTER)
-            )
-        ]]
-        empty_table = Table(empty_data, colWidths=[160*mm])
-        empty_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), COLORS['bg_light']),
-            ('BOX', (0, 0), (-1, -1), 0.5, COLORS['border']),
-            ('TOPPADDING', (0, 0), (-1, -1), 25),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 25),
-        ]))
-        elements.append(empty_table)
+        if (desplazamiento + i + 1) % 2 == 0:
+            table_styles.append(('BACKGROUND', (0, fila), (-1, fila), COLORS['bg_light']))
+        # Colorear el estado
+        status_color, status_bg, _ = _get_status_color(cantidad)
+        table_styles.append(('BACKGROUND', (4, fila), (4, fila), status_bg))
+        table_styles.append(('TEXTCOLOR', (4, fila), (4, fila), status_color))
+    
+    return table_styles
+
+
+def _tabla_detalle(inventarios, stats, estilos):
+    """Tabla de detalle completa (un solo Table con encabezado repetido)"""
+    # Construir datos de la tabla
+    table_data = [_fila_encabezado_detalle(estilos)]
+    cantidades = []
+    
+    for idx, inv in enumerate(inventarios, 1):
+        cantidad = inv.get('cantidad', 0)
+        cantidades.append(cantidad)
+        table_data.append(_fila_detalle(
+            idx,
+            inv.get('producto_codigo', '-'),
+            inv.get('producto_nombre', '-'),
+            cantidad,
+            inv.get('producto_precio', 0),
+            estilos,
+        ))
+    
+    # Fila de totales
+    table_data.append(_fila_totales_detalle(stats, estilos))
+    
+    # Crear tabla con anchos optimizados
+    inv_table = Table(
+        table_data, 
+        colWidths=ANCHOS_DETALLE,
+        repeatRows=1  # Repetir header en cada página
+    )
+    inv_table.setStyle(TableStyle(_estilos_tabla_detalle(cantidades)))
+    return inv_table
+
+
+def _bloques_detalle(filas, stats, estilos, filas_por_bloque):
+    """
+    Genera la tabla de detalle en bloques de ``filas_por_bloque`` filas.
+    
+    El encabezado se registra como ``SetTopFlowables``: ReportLab lo dibuja
+    al inicio de cada página, igual que ``repeatRows`` en la tabla única.
+    """
+    encabezado = Table([_fila_encabezado_detalle(estilos)], colWidths=ANCHOS_DETALLE)
+    encabezado.setStyle(TableStyle(_estilos_tabla_detalle([], con_totales=False)))
+    yield SetTopFlowables([encabezado], show=True)
+    
+    def _bloque(datos, cantidades, desplazamiento, con_totales):
+        tabla = Table(datos, colWidths=ANCHOS_DETALLE)
+        tabla.setStyle(TableStyle(_estilos_tabla_detalle(
+            cantidades,
+            con_encabezado=False,
+            con_totales=con_totales,
+            desplazamiento=desplazamiento,
+        )))
+        return tabla
     
-    # ═══════════════════════════════════════════════════════════════
-    # CONSTRUIR PDF
-    # ═══════════════════════════════════════════════════════════════
+    datos = []
+    cantidades = []
+    desplazamiento = 0
+    for idx, (codigo, nombre, cantidad, precio) in enumerate(filas, 1):
+        datos.append(_fila_detalle(idx, codigo, nombre, cantidad, precio, estilos))
+        cantidades.append(cantidad)
+        if len(datos) == filas_por_bloque:
+            yield _bloque(datos, cantidades, desplazamiento, con_totales=False)
+            desplazamiento = idx
+            datos = []
+            cantidades = []
+    
+    # Último bloque con la fila de totales
+    datos.append(_fila_totales_detalle(stats, estilos))
+    yield _bloque(datos, cantidades, desplazamiento, con_totales=True)
+    yield SetTopFlowables([])
+
+
+def _tabla_vacia():
+    # Estado vacío elegante
+    empty_data = [[
+        Paragraph(
+            '<font size="10" color="#94A3B8">No hay productos registrados en el inventario</font>',
+            ParagraphStyle('Empty', alignment=TA_CENTER)
+        )
+    ]]
+    empty_table = Table(empty_data, colWidths=[160*mm])
+    empty_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), COLORS['bg_light']),
+        ('BOX', (0, 0), (-1, -1), 0.5, COLORS['border']),
+        ('TOPPADDING', (0, 0), (-1, -1), 25),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 25),
+    ]))
+    return empty_table
+
+
+def _construir_pdf(destino, empresa, elements):
+    """Arma el documento con header y footer en cada página"""
+    # Fecha de generación formateada
+    fecha_generacion = datetime.now().strftime('%d de %B, %Y').capitalize()
+    
+    # Crear el documento con márgenes personalizados
+    doc = SimpleDocTemplate(
+        destino,
+        pagesize=A4,
+        rightMargin=25*mm,
+        leftMargin=25*mm,
+        topMargin=95*mm,  # Espacio para el header
+        bottomMargin=30*mm  # Espacio para el footer
+    )
     
     def add_header_footer(canvas_obj, doc):
         """Callback para agregar header y footer en cada página"""
@@ -550,39 +688,101 @@ def generar_pdf_inventario(empresa, inventarios):
     
     # Generar el documento
     doc.build(elements, onFirstPage=add_header_footer, onLaterPages=add_header_footer)
+
+
+def generar_pdf_inventario(empresa, inventarios):
+    """
+    Genera un PDF profesional y minimalista del inventario
+    
+    Args:
+        empresa: dict con datos de la empresa (nit, nombre, direccion, telefono)
+        inventarios: lista de dicts con datos del inventario
     
+    Returns:
+        bytes: Contenido del PDF
+    """
+    buffer = io.BytesIO()
+    escribir_pdf_inventario(empresa, inventarios, buffer)
     pdf_content = buffer.getvalue()
     buffer.close()
     
     return pdf_content
 
 
-def enviar_correo_resend(destinatario, asunto, cuerpo_html, adjunto_pdf=None, nombre_archivo='inventario.pdf'):
+def escribir_pdf_inventario(empresa, inventarios, destino):
     """
-    Envía un correo usando la API REST de Resend
+    Escribe en ``destino`` (archivo binario, p. ej. un ``EscritorConHash``)
+    el PDF de ``generar_pdf_inventario``.
+    """
+    estilos = _estilos_reporte()
+    stats = _estadisticas_inventario(inventarios)
+    
+    elements = _seccion_empresa(empresa, estilos)
+    elements += _seccion_resumen(stats, estilos)
+    elements.append(Paragraph('DETALLE DEL INVENTARIO', estilos['section_title']))
+    if inventarios:
+        elements.append(_tabla_detalle(inventarios, stats, estilos))
+    else:
+        elements.append(_tabla_vacia())
+    
+    _construir_pdf(destino, empresa, elements)
+
+
+def generar_pdf_inventario_por_bloques(empresa, filas, stats, destino,
+                                       filas_por_bloque=FILAS_POR_BLOQUE_PDF):
+    """
+    Genera el PDF de un inventario grande sin tener todas sus filas en memoria.
+    
+    Las filas se leen de un iterador (p. ej. un queryset con ``iterator()``)
+    y la tabla de detalle se arma en bloques a medida que ReportLab la
+    consume, así que solo hay unos pocos bloques de flowables vivos a la
+    vez. Los totales del resumen deben venir calculados (``stats``), ya que
+    se imprimen antes que el detalle.
     
     Args:
-        destinatario: email del destinatario
-        asunto: asunto del correo
-        cuerpo_html: contenido HTML del correo
-        adjunto_pdf: bytes del PDF a adjuntar (opcional)
-        nombre_archivo: nombre del archivo adjunto
+        empresa: dict con datos de la empresa
+        filas: iterable de tuplas (codigo, nombre, cantidad, precio)
+        stats: totales del resumen (ver ``EstadisticasReporte``)
+        destino: archivo binario donde se escribe el PDF
+        filas_por_bloque: filas por cada tabla del detalle
+    """
+    estilos = _estilos_reporte()
+    
+    def _elementos():
+        yield from _seccion_empresa(empresa, estilos)
+        yield from _seccion_resumen(stats, estilos)
+        yield Paragraph('DETALLE DEL INVENTARIO', estilos['section_title'])
+        if stats['total_productos']:
+            yield from _bloques_detalle(filas, stats, estilos, filas_por_bloque)
+        else:
+            yield _tabla_vacia()
     
-    Returns:
-        dict: Respuesta de la API
+    _construir_pdf(destino, empresa, _FlowablesPorBloques(_elementos()))
+
+
+class ResendNoConfigurado(ValueError):
+    """No hay RESEND_API_KEY: el correo no se intentó enviar por Resend."""
+
+
+def obtener_api_key_resend():
+    """
+    API key de Resend de settings o del entorno.
+
+    Raises:
+        ResendNoConfigurado: si no está configurada
     """
     api_key = getattr(settings, 'RESEND_API_KEY', os.environ.get('RESEND_API_KEY', ''))
     
     if not api_key:
-        raise ValueError("RESEND_API_KEY no configurada. Configura la variable de entorno o settings.RESEND_API_KEY")
-    
-    url = "https://api.resend.com/emails"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+        raise ResendNoConfigurado("RESEND_API_KEY no configurada. Configura la variable de entorno o settings.RESEND_API_KEY")
     
+    return api_key
+
+
+def construir_payload_resend(destinatario, asunto, cuerpo_html, adjunto_pdf=None, nombre_archivo='inventario.pdf'):
+    """
+    Arma el cuerpo JSON de un correo para la API de Resend
+    """
     payload = {
         "from": getattr(settings, 'EMAIL_FROM', 'Inventario <onboarding@resend.dev>'),
         "to": [destinatario],
@@ -599,15 +799,67 @@ def enviar_correo_resend(destinatario, asunto, cuerpo_html, adjunto_pdf=None, no
             }
         ]
     
-    response = requests.post(url, headers=headers, json=payload)
+    return payload
+
+
+def enviar_correo_resend(destinatario, asunto, cuerpo_html, adjunto_pdf=None, nombre_archivo='inventario.pdf'):
+    """
+    Envía un correo usando la API REST de Resend
+    
+    Args:
+        destinatario: email del destinatario
+        asunto: asunto del correo
+        cuerpo_html: contenido HTML del correo
+        adjunto_pdf: bytes del PDF a adjuntar (opcional)
+        nombre_archivo: nombre del archivo adjunto
+    
+    Returns:
+        dict: Respuesta de la API
+
+    Raises:
+        ResendNoConfigurado: si no hay RESEND_API_KEY
+        ErrorResend: si Resend rechaza el envío tras los reintentos
+    """
+    api_key = obtener_api_key_resend()
+    payload = construir_payload_resend(destinatario, asunto, cuerpo_html, adjunto_pdf, nombre_archivo)
     
-    if response.status_code not in [200, 201]:
-        raise Exception(f"Error enviando correo: {response.status_code} - {response.text}")
+    # Sesión compartida del proceso: pool de conexiones, timeouts y reintentos
+    return obtener_cliente(api_key).enviar(payload)
+
+
+async def aenviar_correo_resend(destinatario, asunto, cuerpo_html, adjunto_pdf=None, nombre_archivo='inventario.pdf'):
+    """
+    Versión async de ``enviar_correo_resend`` para las vistas async.
+    Sin ``httpx`` instalado, el cliente síncrono corre en un hilo aparte.
+    """
+    api_key = obtener_api_key_resend()
+    payload = construir_payload_resend(destinatario, asunto, cuerpo_html, adjunto_pdf, nombre_archivo)
     
-    return response.json()
+    if HTTPX_DISPONIBLE:
+        return await obtener_cliente_async(api_key).enviar(payload)
+    return await sync_to_async(obtener_cliente(api_key).enviar, thread_sensitive=False)(payload)
 
 
-def enviar_correo_django(destinatario, asunto, cuerpo, adjunto_pdf=None, nombre_archivo='inventario.pdf'):
+def enviar_lote_resend(payloads):
+    """
+    Envía un lote de correos ya armados (``construir_payload_resend``)
+    en una sola petición a Resend.
+    
+    Args:
+        payloads: hasta ``TAMANIO_LOTE`` correos
+    
+    Returns:
+        list: respuesta de cada correo, en el mismo orden
+    
+    Raises:
+        ResendNoConfigurado: si no hay RESEND_API_KEY
+        ErrorResend: si Resend rechaza el lote tras los reintentos
+    """
+    return obtener_cliente(obtener_api_key_resend()).enviar_lote(payloads)
+
+
+def enviar_correo_django(destinatario, asunto, cuerpo, adjunto_pdf=None, nombre_archivo='inventario.pdf',
+                         conexion=None):
     """
     Envía un correo usando el sistema de email de Django (configuración SMTP)
     
@@ -617,6 +869,7 @@ def enviar_correo_django(destinatario, asunto, cuerpo, adjunto_pdf=None, nombre_
         cuerpo: contenido del correo
         adjunto_pdf: bytes del PDF a adjuntar (opcional)
         nombre_archivo: nombre del archivo adjunto
+        conexion: conexión SMTP abierta para reutilizar en envíos seguidos (opcional)
     
     Returns:
         int: Número de correos enviados
@@ -626,6 +879,7 @@ def enviar_correo_django(destinatario, asunto, cuerpo, adjunto_pdf=None, nombre_
         body=cuerpo,
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@inventario.com'),
         to=[destinatario],
+        connection=conexion,
     )
     
     email.content_subtype = 'html'
@@ -886,6 +1140,33 @@ def generar_hash_documento(contenido: bytes) -> str:
     return hashlib.sha256(contenido).hexdigest()
 
 
+class EscritorConHash:
+    """
+    Archivo binario que calcula el SHA-256 de lo que se escribe en él.
+    
+    Se pasa como destino a ReportLab para que el hash del documento
+    (``generar_hash_documento``) esté listo al terminar de generar el PDF,
+    sin una segunda pasada sobre los bytes.
+    
+    Args:
+        destino: archivo binario donde se escriben los bytes
+    """
+    
+    def __init__(self, destino):
+        self.destino = destino
+        self._digest = hashlib.sha256()
+    
+    def write(self, datos):
+        self._digest.update(datos)
+        return self.destino.write(datos)
+    
+    def flush(self):
+        self.destino.flush()
+    
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
 def generar_hash_inventario(inventarios: list) -> str:
     """
     Genera un hash SHA-256 del contenido del inventario.
@@ -897,21 +1178,8 @@ def generar_hash_inventario(inventarios: list) -> str:
     Returns:
         Hash SHA-256 como string hexadecimal
     """
-    # Crear representación canónica del inventario
-    datos = []
-    for inv in inventarios:
-        datos.append({
-            'codigo': inv.get('producto_codigo', ''),
-            'nombre': inv.get('producto_nombre', ''),
-            'cantidad': inv.get('cantidad', 0),
-        })
-    
-    # Ordenar para consistencia
-    datos.sort(key=lambda x: x['codigo'])
-    
-    # Generar hash
-    contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False)
-    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    # Misma representación canónica que el historial de envíos
+    return HistorialEnvio.generar_hash_inventario(inventarios)
 
 
 def generar_codigo_qr(datos: str, tamanio: int = 100) -> bytes:
@@ -0,0 +1,549 @@
+"""
+Servicio de envío de reportes de inventario por correo.
+
+La API solo encola (``encolar_envio``): crea el HistorialEnvio en estado
+``pendiente`` y un TrabajoEnvio. El worker (``manage.py procesar_envios``)
+llama a ``procesar_trabajo``, que genera el PDF, el análisis IA, los
+hashes y entrega el correo.
+
+Los envíos masivos (``encolar_envio_lote``) crean un trabajo de tipo
+``lote`` por empresa: el reporte se genera una sola vez y se entrega a
+todos sus destinatarios; sin PDF adjunto, por el endpoint de lote de
+Resend (con adjunto, un correo por petición).
+
+Las vistas async entregan en la misma petición (``aenviar_ahora``): el
+trabajo se crea ya reservado para el proceso web y, si la entrega falla,
+vuelve a la cola para el worker.
+"""
+import logging
+import os
+import socket
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from litethinking_domain.models import ArbolMerkleInventario, HistorialEnvio, TrabajoEnvio
+from .email_service import (
+    generar_html_correo,
+    generar_html_correo_avanzado,
+    construir_payload_resend,
+    aenviar_correo_resend,
+    enviar_correo_resend,
+    enviar_lote_resend,
+    enviar_correo_django,
+    generar_hash_documento,
+    ResendNoConfigurado,
+    generar_hash_inventario,
+)
+from .ia_service import generar_resumen_para_correo
+from .inventario_service import (
+    acargar_snapshot_inventario,
+    cargar_snapshot_inventario,
+    empresa_a_dict,
+)
+from .pdf_cache import aobtener_pdf_con_hash, obtener_pdf_con_hash
+from .resend_client import TAMANIO_LOTE
+
+logger = logging.getLogger(__name__)
+
+
+def asunto_por_defecto(empresa):
+    return f"📦 Reporte de Inventario - {empresa.nombre}"
+
+
+def identificador_trabajador():
+    """Identificador del proceso worker (host:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def encolar_envio(empresa, usuario, email_destino, incluir_analisis_ia=True,
+                  incluir_blockchain=True, adjunto_pdf=None, reservar_para=None):
+    """
+    Registra un envío pendiente y lo deja en la cola.
+
+    Args:
+        empresa: instancia de Empresa
+        usuario: usuario que solicita el envío
+        email_destino: correo del destinatario
+        incluir_analisis_ia: incluir alertas y resumen IA
+        incluir_blockchain: calcular y mostrar los hashes del reporte
+        adjunto_pdf: bytes del PDF enviado por el cliente (opcional)
+        reservar_para: identificador de quien lo entregará de inmediato;
+            el trabajo nace tomado y el worker solo lo retoma si vence
+            el bloqueo o falla la entrega
+
+    Returns:
+        Tupla (historial, trabajo)
+    """
+    reserva = {}
+    if reservar_para:
+        ahora = timezone.now()
+        reserva = {
+            'estado': 'procesando',
+            'trabajador': reservar_para,
+            'bloqueado_hasta': ahora + TrabajoEnvio.DURACION_BLOQUEO,
+            'fecha_inicio': ahora,
+            'intentos': 1,
+        }
+    with transaction.atomic():
+        historial = HistorialEnvio.objects.create(
+            empresa=empresa,
+            usuario=usuario,
+            email_destino=email_destino,
+            asunto=asunto_por_defecto(empresa),
+            estado='pendiente',
+            documento_hash='',
+            contenido_hash='',
+        )
+        trabajo = TrabajoEnvio.objects.create(
+            tipo='individual',
+            parametros={
+                'incluir_analisis_ia': bool(incluir_analisis_ia),
+                'incluir_blockchain': bool(incluir_blockchain),
+            },
+            adjunto_pdf=adjunto_pdf,
+            **reserva,
+        )
+        trabajo.envios.add(historial)
+    return historial, trabajo
+
+
+def encolar_envio_lote(empresas, usuario, destinatarios, incluir_analisis_ia=True,
+                       incluir_blockchain=True, adjuntar_pdf=True):
+    """
+    Registra un envío por cada par empresa × destinatario.
+
+    Crea un TrabajoEnvio de tipo ``lote`` por empresa, de modo que el
+    worker genera el reporte de cada empresa una sola vez.
+
+    Args:
+        empresas: instancias de Empresa
+        usuario: usuario que solicita el envío
+        destinatarios: correos de destino
+        incluir_analisis_ia: incluir alertas y resumen IA
+        incluir_blockchain: calcular y mostrar los hashes del reporte
+        adjuntar_pdf: adjuntar el PDF. El endpoint de lote de Resend
+            (``TAMANIO_LOTE`` correos por petición) solo se usa sin
+            adjunto; con adjunto va un correo por petición
+
+    Returns:
+        Lista de TrabajoEnvio creados
+    """
+    trabajos = []
+    with transaction.atomic():
+        for empresa in empresas:
+            historiales = HistorialEnvio.objects.bulk_create([
+                HistorialEnvio(
+                    empresa=empresa,
+                    usuario=usuario,
+                    email_destino=email_destino,
+                    asunto=asunto_por_defecto(empresa),
+                    estado='pendiente',
+                    documento_hash='',
+                    contenido_hash='',
+                )
+                for email_destino in destinatarios
+            ])
+            trabajo = TrabajoEnvio.objects.create(
+                tipo='lote',
+                parametros={
+                    'incluir_analisis_ia': bool(incluir_analisis_ia),
+                    'incluir_blockchain': bool(incluir_blockchain),
+                    'adjuntar_pdf': bool(adjuntar_pdf),
+                },
+            )
+            trabajo.envios.add(*historiales)
+            trabajos.append(trabajo)
+    return trabajos
+
+
+def _entregar(email_destino, asunto, html_correo, pdf_content, nombre_archivo):
+    """
+    Entrega el correo por Resend o, si no hay API key, por SMTP de Django.
+
+    Returns:
+        Tupla (proveedor, respuesta_api)
+    """
+    try:
+        resultado = enviar_correo_resend(
+            destinatario=email_destino,
+            asunto=asunto,
+            cuerpo_html=html_correo,
+            adjunto_pdf=pdf_content,
+            nombre_archivo=nombre_archivo
+        )
+        return 'resend', resultado
+    except ResendNoConfigurado:
+        # Sin API key de Resend: intentar con Django Email
+        return _entregar_smtp(email_destino, asunto, html_correo, pdf_content, nombre_archivo)
+
+
+async def _aentregar(email_destino, asunto, html_correo, pdf_content, nombre_archivo):
+    """Versión async de ``_entregar``."""
+    try:
+        resultado = await aenviar_correo_resend(
+            destinatario=email_destino,
+            asunto=asunto,
+            cuerpo_html=html_correo,
+            adjunto_pdf=pdf_content,
+            nombre_archivo=nombre_archivo
+        )
+        return 'resend', resultado
+    except ResendNoConfigurado:
+        return await sync_to_async(_entregar_smtp, thread_sensitive=False)(
+            email_destino, asunto, html_correo, pdf_content, nombre_archivo
+        )
+
+
+def _entregar_smtp(email_destino, asunto, html_correo, pdf_content, nombre_archivo):
+    enviados = enviar_correo_django(
+        destinatario=email_destino,
+        asunto=asunto,
+        cuerpo=html_correo,
+        adjunto_pdf=pdf_content,
+        nombre_archivo=nombre_archivo
+    )
+    if enviados <= 0:
+        raise RuntimeError('No se pudo enviar el correo (0 enviados)')
+    return 'django_smtp', {}
+
+
+def generar_reporte(empresa, parametros, adjunto_pdf=None):
+    """
+    Genera el contenido de un envío (PDF, análisis IA, hashes y HTML).
+    No depende del destinatario, así que un lote lo genera una sola vez.
+
+    Returns:
+        dict con ``pdf``, ``html``, ``asunto``, ``nombre_archivo`` y los
+        campos del HistorialEnvio (``campos_historial``)
+    """
+    empresa_data = empresa_a_dict(empresa)
+    inventarios_data = cargar_snapshot_inventario(empresa.nit, empresa_data)
+
+    pdf_content = bytes(adjunto_pdf) if adjunto_pdf else None
+    hash_documento = None
+    if pdf_content is None and _requiere_pdf(parametros):
+        pdf_content, hash_documento = obtener_pdf_con_hash(empresa_data, inventarios_data)
+
+    resumen_ia, alertas = _analisis_ia(parametros, empresa_data, inventarios_data)
+    return _armar_reporte(
+        empresa, empresa_data, parametros, inventarios_data, pdf_content, resumen_ia, alertas,
+        hash_documento,
+    )
+
+
+async def agenerar_reporte(empresa, parametros, adjunto_pdf=None):
+    """
+    Versión async de ``generar_reporte``: el inventario se lee con el ORM
+    async y el PDF y el análisis IA se generan fuera del event loop.
+    """
+    empresa_data = empresa_a_dict(empresa)
+    inventarios_data = await acargar_snapshot_inventario(empresa.nit, empresa_data)
+
+    pdf_content = bytes(adjunto_pdf) if adjunto_pdf else None
+    hash_documento = None
+    if pdf_content is None and _requiere_pdf(parametros):
+        pdf_content, hash_documento = await aobtener_pdf_con_hash(empresa_data, inventarios_data)
+
+    resumen_ia, alertas = await sync_to_async(_analisis_ia, thread_sensitive=False)(
+        parametros, empresa_data, inventarios_data
+    )
+    return _armar_reporte(
+        empresa, empresa_data, parametros, inventarios_data, pdf_content, resumen_ia, alertas,
+        hash_documento,
+    )
+
+
+def _requiere_pdf(parametros):
+    return parametros.get('adjuntar_pdf', True) or parametros.get('incluir_blockchain', True)
+
+
+def _analisis_ia(parametros, empresa_data, inventarios_data):
+    """Tupla (resumen, alertas); vacía si no se pidió o si el análisis falla."""
+    if not parametros.get('incluir_analisis_ia', True):
+        return "", []
+    try:
+        return generar_resumen_para_correo(empresa_data, inventarios_data)
+    except Exception as ia_error:
+        logger.warning("Error en análisis IA: %s", ia_error)
+        return "", []
+
+
+def _armar_reporte(empresa, empresa_data, parametros, inventarios_data, pdf_content,
+                   resumen_ia, alertas, hash_documento=None):
+    """
+    ``hash_documento`` es el hash ya calculado al generar el PDF; solo un
+    adjunto recibido del cliente se hashea aquí.
+    """
+    incluir_analisis_ia = parametros.get('incluir_analisis_ia', True)
+    incluir_blockchain = parametros.get('incluir_blockchain', True)
+    adjuntar_pdf = parametros.get('adjuntar_pdf', True)
+
+    hash_contenido = None
+    arbol_merkle = None
+    if incluir_blockchain:
+        if hash_documento is None:
+            hash_documento = generar_hash_documento(pdf_content)
+        hash_contenido = generar_hash_inventario(inventarios_data)
+        arbol_merkle = ArbolMerkleInventario.desde_filas(zip(
+            inventarios_data.codigos, inventarios_data.nombres, inventarios_data.cantidades
+        ))
+    else:
+        hash_documento = None
+
+    total_productos = inventarios_data.total_productos
+    total_unidades = inventarios_data.total_unidades
+
+    if incluir_analisis_ia or incluir_blockchain:
+        html_correo = generar_html_correo_avanzado(
+            empresa_data,
+            total_productos,
+            total_unidades,
+            alertas=alertas if incluir_analisis_ia else None,
+            hash_documento=hash_documento if incluir_blockchain else None
+        )
+    else:
+        html_correo = generar_html_correo(empresa_data, total_productos, total_unidades)
+
+    asunto = asunto_por_defecto(empresa)
+    if any(a.get('prioridad') == 'critica' for a in alertas):
+        asunto = f"⚠️ Reporte de Inventario (Alertas) - {empresa.nombre}"
+
+    nombre_archivo = f"Inventario_{empresa.nombre.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
+
+    return {
+        'pdf': pdf_content if adjuntar_pdf else None,
+        'html': html_correo,
+        'asunto': asunto,
+        'nombre_archivo': nombre_archivo,
+        # Se guarda antes que el historial que lo referencia
+        'arbol_merkle': arbol_merkle,
+        'campos_historial': {
+            'asunto': asunto,
+            'documento_hash': hash_documento or '',
+            'contenido_hash': hash_contenido or '',
+            'arbol_merkle': arbol_merkle,
+            'total_productos': total_productos,
+            'total_unidades': total_unidades,
+            'valor_inventario': inventarios_data.valor_total,
+            'resumen_ia': resumen_ia,
+            'alertas_ia': alertas,
+        },
+    }
+
+
+def procesar_envio(historial, parametros, adjunto_pdf=None):
+    """
+    Genera el reporte de un HistorialEnvio pendiente y lo entrega.
+    Actualiza el historial con métricas, hashes, análisis IA y el
+    resultado del proveedor. Propaga la excepción si la entrega falla.
+    """
+    reporte = generar_reporte(historial.empresa, parametros, adjunto_pdf)
+
+    if reporte['arbol_merkle'] is not None:
+        reporte['arbol_merkle'].guardar()
+    for campo, valor in reporte['campos_historial'].items():
+        setattr(historial, campo, valor)
+    historial.save()
+
+    proveedor, resultado = _entregar(
+        historial.email_destino,
+        reporte['asunto'],
+        reporte['html'],
+        reporte['pdf'],
+        reporte['nombre_archivo'],
+    )
+
+    _marcar_enviado(historial, proveedor, resultado, timezone.now())
+    historial.save()
+    return historial
+
+
+async def aprocesar_envio(historial, parametros, adjunto_pdf=None):
+    """Versión async de ``procesar_envio``."""
+    reporte = await agenerar_reporte(historial.empresa, parametros, adjunto_pdf)
+
+    if reporte['arbol_merkle'] is not None:
+        await reporte['arbol_merkle'].aguardar()
+    for campo, valor in reporte['campos_historial'].items():
+        setattr(historial, campo, valor)
+    await historial.asave()
+
+    proveedor, resultado = await _aentregar(
+        historial.email_destino,
+        reporte['asunto'],
+        reporte['html'],
+        reporte['pdf'],
+        reporte['nombre_archivo'],
+    )
+
+    _marcar_enviado(historial, proveedor, resultado, timezone.now())
+    await historial.asave()
+    return historial
+
+
+def _marcar_enviado(historial, proveedor, respuesta, fecha):
+    historial.estado = 'enviado'
+    historial.proveedor = proveedor
+    historial.respuesta_api = respuesta
+    historial.mensaje_error = ''
+    historial.fecha_envio = fecha
+
+
+CAMPOS_ENVIADO = ['estado', 'proveedor', 'respuesta_api', 'mensaje_error', 'fecha_envio']
+
+
+def _entregar_lote_smtp(historiales, reporte):
+    with get_connection() as conexion:
+        for historial in historiales:
+            enviados = enviar_correo_django(
+                destinatario=historial.email_destino,
+                asunto=reporte['asunto'],
+                cuerpo=reporte['html'],
+                adjunto_pdf=reporte['pdf'],
+                nombre_archivo=reporte['nombre_archivo'],
+                conexion=conexion,
+            )
+            if enviados <= 0:
+                raise RuntimeError('No se pudo enviar el correo (0 enviados)')
+            yield historial, 'django_smtp', {}
+
+
+def _entregar_lote(historiales, reporte):
+    """
+    Entrega el mismo reporte a un grupo de hasta ``TAMANIO_LOTE``
+    destinatarios y genera (historial, proveedor, respuesta) a medida que
+    cada correo queda entregado.
+
+    Sin adjunto el grupo va en una petición a ``/emails/batch``. Con
+    adjunto (el valor por defecto) ese endpoint no sirve y cada correo es
+    una petición. Sin API key, el grupo usa una sola conexión SMTP.
+    """
+    if reporte['pdf'] is None:
+        payloads = [
+            construir_payload_resend(
+                historial.email_destino, reporte['asunto'], reporte['html']
+            )
+            for historial in historiales
+        ]
+        try:
+            respuestas = enviar_lote_resend(payloads)
+        except ResendNoConfigurado:
+            yield from _entregar_lote_smtp(historiales, reporte)
+            return
+        for historial, respuesta in zip(historiales, respuestas):
+            yield historial, 'resend', respuesta
+        return
+
+    for indice, historial in enumerate(historiales):
+        try:
+            respuesta = enviar_correo_resend(
+                destinatario=historial.email_destino,
+                asunto=reporte['asunto'],
+                cuerpo_html=reporte['html'],
+                adjunto_pdf=reporte['pdf'],
+                nombre_archivo=reporte['nombre_archivo'],
+            )
+        except ResendNoConfigurado:
+            # Se detecta antes de enviar nada: el resto del grupo va por SMTP
+            yield from _entregar_lote_smtp(historiales[indice:], reporte)
+            return
+        yield historial, 'resend', respuesta
+
+
+def procesar_lote(trabajo):
+    """
+    Procesa un trabajo de tipo ``lote``: todos sus envíos son de la misma
+    empresa, así que el reporte se genera una vez y se entrega en grupos
+    de ``TAMANIO_LOTE``. Cada correo queda marcado como enviado apenas se
+    entrega, de modo que un reintento solo reenvía lo que faltó.
+    """
+    pendientes = list(
+        trabajo.envios.select_related('empresa').exclude(estado='enviado').order_by('id')
+    )
+    if not pendientes:
+        return
+
+    reporte = generar_reporte(pendientes[0].empresa, trabajo.parametros, trabajo.adjunto_pdf)
+    if reporte['arbol_merkle'] is not None:
+        reporte['arbol_merkle'].guardar()
+    HistorialEnvio.objects.filter(
+        pk__in=[historial.pk for historial in pendientes]
+    ).update(**reporte['campos_historial'])
+
+    for inicio in range(0, len(pendientes), TAMANIO_LOTE):
+        grupo = pendientes[inicio:inicio + TAMANIO_LOTE]
+        for historial, proveedor, respuesta in _entregar_lote(grupo, reporte):
+            _marcar_enviado(historial, proveedor, respuesta, timezone.now())
+            historial.save(update_fields=CAMPOS_ENVIADO)
+
+
+def procesar_trabajo(trabajo):
+    """
+    Ejecuta un TrabajoEnvio ya reservado.
+
+    Returns:
+        True si se completó; False si falló (se reintentará o quedó fallido)
+    """
+    try:
+        if trabajo.tipo == 'lote':
+            procesar_lote(trabajo)
+        else:
+            pendientes = trabajo.envios.select_related('empresa').exclude(estado='enviado')
+            for historial in pendientes:
+                procesar_envio(historial, trabajo.parametros, trabajo.adjunto_pdf)
+    except Exception as error:
+        _registrar_fallo(trabajo, error)
+        return False
+
+    trabajo.marcar_completado()
+    return True
+
+
+async def aenviar_ahora(historial, trabajo):
+    """
+    Entrega en la misma petición un envío creado con
+    ``encolar_envio(..., reservar_para=...)``. Si falla, el trabajo vuelve
+    a la cola como cualquier otro intento fallido.
+
+    Returns:
+        True si el correo se entregó
+    """
+    try:
+        await aprocesar_envio(historial, trabajo.parametros, trabajo.adjunto_pdf)
+    except Exception as error:
+        await sync_to_async(_registrar_fallo)(trabajo, error)
+        return False
+
+    await sync_to_async(trabajo.marcar_completado)()
+    return True
+
+
+def _registrar_fallo(trabajo, error):
+    logger.error("Falló el trabajo de envío %s", trabajo.pk, exc_info=error)
+    if not trabajo.registrar_fallo(error):
+        trabajo.envios.exclude(estado='enviado').update(
+            estado='fallido',
+            mensaje_error=str(error),
+        )
+
+
+def procesar_cola(trabajador=None, limite=None):
+    """
+    Procesa trabajos disponibles hasta vaciar la cola o alcanzar ``limite``.
+
+    Returns:
+        Número de trabajos procesados
+    """
+    trabajador = trabajador or identificador_trabajador()
+    procesados = 0
+    while limite is None or procesados < limite:
+        trabajo = TrabajoEnvio.tomar_siguiente(trabajador)
+        if trabajo is None:
+            break
+        procesar_trabajo(trabajo)
+        procesados += 1
+    return procesados
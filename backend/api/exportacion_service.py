@@ -0,0 +1,222 @@
+"""
+Exportación del inventario y del historial de envíos.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=...)`` y se
+escriben a medida que llegan, de modo que ni el queryset ni el archivo
+completo quedan en memoria:
+
+- CSV y NDJSON se generan como texto por partes para un
+  ``StreamingHttpResponse`` (bajo ASGI, envueltas con ``aiterar_partes``);
+- Parquet y Arrow (columnares, requieren ``pyarrow``) se escriben por
+  lotes de ``TAMANIO_LOTE_EXPORTACION`` filas en un archivo temporal, ya
+  que el formato cierra con un pie que se escribe al final.
+
+Cada exportación se describe con una lista de columnas
+``(nombre, campo del ORM, tipo)``: ``COLUMNAS_INVENTARIO`` (Inventario con
+su Producto y Empresa) y ``COLUMNAS_HISTORIAL``.
+"""
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+# Librería opcional para los formatos columnares
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIBLE = True
+except ImportError:
+    PYARROW_DISPONIBLE = False
+
+TAMANIO_LOTE_EXPORTACION = 2000
+
+FORMATOS_TEXTO = ('csv', 'ndjson')
+FORMATOS_COLUMNARES = ('parquet', 'arrow')
+FORMATOS_EXPORTACION = FORMATOS_TEXTO + FORMATOS_COLUMNARES
+
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+COLUMNAS_INVENTARIO = (
+    ('id', 'id', 'entero'),
+    ('empresa_nit', 'producto__empresa_id', 'texto'),
+    ('empresa_nombre', 'producto__empresa__nombre', 'texto'),
+    ('producto_codigo', 'producto__codigo', 'texto'),
+    ('producto_nombre', 'producto__nombre', 'texto'),
+    ('producto_precios', 'producto__precios', 'json'),
+    ('cantidad', 'cantidad', 'entero'),
+    ('fecha_actualizacion', 'fecha_actualizacion', 'fecha'),
+)
+
+COLUMNAS_HISTORIAL = (
+    ('id', 'id', 'entero'),
+    ('empresa_nit', 'empresa_id', 'texto'),
+    ('empresa_nombre', 'empresa__nombre', 'texto'),
+    ('email_destino', 'email_destino', 'texto'),
+    ('asunto', 'asunto', 'texto'),
+    ('estado', 'estado', 'texto'),
+    ('proveedor', 'proveedor', 'texto'),
+    ('documento_hash', 'documento_hash', 'texto'),
+    ('contenido_hash', 'contenido_hash', 'texto'),
+    ('merkle_raiz', 'arbol_merkle_id', 'texto'),
+    ('total_productos', 'total_productos', 'entero'),
+    ('total_unidades', 'total_unidades', 'entero'),
+    ('valor_inventario', 'valor_inventario', 'decimal'),
+    ('fecha_creacion', 'fecha_creacion', 'fecha'),
+    ('fecha_envio', 'fecha_envio', 'fecha'),
+)
+
+
+class FormatoNoDisponible(Exception):
+    """El formato pedido requiere una librería que no está instalada."""
+
+
+def iterar_filas(columnas, queryset):
+    """
+    Tuplas con los valores de ``columnas``, leídas por lotes. Conserva el
+    orden del queryset (``?ordering=``, relevancia de ``?search=``) con la
+    llave como desempate; sin orden explícito, por llave.
+    """
+    return (
+        queryset.select_related(None)
+        .order_by(*queryset.query.order_by, 'pk')
+        .values_list(*[campo for _, campo, _ in columnas])
+        .iterator(chunk_size=TAMANIO_LOTE_EXPORTACION)
+    )
+
+
+def _texto(valor):
+    """Valor de una celda CSV o NDJSON."""
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class _Eco:
+    """Pseudo-archivo para ``csv.writer``: retorna la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(columnas, filas):
+    """Partes de texto del CSV (una por lote de filas)."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nombre for nombre, _, _ in columnas])
+    tipos = [tipo for _, _, tipo in columnas]
+    partes = []
+    for fila in filas:
+        partes.append(escritor.writerow([
+            json.dumps(valor, ensure_ascii=False) if tipo == 'json' else _texto(valor)
+            for valor, tipo in zip(fila, tipos)
+        ]))
+        if len(partes) >= TAMANIO_LOTE_EXPORTACION:
+            yield ''.join(partes)
+            partes = []
+    if partes:
+        yield ''.join(partes)
+
+
+def generar_ndjson(columnas, filas):
+    """Partes de texto del NDJSON (una por lote de filas)."""
+    nombres = [nombre for nombre, _, _ in columnas]
+    partes = []
+    for fila in filas:
+        partes.append(json.dumps(
+            {nombre: _texto(valor) for nombre, valor in zip(nombres, fila)},
+            ensure_ascii=False,
+        ) + '\n')
+        if len(partes) >= TAMANIO_LOTE_EXPORTACION:
+            yield ''.join(partes)
+            partes = []
+    if partes:
+        yield ''.join(partes)
+
+
+async def aiterar_partes(partes):
+    """
+    Itera desde código async un generador síncrono de partes (``generar_csv``,
+    ``generar_ndjson``), pidiendo una parte por vez en el hilo síncrono.
+
+    Bajo ASGI, ``StreamingHttpResponse`` consume un iterador síncrono
+    completo (``sync_to_async(list)``) antes de enviar la primera parte, así
+    que la exportación quedaría entera en memoria.
+    """
+    siguiente = sync_to_async(next)
+    fin = object()
+    try:
+        while (parte := await siguiente(partes, fin)) is not fin:
+            yield parte
+    finally:
+        # Si el cliente corta la descarga, libera el cursor del iterador
+        await sync_to_async(partes.close)()
+
+
+def _esquema_arrow(columnas):
+    tipos = {
+        'entero': pa.int64(),
+        'texto': pa.string(),
+        'json': pa.string(),
+        'decimal': pa.decimal128(15, 2),
+        'fecha': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(nombre, tipos[tipo]) for nombre, _, tipo in columnas])
+
+
+def _lote_arrow(columnas, esquema, filas):
+    datos = list(zip(*filas))
+    arreglos = []
+    for indice, (_, _, tipo) in enumerate(columnas):
+        valores = datos[indice]
+        if tipo == 'json':
+            valores = [None if v is None else json.dumps(v, ensure_ascii=False) for v in valores]
+        arreglos.append(pa.array(valores, type=esquema.field(indice).type))
+    return pa.RecordBatch.from_arrays(arreglos, schema=esquema)
+
+
+def escribir_columnar(columnas, filas, formato):
+    """
+    Escribe las filas en un archivo Parquet o Arrow (IPC) temporal, por
+    lotes.
+
+    Returns:
+        Archivo temporal abierto en modo binario
+
+    Raises:
+        FormatoNoDisponible: si ``pyarrow`` no está instalado
+    """
+    if not PYARROW_DISPONIBLE:
+        raise FormatoNoDisponible(
+            f'La exportación {formato} requiere pyarrow. Instala: pip install pyarrow'
+        )
+    esquema = _esquema_arrow(columnas)
+    descriptor, ruta = tempfile.mkstemp(suffix=f'.{formato}')
+    os.close(descriptor)
+    try:
+        if formato == 'parquet':
+            escritor = pq.ParquetWriter(ruta, esquema)
+        else:
+            escritor = pa.ipc.new_file(ruta, esquema)
+        lote = []
+        with escritor:
+            for fila in filas:
+                lote.append(fila)
+                if len(lote) >= TAMANIO_LOTE_EXPORTACION:
+                    escritor.write_batch(_lote_arrow(columnas, esquema, lote))
+                    lote = []
+            if lote:
+                escritor.write_batch(_lote_arrow(columnas, esquema, lote))
+        return open(ruta, 'rb')
+    finally:
+        # El archivo abierto sigue legible después de borrar la ruta
+        os.remove(ruta)
@@ -0,0 +1,45 @@
+"""
+Búsqueda de productos con el índice de texto completo.
+
+Reemplaza a ``SearchFilter`` (que arma ``icontains`` encadenados con OR,
+sin índice posible) en los listados de productos e inventario. Conserva el
+parámetro ``?search=``; con SQLite o PostgreSQL filtra con
+``busqueda_service`` y, si el cliente no pidió ``?ordering=``, ordena por
+relevancia. En otros motores, o si el texto no tiene palabras, se comporta
+como ``SearchFilter``.
+
+Va después de ``OrderingFilter`` en ``filter_backends`` para que el orden
+por relevancia no quede pisado por el orden por defecto. La paginación por
+cursor impone su propio orden (``nombre`` o ``fecha_actualizacion``): con
+``cursor``/``page_size`` se filtra igual, pero sin ordenar por relevancia.
+"""
+from django.db import connections
+from django.db.models import F
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .busqueda_service import RangoBusqueda, ids_coincidentes, palabras, soporta_busqueda
+
+
+class BusquedaProductoFilter(filters.SearchFilter):
+    """
+    La vista indica en ``busqueda_producto`` el campo con el producto
+    (``'pk'`` para productos, ``'producto'`` para inventario).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        texto = ' '.join(self.get_search_terms(request))
+        connection = connections[queryset.db]
+        if not palabras(texto) or not soporta_busqueda(connection):
+            return super().filter_queryset(request, queryset, view)
+
+        campo = getattr(view, 'busqueda_producto', 'pk')
+        queryset = queryset.filter(**{f'{campo}__in': ids_coincidentes(connection, texto)})
+        paginador = getattr(view, 'paginator', None)
+        if request.query_params.get(api_settings.ORDERING_PARAM) or (
+            paginador is not None and paginador.esta_activa(request)
+        ):
+            return queryset
+        return queryset.annotate(
+            rango_busqueda=RangoBusqueda(F(campo), texto)
+        ).order_by('-rango_busqueda', *(getattr(view, 'ordering', None) or ()))
@@ -1,28 +1,28 @@
-import json
-import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Tuple
-from decimal import Decimal
+from functools import cached_property
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-# Intentar importar librerías de IA opcionales
-try:
-    import openai
-    OPENAI_DISPONIBLE = True
-except ImportError:
-    OPENAI_DISPONIBLE = False
-
-try:
-    import anthropic
-    ANTHROPIC_DISPONIBLE = True
-except ImportError:
-    ANTHROPIC_DISPONIBLE = False
+from django.conf import settings
 
+from .analitica import (
+    UMBRAL_STOCK_BAJO,
+    UMBRAL_STOCK_CRITICO,
+    UMBRAL_STOCK_MEDIO,
+    MetricasInventario,
+)
+from .inventario_service import cargar_snapshot_inventario, empresa_a_dict
+from .llm_cache import clave_resumen, obtener_cache_llm
+from .llm_prompt import construir_contexto, hash_contexto
+from .llm_proveedores import ProveedorNoDisponible, obtener_proveedor
 
 class AnalisisInventarioIA:
-    UMBRAL_STOCK_CRITICO = 0
-    UMBRAL_STOCK_BAJO = 10
-    UMBRAL_STOCK_MEDIO = 50
+    UMBRAL_STOCK_CRITICO = UMBRAL_STOCK_CRITICO
+    UMBRAL_STOCK_BAJO = UMBRAL_STOCK_BAJO
+    UMBRAL_STOCK_MEDIO = UMBRAL_STOCK_MEDIO
     UMBRAL_VALOR_ALTO = 1000000  # COP
+    # Productos que se listan en cada alerta
+    PRODUCTOS_POR_ALERTA = 5
     
     def __init__(self, empresa: dict, inventarios: list):
         self.empresa = empresa
@@ -33,74 +33,78 @@ class AnalisisInventarioIA:
         self._calcular_metricas()
     
     def _calcular_metricas(self):
-        self.total_productos = len(self.inventarios)
-        self.total_unidades = sum(inv.get('cantidad', 0) for inv in self.inventarios)
-        
-        # Clasificar productos por stock
-        self.productos_sin_stock = []
-        self.productos_stock_bajo = []
-        self.productos_stock_medio = []
-        self.productos_stock_alto = []
-        
-        self.valor_total = Decimal('0')
+        # Buckets, totales y valoración por columnas (api/analitica.py), o
+        # ya calculados en la base de datos; los dicts de producto se
+        # construyen solo al mostrarlos
+        if isinstance(self.inventarios, MetricasInventario):
+            self.metricas = self.inventarios
+        else:
+            self.metricas = MetricasInventario(self.inventarios)
+        self.total_productos = self.metricas.total_productos
+        self.total_unidades = self.metricas.total_unidades
+        self.valor_total = self.metricas.valor_total
         
-        for inv in self.inventarios:
-            cantidad = inv.get('cantidad', 0)
-            precio = Decimal(str(inv.get('producto_precio', 0) or 0))
-            valor = cantidad * precio
-            self.valor_total += valor
-            
-            producto_info = {
-                'codigo': inv.get('producto_codigo', 'N/A'),
-                'nombre': inv.get('producto_nombre', 'N/A'),
-                'cantidad': cantidad,
-                'precio': float(precio),
-                'valor': float(valor),
-            }
-            
-            if cantidad == self.UMBRAL_STOCK_CRITICO:
-                self.productos_sin_stock.append(producto_info)
-            elif cantidad <= self.UMBRAL_STOCK_BAJO:
-                self.productos_stock_bajo.append(producto_info)
-            elif cantidad <= self.UMBRAL_STOCK_MEDIO:
-                self.productos_stock_medio.append(producto_info)
-            else:
-                self.productos_stock_alto.append(producto_info)
+        self.n_sin_stock = self.metricas.conteos['sin_stock']
+        self.n_stock_bajo = self.metricas.conteos['stock_bajo']
+        self.n_stock_medio = self.metricas.conteos['stock_medio']
+        self.n_stock_alto = self.metricas.conteos['stock_alto']
         
         # Porcentajes
         if self.total_productos > 0:
-            self.pct_sin_stock = (len(self.productos_sin_stock) / self.total_productos) * 100
-            self.pct_stock_bajo = (len(self.productos_stock_bajo) / self.total_productos) * 100
-            self.pct_stock_saludable = ((len(self.productos_stock_medio) + len(self.productos_stock_alto)) / self.total_productos) * 100
+            self.pct_sin_stock = self.metricas.porcentaje('sin_stock')
+            self.pct_stock_bajo = self.metricas.porcentaje('stock_bajo')
+            self.pct_stock_saludable = self.metricas.porcentaje('stock_medio', 'stock_alto')
         else:
             self.pct_sin_stock = 0
             self.pct_stock_bajo = 0
             self.pct_stock_saludable = 100
     
+    @cached_property
+    def productos_sin_stock(self) -> List[Dict]:
+        return self.metricas.productos('sin_stock')
+    
+    @cached_property
+    def productos_stock_bajo(self) -> List[Dict]:
+        return self.metricas.productos('stock_bajo')
+    
+    @cached_property
+    def productos_stock_medio(self) -> List[Dict]:
+        return self.metricas.productos('stock_medio')
+    
+    @cached_property
+    def productos_stock_alto(self) -> List[Dict]:
+        return self.metricas.productos('stock_alto')
+    
     def generar_alertas(self) -> List[Dict]:
         alertas = []
         
         # 🔴 Alerta crítica: Productos sin stock
-        if self.productos_sin_stock:
+        if self.n_sin_stock:
             alertas.append({
                 'prioridad': 'critica',
                 'tipo': 'stock_agotado',
                 'icono': '🔴',
                 'titulo': 'Productos Agotados',
-                'mensaje': f'{len(self.productos_sin_stock)} producto(s) sin stock disponible',
-                'productos': [p['nombre'] for p in self.productos_sin_stock[:5]],
+                'mensaje': f'{self.n_sin_stock} producto(s) sin stock disponible',
+                'productos': [
+                    p['nombre']
+                    for p in self.metricas.productos('sin_stock', self.PRODUCTOS_POR_ALERTA)
+                ],
                 'accion_sugerida': 'Reabastecer inmediatamente para evitar pérdida de ventas'
             })
         
         # 🟠 Alerta alta: Stock bajo
-        if self.productos_stock_bajo:
+        if self.n_stock_bajo:
             alertas.append({
                 'prioridad': 'alta',
                 'tipo': 'stock_bajo',
                 'icono': '🟠',
                 'titulo': 'Stock Bajo',
-                'mensaje': f'{len(self.productos_stock_bajo)} producto(s) con menos de {self.UMBRAL_STOCK_BAJO} unidades',
-                'productos': [f"{p['nombre']} ({p['cantidad']} uds)" for p in self.productos_stock_bajo[:5]],
+                'mensaje': f'{self.n_stock_bajo} producto(s) con menos de {self.UMBRAL_STOCK_BAJO} unidades',
+                'productos': [
+                    f"{p['nombre']} ({p['cantidad']} uds)"
+                    for p in self.metricas.productos('stock_bajo', self.PRODUCTOS_POR_ALERTA)
+                ],
                 'accion_sugerida': 'Planificar reabastecimiento en los próximos días'
             })
         
@@ -173,9 +177,9 @@ Fecha de análisis: {fecha_str} a las {hora_str}
 
 📈 DISTRIBUCIÓN DE STOCK
 ────────────────────────
-• Sin stock: {len(self.productos_sin_stock)} ({self.pct_sin_stock:.1f}%)
-• Stock bajo (≤10): {len(self.productos_stock_bajo)} ({self.pct_stock_bajo:.1f}%)
-• Stock saludable: {len(self.productos_stock_medio) + len(self.productos_stock_alto)} ({self.pct_stock_saludable:.1f}%)
+• Sin stock: {self.n_sin_stock} ({self.pct_sin_stock:.1f}%)
+• Stock bajo (≤10): {self.n_stock_bajo} ({self.pct_stock_bajo:.1f}%)
+• Stock saludable: {self.n_stock_medio + self.n_stock_alto} ({self.pct_stock_saludable:.1f}%)
 
 🎯 ESTADO GENERAL: {estado}
 {recomendacion}
@@ -188,33 +192,33 @@ Fecha de análisis: {fecha_str} a las {hora_str}
         recomendaciones = []
         
         # Recomendaciones de reabastecimiento
-        if self.productos_sin_stock:
+        if self.n_sin_stock:
             recomendaciones.append({
                 'tipo': 'reabastecimiento_urgente',
                 'prioridad': 1,
                 'titulo': '🚨 Reabastecimiento Urgente',
-                'descripcion': f'Los siguientes {len(self.productos_sin_stock)} productos están agotados y requieren reabastecimiento inmediato:',
+                'descripcion': f'Los siguientes {self.n_sin_stock} productos están agotados y requieren reabastecimiento inmediato:',
                 'items': [p['nombre'] for p in self.productos_sin_stock],
                 'impacto': 'Alto - Pérdida potencial de ventas'
             })
         
-        if self.productos_stock_bajo:
+        if self.n_stock_bajo:
             recomendaciones.append({
                 'tipo': 'reabastecimiento_planificado',
                 'prioridad': 2,
                 'titulo': '📋 Planificar Reabastecimiento',
-                'descripcion': f'{len(self.productos_stock_bajo)} productos tienen stock bajo:',
+                'descripcion': f'{self.n_stock_bajo} productos tienen stock bajo:',
                 'items': [f"{p['nombre']} ({p['cantidad']} uds)" for p in self.productos_stock_bajo],
                 'impacto': 'Medio - Riesgo de agotamiento próximo'
             })
         
         # Recomendación de optimización
-        if len(self.productos_stock_alto) > self.total_productos * 0.5:
+        if self.n_stock_alto > self.total_productos * 0.5:
             recomendaciones.append({
                 'tipo': 'optimizacion',
                 'prioridad': 3,
                 'titulo': '💡 Optimización de Inventario',
-                'descripcion': f'{len(self.productos_stock_alto)} productos tienen stock alto. Considerar:',
+                'descripcion': f'{self.n_stock_alto} productos tienen stock alto. Considerar:',
                 'items': [
                     'Revisar rotación de productos',
                     'Analizar costos de almacenamiento',
@@ -273,87 +277,117 @@ def generar_resumen_para_correo(empresa: dict, inventarios: list) -> Tuple[str,
     return analizador.generar_resumen_ejecutivo(), analizador.generar_alertas()
 
 
-def generar_resumen_con_openai(empresa: dict, inventarios: list) -> str:
-    if not OPENAI_DISPONIBLE:
-        return "OpenAI no está disponible. Instala: pip install openai"
+# Versión del prompt de los resúmenes LLM: cambiarla invalida la caché
+VERSION_PROMPT = 2
+
+
+def resumen_llm_en_cache(proveedor: str, modelo: str, empresa: dict, inventarios: list, llamar) -> str:
+    """
+    Resumen de un LLM para el inventario, desde la caché de resúmenes
+    (``api/llm_cache.py``) o llamando a ``llamar(contexto)``. La llave es el
+    hash del contexto que se envía al modelo (incluye precios y valores),
+    así que cualquier cambio que el modelo vería invalida la respuesta.
+    Peticiones concurrentes con el mismo contexto comparten una llamada.
     
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        return "OPENAI_API_KEY no configurada"
+    Args:
+        proveedor: nombre del proveedor ('openai', 'anthropic', ...)
+        modelo: modelo que responde
+        empresa: Diccionario con datos de la empresa
+        inventarios: Lista de inventarios a resumir
+        llamar: función que recibe el contexto y retorna el texto del modelo
+    """
+    contexto = construir_contexto(empresa, inventarios)
+    clave = clave_resumen(
+        proveedor,
+        modelo,
+        VERSION_PROMPT,
+        empresa.get('nit'),
+        hash_contexto(contexto),
+    )
+    return obtener_cache_llm().obtener_o_calcular(clave, lambda: llamar(contexto))
+
+
+def resumir_con_proveedor(nombre: str, empresa: dict, inventarios: list) -> str:
+    """
+    Resumen del inventario con el proveedor registrado ``nombre``
+    (``api/llm_proveedores.py``).
     
+    Raises:
+        ProveedorNoDisponible: si falta el SDK o la API key
+        Exception: los errores del SDK al llamar al modelo
+    """
+    proveedor = obtener_proveedor(nombre)
+    proveedor.verificar()
+    return resumen_llm_en_cache(
+        proveedor.nombre, proveedor.modelo, empresa, inventarios, proveedor.completar
+    )
+
+
+def _generar_resumen(nombre: str, etiqueta: str, empresa: dict, inventarios: list) -> str:
     try:
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Preparar contexto
-        contexto = {
-            'empresa': empresa.get('nombre'),
-            'total_productos': len(inventarios),
-            'productos': [
-                {
-                    'nombre': inv.get('producto_nombre'),
-                    'cantidad': inv.get('cantidad', 0)
-                }
-                for inv in inventarios[:20]  # Limitar para no exceder tokens
-            ]
-        }
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Eres un experto en gestión de inventarios. Genera un análisis breve y profesional del inventario proporcionado. Incluye alertas de stock bajo y recomendaciones."
-                },
-                {
-                    "role": "user",
-                    "content": f"Analiza este inventario: {json.dumps(contexto, ensure_ascii=False)}"
-                }
-            ],
-            max_tokens=500
-        )
-        
-        return response.choices[0].message.content
-        
+        return resumir_con_proveedor(nombre, empresa, inventarios)
+    except ProveedorNoDisponible as e:
+        return str(e)
     except Exception as e:
-        return f"Error al generar resumen con OpenAI: {str(e)}"
+        return f"Error al generar resumen con {etiqueta}: {str(e)}"
+
+
+def generar_resumen_con_openai(empresa: dict, inventarios: list) -> str:
+    return _generar_resumen('openai', 'OpenAI', empresa, inventarios)
 
 
 def generar_resumen_con_anthropic(empresa: dict, inventarios: list) -> str:
-    if not ANTHROPIC_DISPONIBLE:
-        return "Anthropic no está disponible. Instala: pip install anthropic"
+    return _generar_resumen('anthropic', 'Claude', empresa, inventarios)
+
+
+def resumir_empresas(
+    empresas: Iterable,
+    proveedor: str = 'openai',
+    concurrencia: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Resume el inventario de muchas empresas con hasta ``concurrencia``
+    llamadas al LLM en paralelo (por defecto ``LLM_CONCURRENCIA``).
     
-    api_key = os.environ.get('ANTHROPIC_API_KEY')
-    if not api_key:
-        return "ANTHROPIC_API_KEY no configurada"
+    El inventario de cada empresa se lee en el hilo que llama y solo
+    cuando hay un cupo libre, así que en memoria hay a lo sumo
+    ``concurrencia`` inventarios. Las llamadas corren en un pool de
+    hilos; el cliente del proveedor corta cada una a los ``LLM_TIMEOUT``
+    segundos.
     
-    try:
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        # Preparar contexto
-        contexto = {
-            'empresa': empresa.get('nombre'),
-            'total_productos': len(inventarios),
-            'productos': [
-                {
-                    'nombre': inv.get('producto_nombre'),
-                    'cantidad': inv.get('cantidad', 0)
-                }
-                for inv in inventarios[:20]
-            ]
-        }
-        
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=500,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Como experto en gestión de inventarios, analiza brevemente este inventario y proporciona alertas y recomendaciones: {json.dumps(contexto, ensure_ascii=False)}"
-                }
-            ]
-        )
-        
-        return message.content[0].text
-        
-    except Exception as e:
-        return f"Error al generar resumen con Claude: {str(e)}"
+    Args:
+        empresas: instancias de Empresa (p. ej. un queryset)
+        proveedor: nombre del proveedor registrado
+        concurrencia: llamadas simultáneas como máximo
+    
+    Raises:
+        ProveedorNoDisponible: si falta el SDK o la API key
+    
+    Yields:
+        Tuplas (nit, resumen, error) en el orden en que terminan
+    """
+    obtener_proveedor(proveedor).verificar()
+    concurrencia = concurrencia or getattr(settings, 'LLM_CONCURRENCIA', 4)
+    
+    def resultado(futuro):
+        nit = futuros.pop(futuro)
+        try:
+            return nit, futuro.result(), None
+        except Exception as e:
+            return nit, None, str(e)
+    
+    futuros = {}
+    with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='resumen-llm') as executor:
+        for empresa in empresas:
+            if len(futuros) >= concurrencia:
+                listos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    yield resultado(futuro)
+            empresa_data = empresa_a_dict(empresa)
+            inventarios = cargar_snapshot_inventario(empresa.nit, empresa_data)
+            futuro = executor.submit(resumir_con_proveedor, proveedor, empresa_data, inventarios)
+            futuros[futuro] = empresa.nit
+        while futuros:
+            listos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                yield resultado(futuro)
@@ -0,0 +1,370 @@
+"""
+Importación masiva del catálogo (empresas, productos y stock inicial).
+
+Lee un archivo CSV o NDJSON fila por fila, sin cargarlo completo, y lo
+procesa en lotes de ``TAMANIO_LOTE_IMPORTACION`` filas. Cada lote va en su
+propia transacción:
+
+- las empresas con ``empresa_nombre`` se crean o actualizan
+  (``bulk_create`` con upsert sobre el NIT); las demás deben existir;
+- los productos se crean o actualizan con un upsert sobre ``codigo``;
+- los productos sin fila de Inventario reciben una con ``cantidad`` como
+  stock inicial. El stock de los que ya tienen inventario no se toca
+  (para eso está el ajuste masivo de ``ajuste_service``).
+
+Las operaciones masivas no disparan señales: al final (aunque la
+importación falle a mitad) se recalcula el ``ResumenInventario`` de cada
+empresa con algún lote confirmado.
+
+Una fila que no se puede leer (no es UTF-8, CSV mal formado, JSON
+inválido) cuenta como error de esa fila y la importación sigue.
+
+Columnas (CSV) o llaves (NDJSON): ``empresa`` (NIT), ``codigo``,
+``nombre``, ``caracteristicas``, ``precios`` (objeto JSON; en CSV también
+``precio_<MONEDA>``), ``cantidad`` y, para crear la empresa,
+``empresa_nombre``, ``empresa_direccion`` y ``empresa_telefono``.
+"""
+import csv
+import json
+import math
+import os
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from litethinking_domain.models import Empresa, Inventario, Producto, ResumenInventario
+
+FORMATOS = ('csv', 'ndjson')
+EXTENSIONES = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+TAMANIO_LOTE_IMPORTACION = 1000
+# Errores por fila que se detallan en el resultado (el conteo es completo)
+MAX_ERRORES_DETALLADOS = 100
+PREFIJO_PRECIO = 'precio_'
+# Campos de Empresa que una fila puede omitir sin borrar el valor guardado
+CAMPOS_OPCIONALES_EMPRESA = ('direccion', 'telefono')
+
+
+def formato_por_nombre(nombre):
+    """Formato según la extensión del archivo, o None."""
+    return EXTENSIONES.get(os.path.splitext(nombre or '')[1].lower())
+
+
+class FilaIlegible(ValueError):
+    """Fila que no se pudo leer del archivo (codificación o CSV inválidos)."""
+
+
+def _lineas_texto(archivo, ilegibles):
+    """
+    Decodifica cada línea del archivo por separado, para que una línea que
+    no es UTF-8 no corte la lectura del resto. Sus números van a
+    ``ilegibles`` (y la línea, con reemplazos, al lector CSV).
+    """
+    for numero, linea in enumerate(archivo, start=1):
+        try:
+            yield linea.decode('utf-8-sig' if numero == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            ilegibles.add(numero)
+            yield linea.decode('utf-8', errors='replace')
+
+
+def _leer_csv(archivo):
+    ilegibles = set()
+    lector = csv.DictReader(_lineas_texto(archivo, ilegibles))
+    # Tras un csv.Error, DictReader.line_num no avanza; el del lector sí
+    lineas = lector.reader
+    try:
+        if lector.fieldnames is None:
+            return
+    except csv.Error as error:
+        yield lineas.line_num, FilaIlegible(f'Encabezado CSV inválido: {error}')
+        return
+    if ilegibles:
+        yield lineas.line_num, FilaIlegible('Encabezado con codificación inválida (se espera UTF-8)')
+        return
+
+    while True:
+        anterior = lineas.line_num
+        try:
+            fila = next(lector)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            if lineas.line_num == anterior:
+                raise
+            ilegibles.clear()
+            yield lineas.line_num, FilaIlegible(f'CSV inválido: {error}')
+            continue
+        if ilegibles:
+            # Alguna de las líneas de la fila no era UTF-8
+            ilegibles.clear()
+            yield lineas.line_num, FilaIlegible('Codificación inválida (se espera UTF-8)')
+        else:
+            yield lineas.line_num, fila
+
+
+def leer_filas(archivo, formato):
+    """
+    Itera las filas de un archivo binario como tuplas (línea, fila cruda).
+    La fila es un dict (CSV) o el texto de la línea (NDJSON); una fila CSV
+    que no se pudo leer llega como ``FilaIlegible`` y la lectura sigue con
+    la siguiente.
+    """
+    if formato == 'csv':
+        yield from _leer_csv(archivo)
+        return
+    for numero, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if linea:
+            yield numero, linea
+
+
+def _texto(fila, campo, largo, requerido=False):
+    valor = fila.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if requerido and not valor:
+        raise ValueError(f'Falta {campo}')
+    if len(valor) > largo:
+        raise ValueError(f'{campo} supera {largo} caracteres')
+    return valor
+
+
+def _numero(valor, campo):
+    if isinstance(valor, bool):
+        raise ValueError(f'{campo} debe ser numérico')
+    if isinstance(valor, (int, float)):
+        numero = valor
+    else:
+        try:
+            texto = str(valor).strip()
+            numero = int(texto) if texto.lstrip('-').isdigit() else float(texto)
+        except ValueError:
+            raise ValueError(f'{campo} debe ser numérico') from None
+    # NaN e infinito no son JSON válido: la base de datos rechazaría el lote
+    if isinstance(numero, float) and not math.isfinite(numero):
+        raise ValueError(f'{campo} debe ser un número finito')
+    return numero
+
+
+def _precios(fila):
+    precios = fila.get('precios')
+    if isinstance(precios, str):
+        try:
+            precios = json.loads(precios) if precios.strip() else {}
+        except ValueError:
+            raise ValueError('precios no es JSON válido') from None
+    if not isinstance(precios or {}, dict):
+        raise ValueError('precios debe ser un objeto')
+    precios = dict(precios or {})
+    for campo, valor in fila.items():
+        if campo and campo.startswith(PREFIJO_PRECIO) and valor not in (None, ''):
+            precios[campo[len(PREFIJO_PRECIO):].upper()] = valor
+    resultado = {}
+    for moneda, valor in precios.items():
+        precio = _numero(valor, f'precio {moneda}')
+        if precio < 0:
+            raise ValueError(f'precio {moneda} no puede ser negativo')
+        resultado[moneda.upper()] = precio
+    return resultado
+
+
+def normalizar_fila(cruda):
+    """
+    Fila validada como dict de campos del modelo.
+
+    Raises:
+        ValueError: con el mensaje de error de la fila
+    """
+    if isinstance(cruda, FilaIlegible):
+        raise cruda
+    if isinstance(cruda, (str, bytes)):
+        try:
+            cruda = json.loads(cruda)
+        except UnicodeDecodeError:
+            raise ValueError('Codificación inválida (se espera UTF-8)') from None
+        except ValueError:
+            raise ValueError('JSON inválido') from None
+    if not isinstance(cruda, dict):
+        raise ValueError('Cada fila debe ser un objeto')
+
+    cantidad = cruda.get('cantidad')
+    if cantidad in (None, ''):
+        cantidad = 0
+    cantidad = _numero(cantidad, 'cantidad')
+    if not isinstance(cantidad, int) or cantidad < 0:
+        raise ValueError('cantidad debe ser un entero no negativo')
+
+    return {
+        'empresa': _texto(cruda, 'empresa', 20, requerido=True),
+        'empresa_nombre': _texto(cruda, 'empresa_nombre', 150),
+        'empresa_direccion': _texto(cruda, 'empresa_direccion', 255),
+        'empresa_telefono': _texto(cruda, 'empresa_telefono', 20),
+        'codigo': _texto(cruda, 'codigo', 50, requerido=True),
+        'nombre': _texto(cruda, 'nombre', 150, requerido=True),
+        'caracteristicas': _texto(cruda, 'caracteristicas', 10000),
+        'precios': _precios(cruda),
+        'cantidad': cantidad,
+    }
+
+
+class ResultadoImportacion:
+    """Conteos y errores de una importación."""
+
+    def __init__(self):
+        self.filas = 0
+        self.productos_creados = 0
+        self.productos_actualizados = 0
+        self.inventarios_creados = 0
+        self.errores = 0
+        self.detalle_errores = []
+        self.empresas = set()
+
+    def error(self, linea, mensaje, codigo=None):
+        self.errores += 1
+        if len(self.detalle_errores) < MAX_ERRORES_DETALLADOS:
+            self.detalle_errores.append({'linea': linea, 'codigo': codigo, 'error': mensaje})
+
+    def como_dict(self):
+        return {
+            'filas': self.filas,
+            'productos_creados': self.productos_creados,
+            'productos_actualizados': self.productos_actualizados,
+            'inventarios_creados': self.inventarios_creados,
+            'errores': self.errores,
+            'detalle_errores': self.detalle_errores,
+        }
+
+
+def _upsert_empresas(filas):
+    """
+    Crea o actualiza las empresas que traen nombre; retorna los NIT
+    válidos. De una empresa que ya existe solo se actualizan los campos
+    que trae la fila (una dirección vacía no borra la guardada).
+    """
+    nuevas = {}
+    for _, fila in filas:
+        if fila['empresa_nombre']:
+            campos = ('nombre',) + tuple(
+                campo for campo in CAMPOS_OPCIONALES_EMPRESA if fila[f'empresa_{campo}']
+            )
+            nuevas[fila['empresa']] = (campos, Empresa(
+                nit=fila['empresa'],
+                nombre=fila['empresa_nombre'],
+                direccion=fila['empresa_direccion'],
+                telefono=fila['empresa_telefono'],
+            ))
+
+    # Un upsert por combinación de campos presentes
+    por_campos = {}
+    for campos, empresa in nuevas.values():
+        por_campos.setdefault(campos, []).append(empresa)
+    for campos, empresas in por_campos.items():
+        Empresa.objects.bulk_create(
+            empresas,
+            update_conflicts=True,
+            unique_fields=['nit'],
+            update_fields=list(campos),
+        )
+    pendientes = {fila['empresa'] for _, fila in filas} - nuevas.keys()
+    return nuevas.keys() | set(
+        Empresa.objects.filter(nit__in=pendientes).values_list('nit', flat=True)
+    )
+
+
+def _importar_lote(filas, resultado):
+    """Importa un lote de (línea, fila normalizada) en una transacción."""
+    with transaction.atomic():
+        empresas = _upsert_empresas(filas)
+        actuales = {
+            codigo: (empresa_id, tiene_inventario)
+            for codigo, empresa_id, tiene_inventario in (
+                Producto.objects
+                .filter(codigo__in={fila['codigo'] for _, fila in filas})
+                .annotate(tiene_inventario=Exists(
+                    Inventario.objects.filter(producto_id=OuterRef('pk'))
+                ))
+                .order_by()
+                .values_list('codigo', 'empresa_id', 'tiene_inventario')
+            )
+        }
+
+        # Una fila por código (gana la última), sin mover productos entre empresas
+        por_codigo = {}
+        for linea, fila in filas:
+            codigo = fila['codigo']
+            if fila['empresa'] not in empresas:
+                resultado.error(linea, 'Empresa no encontrada', codigo)
+            elif codigo in actuales and actuales[codigo][0] != fila['empresa']:
+                resultado.error(linea, 'El código pertenece a otra empresa', codigo)
+            else:
+                por_codigo[codigo] = fila
+        if not por_codigo:
+            return
+
+        Producto.objects.bulk_create(
+            [
+                Producto(
+                    codigo=codigo,
+                    nombre=fila['nombre'],
+                    caracteristicas=fila['caracteristicas'],
+                    precios=fila['precios'],
+                    empresa_id=fila['empresa'],
+                )
+                for codigo, fila in por_codigo.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['codigo'],
+            update_fields=['nombre', 'caracteristicas', 'precios'],
+        )
+
+        sin_inventario = [codigo for codigo in por_codigo if not actuales.get(codigo, (None, False))[1]]
+        ids = dict(
+            Producto.objects.filter(codigo__in=sin_inventario).order_by().values_list('codigo', 'id')
+        )
+        Inventario.objects.bulk_create([
+            Inventario(producto_id=ids[codigo], cantidad=por_codigo[codigo]['cantidad'])
+            for codigo in sin_inventario
+        ])
+
+    creados = sum(1 for codigo in por_codigo if codigo not in actuales)
+    resultado.productos_creados += creados
+    resultado.productos_actualizados += len(por_codigo) - creados
+    resultado.inventarios_creados += len(sin_inventario)
+    resultado.empresas.update(fila['empresa'] for fila in por_codigo.values())
+
+
+def importar_catalogo(archivo, formato, tamanio_lote=TAMANIO_LOTE_IMPORTACION):
+    """
+    Importa un archivo CSV o NDJSON de productos y stock inicial.
+
+    Args:
+        archivo: archivo binario abierto (se lee una sola vez, por filas)
+        formato: 'csv' o 'ndjson'
+        tamanio_lote: filas por transacción
+
+    Returns:
+        ResultadoImportacion
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Usa {' o '.join(FORMATOS)}")
+
+    resultado = ResultadoImportacion()
+    lote = []
+    try:
+        for linea, cruda in leer_filas(archivo, formato):
+            resultado.filas += 1
+            try:
+                lote.append((linea, normalizar_fila(cruda)))
+            except ValueError as error:
+                codigo = cruda.get('codigo') if isinstance(cruda, dict) else None
+                resultado.error(linea, str(error), codigo)
+            if len(lote) >= tamanio_lote:
+                _importar_lote(lote, resultado)
+                lote = []
+        if lote:
+            _importar_lote(lote, resultado)
+    finally:
+        # También si la importación se corta: los lotes ya confirmados
+        # cambiaron el inventario de estas empresas
+        for empresa_id in sorted(resultado.empresas):
+            ResumenInventario.recalcular(empresa_id)
+    return resultado
@@ -0,0 +1,218 @@
+"""
+Servicio de lectura del inventario por empresa.
+
+Centraliza la carga de los datos que usan el PDF, el análisis IA y el envío
+de correos. En lugar de instanciar un modelo y un dict por fila, se
+proyectan solo las columnas necesarias con ``values_list`` y se guardan en
+listas paralelas (formato columnar).
+"""
+from litethinking_domain.models import Inventario, Producto
+
+
+# Filas leídas por viaje a la base de datos al recorrer el queryset
+TAMANIO_LOTE_LECTURA = 2000
+
+
+def resolver_precio(precios):
+    """
+    Obtiene el precio de referencia de un producto.
+
+    Args:
+        precios: dict (o JSON serializado) con precios por moneda
+
+    Returns:
+        Precio en COP, o en USD si no hay COP; 0 si no hay precio válido
+    """
+    return Producto.precio_referencia(precios)
+
+
+def empresa_a_dict(empresa):
+    """Convierte una Empresa en el dict que esperan los servicios de reporte."""
+    return {
+        'nit': empresa.nit,
+        'nombre': empresa.nombre,
+        'direccion': empresa.direccion,
+        'telefono': empresa.telefono,
+    }
+
+
+class SnapshotInventario:
+    """
+    Foto columnar del inventario de una empresa.
+
+    Cada atributo es una lista alineada por posición (una entrada por fila
+    de Inventario). Se comporta como una secuencia de dicts para los
+    consumidores existentes: los dicts se construyen al vuelo al iterar y
+    no se guardan.
+    """
+
+    COLUMNAS = (
+        'ids',
+        'codigos',
+        'nombres',
+        'precios',
+        'cantidades',
+        'fechas',
+    )
+
+    def __init__(self, empresa=None):
+        self.empresa = empresa
+        self.ids = []
+        self.codigos = []
+        self.nombres = []
+        self.precios = []
+        self.cantidades = []
+        self.fechas = []
+        self.total_unidades = 0
+        self.valor_total = 0
+
+    def agregar(self, inv_id, codigo, nombre, precio, cantidad, fecha):
+        self.ids.append(inv_id)
+        self.codigos.append(codigo)
+        self.nombres.append(nombre)
+        self.precios.append(precio)
+        self.cantidades.append(cantidad)
+        self.fechas.append(fecha)
+        self.total_unidades += cantidad
+        self.valor_total += cantidad * precio
+
+    @property
+    def total_productos(self):
+        return len(self.ids)
+
+    def fila(self, indice):
+        """Retorna la fila ``indice`` en el formato dict histórico."""
+        fecha = self.fechas[indice]
+        return {
+            'id': self.ids[indice],
+            'producto_codigo': self.codigos[indice],
+            'producto_nombre': self.nombres[indice],
+            'producto_precio': self.precios[indice],
+            'cantidad': self.cantidades[indice],
+            'fecha_actualizacion': fecha.isoformat() if fecha else None,
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for indice in range(len(self.ids)):
+            yield self.fila(indice)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self.fila(i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError('Índice fuera del snapshot de inventario')
+        return self.fila(indice)
+
+
+_CAMPOS_SNAPSHOT = (
+    'id',
+    'producto__codigo',
+    'producto__nombre',
+    'producto__precios',
+    'cantidad',
+    'fecha_actualizacion',
+)
+
+_CAMPOS_FILAS_REPORTE = ('producto__codigo', 'producto__nombre', 'cantidad', 'producto__precios')
+
+
+def _consulta_inventario(empresa_nit, campos, asincrona=False, **filtros):
+    """
+    Filas del inventario de la empresa (que cumplen ``filtros``)
+    proyectadas a ``campos``.
+
+    Con ``asincrona`` se piden como namedtuple: el iterable de tuplas
+    simples de Django ejecuta la consulta al crearse y ``aiterator`` lo
+    crea dentro del event loop, lo que el ORM no permite.
+    """
+    return (
+        Inventario.objects
+        .filter(producto__empresa__nit=empresa_nit, **filtros)
+        .values_list(*campos, named=asincrona)
+    )
+
+
+def cargar_snapshot_inventario(empresa_nit, empresa=None, **filtros):
+    """
+    Carga el inventario de una empresa en un ``SnapshotInventario``.
+
+    Args:
+        empresa_nit: NIT de la empresa
+        empresa: dict de la empresa ya cargado (opcional)
+        **filtros: lookups adicionales sobre Inventario (p. ej.
+            ``fecha_actualizacion__gte``)
+
+    Returns:
+        SnapshotInventario con una entrada por fila de inventario
+    """
+    snapshot = SnapshotInventario(empresa)
+    filas = (
+        _consulta_inventario(empresa_nit, _CAMPOS_SNAPSHOT, **filtros)
+        .iterator(chunk_size=TAMANIO_LOTE_LECTURA)
+    )
+    agregar = snapshot.agregar
+    for inv_id, codigo, nombre, precios, cantidad, fecha in filas:
+        agregar(inv_id, codigo, nombre, resolver_precio(precios), cantidad, fecha)
+    return snapshot
+
+
+async def acargar_snapshot_inventario(empresa_nit, empresa=None):
+    """Versión async de ``cargar_snapshot_inventario`` (ORM async)."""
+    snapshot = SnapshotInventario(empresa)
+    agregar = snapshot.agregar
+    filas = (
+        _consulta_inventario(empresa_nit, _CAMPOS_SNAPSHOT, asincrona=True)
+        .aiterator(chunk_size=TAMANIO_LOTE_LECTURA)
+    )
+    async for inv_id, codigo, nombre, precios, cantidad, fecha in filas:
+        agregar(inv_id, codigo, nombre, resolver_precio(precios), cantidad, fecha)
+    return snapshot
+
+
+def contar_filas(empresa_nit, limite):
+    """
+    Filas actuales del inventario de la empresa, contando como mucho
+    ``limite`` (``COUNT`` sobre una subconsulta con ``LIMIT``).
+    """
+    return Inventario.objects.filter(producto__empresa__nit=empresa_nit).order_by()[:limite].count()
+
+
+async def acontar_filas(empresa_nit, limite):
+    """Versión async de ``contar_filas``."""
+    return await Inventario.objects.filter(producto__empresa__nit=empresa_nit).order_by()[:limite].acount()
+
+
+def iterar_filas_reporte(empresa_nit, **filtros):
+    """
+    Recorre el inventario de una empresa sin cargarlo en memoria, en el
+    mismo orden que ``cargar_snapshot_inventario``.
+
+    Args:
+        empresa_nit: NIT de la empresa
+        **filtros: lookups adicionales sobre Inventario (p. ej. ``cantidad__lte``)
+
+    Yields:
+        Tuplas (codigo, nombre, cantidad, precio)
+    """
+    filas = (
+        _consulta_inventario(empresa_nit, _CAMPOS_FILAS_REPORTE, **filtros)
+        .iterator(chunk_size=TAMANIO_LOTE_LECTURA)
+    )
+    for codigo, nombre, cantidad, precios in filas:
+        yield codigo, nombre, cantidad, resolver_precio(precios)
+
+
+async def aiterar_filas_reporte(empresa_nit):
+    """Versión async de ``iterar_filas_reporte`` (ORM async)."""
+    filas = (
+        _consulta_inventario(empresa_nit, _CAMPOS_FILAS_REPORTE, asincrona=True)
+        .aiterator(chunk_size=TAMANIO_LOTE_LECTURA)
+    )
+    async for codigo, nombre, cantidad, precios in filas:
+        yield codigo, nombre, cantidad, resolver_precio(precios)
+
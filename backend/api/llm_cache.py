@@ -0,0 +1,140 @@
+"""
+Caché de resúmenes generados por LLM.
+
+Las llamadas a OpenAI o Anthropic son la dependencia más lenta y costosa
+del análisis, y la mayoría de los resúmenes se piden de nuevo sin que el
+stock haya cambiado. ``CacheLLM`` guarda las respuestas en memoria del
+proceso por (proveedor, modelo, versión del prompt, empresa, hash del
+contexto enviado al modelo), con vencimiento (TTL) y expulsión LRU.
+
+Además deduplica llamadas en vuelo: si varias peticiones piden la misma
+clave a la vez, solo una llama al modelo y las demás esperan su resultado
+(o su error). Los errores no se guardan.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def clave_resumen(proveedor, modelo, version_prompt, empresa_nit, hash_contexto):
+    """Clave de caché de un resumen."""
+    return (proveedor, modelo, version_prompt, empresa_nit, hash_contexto)
+
+
+class _Vuelo:
+    """Llamada en curso para una clave, con el resultado para quienes esperan."""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class CacheLLM:
+    """
+    Caché LRU con TTL y deduplicación de llamadas en vuelo.
+
+    Args:
+        max_entradas: respuestas guardadas como máximo; 0 desactiva la caché
+            (la deduplicación de llamadas en vuelo se mantiene)
+        ttl: segundos que una respuesta es válida
+    """
+
+    def __init__(self, max_entradas=512, ttl=3600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (vence, valor)
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_settings(cls):
+        return cls(
+            max_entradas=getattr(settings, 'LLM_CACHE_MAX_ENTRADAS', 512),
+            ttl=getattr(settings, 'LLM_CACHE_TTL', 3600),
+        )
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _leer(self, clave):
+        # Llamar con el lock tomado
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        vence, valor = entrada
+        if vence <= time.monotonic():
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    def obtener(self, clave, default=None):
+        """Respuesta guardada y vigente para ``clave``, o ``default``."""
+        with self._lock:
+            entrada = self._leer(clave)
+        return default if entrada is None else entrada[1]
+
+    def guardar(self, clave, valor):
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def obtener_o_calcular(self, clave, calcular):
+        """
+        Respuesta para ``clave``; si no está en caché llama a ``calcular()``
+        una sola vez aunque haya peticiones concurrentes por la misma clave.
+
+        Raises:
+            La excepción de ``calcular``, también a quienes esperaban
+        """
+        with self._lock:
+            entrada = self._leer(clave)
+            if entrada is not None:
+                return entrada[1]
+            vuelo = self._en_vuelo.get(clave)
+            propio = vuelo is None
+            if propio:
+                vuelo = self._en_vuelo[clave] = _Vuelo()
+
+        if not propio:
+            vuelo.listo.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = calcular()
+            self.guardar(clave, vuelo.resultado)
+            return vuelo.resultado
+        except Exception as error:
+            vuelo.error = error
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+            vuelo.listo.set()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_llm():
+    """Caché de resúmenes compartida del proceso."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheLLM.desde_settings()
+    return _cache
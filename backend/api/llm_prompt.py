@@ -0,0 +1,141 @@
+"""
+Contexto compacto del inventario para los prompts de LLM.
+
+Antes el prompt llevaba las 20 primeras filas del inventario, un
+subconjunto arbitrario en inventarios grandes. ``construir_contexto``
+resume todo el inventario (totales, buckets de stock, histograma de
+cantidades) y agrega los productos más críticos por valor en riesgo,
+recortando la lista hasta que el contexto cabe en el presupuesto de
+tokens (``LLM_PRESUPUESTO_TOKENS``).
+
+El valor en riesgo de un producto sin stock o con stock bajo es su precio
+por las unidades que le faltan para salir del bucket de stock bajo.
+"""
+import bisect
+import hashlib
+import json
+
+from django.conf import settings
+
+from .analitica import (
+    BUCKETS,
+    UMBRAL_STOCK_BAJO,
+    MetricasInventario,
+    _centavos,
+)
+
+# Límites superiores de los rangos del histograma de cantidades
+LIMITES_HISTOGRAMA = (0, 10, 50, 100, 500)
+# Productos críticos que se intentan incluir antes de recortar
+MAX_CRITICOS = 50
+# Caracteres por token (aproximación conservadora para texto en español y JSON)
+CARACTERES_POR_TOKEN = 3.5
+LARGO_MAXIMO_NOMBRE = 40
+
+
+def estimar_tokens(texto):
+    """Tokens aproximados de ``texto``."""
+    return int(len(texto) / CARACTERES_POR_TOKEN) + 1
+
+
+def serializar(contexto):
+    """JSON compacto del contexto, como se envía en el prompt."""
+    return json.dumps(contexto, ensure_ascii=False, separators=(',', ':'))
+
+
+def hash_contexto(contexto):
+    """SHA-256 del contexto con llaves ordenadas (llave de la caché de resúmenes)."""
+    return hashlib.sha256(
+        json.dumps(contexto, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()
+
+
+def _unidades_faltantes(cantidad):
+    return UMBRAL_STOCK_BAJO + 1 - cantidad
+
+
+def _valor_en_riesgo(cantidad, precio):
+    return _unidades_faltantes(cantidad) * _centavos(precio)
+
+
+def _histograma(cantidades):
+    rangos = [0] * (len(LIMITES_HISTOGRAMA) + 1)
+    for cantidad in cantidades:
+        rangos[bisect.bisect_left(LIMITES_HISTOGRAMA, cantidad)] += 1
+    etiquetas = ['0']
+    anterior = 0
+    for limite in LIMITES_HISTOGRAMA[1:]:
+        etiquetas.append(f'{anterior + 1}-{limite}')
+        anterior = limite
+    etiquetas.append(f'>{anterior}')
+    return dict(zip(etiquetas, rangos))
+
+
+def _critico(producto):
+    nombre = producto['nombre'] or ''
+    if len(nombre) > LARGO_MAXIMO_NOMBRE:
+        nombre = nombre[:LARGO_MAXIMO_NOMBRE - 1] + '…'
+    return {
+        'codigo': producto['codigo'],
+        'nombre': nombre,
+        'cantidad': producto['cantidad'],
+        'precio': producto['precio'],
+        'valor_en_riesgo': round(producto['precio'] * _unidades_faltantes(producto['cantidad']), 2),
+    }
+
+
+def construir_contexto(empresa, inventarios, presupuesto_tokens=None):
+    """
+    Contexto del inventario completo para el prompt de un LLM.
+
+    Args:
+        empresa: dict de la empresa
+        inventarios: snapshot o lista de dicts del inventario
+        presupuesto_tokens: tokens máximos del contexto serializado (por
+            defecto ``LLM_PRESUPUESTO_TOKENS``)
+
+    Returns:
+        dict serializable; su JSON compacto no supera el presupuesto salvo
+        que no quepan ni los agregados (entonces va sin productos)
+    """
+    if presupuesto_tokens is None:
+        presupuesto_tokens = getattr(settings, 'LLM_PRESUPUESTO_TOKENS', 1200)
+
+    metricas = MetricasInventario(inventarios)
+    criticos = [
+        _critico(producto)
+        for producto in metricas.mayores(MAX_CRITICOS, _valor_en_riesgo)
+    ]
+    # Empates por código: el mismo inventario en otro orden da el mismo contexto
+    criticos.sort(key=lambda critico: (-critico['valor_en_riesgo'], critico['codigo'] or ''))
+    contexto = {
+        'empresa': empresa.get('nombre'),
+        'total_productos': metricas.total_productos,
+        'total_unidades': metricas.total_unidades,
+        'valor_total': float(metricas.valor_total),
+        'buckets': {
+            bucket: {
+                'productos': metricas.conteos[bucket],
+                'pct': round(metricas.porcentaje(bucket), 1),
+            }
+            for bucket in BUCKETS
+        },
+        'histograma_cantidades': _histograma(metricas.columnas.cantidades),
+        'criticos_por_valor_en_riesgo': criticos,
+    }
+
+    def cabe(incluidos):
+        contexto['criticos_por_valor_en_riesgo'] = criticos[:incluidos]
+        return estimar_tokens(serializar(contexto)) <= presupuesto_tokens
+
+    # Búsqueda binaria de cuántos críticos (los de mayor valor en riesgo)
+    # caben en el presupuesto
+    minimo, maximo = 0, len(criticos)
+    while minimo < maximo:
+        medio = (minimo + maximo + 1) // 2
+        if cabe(medio):
+            minimo = medio
+        else:
+            maximo = medio - 1
+    cabe(minimo)
+    return contexto
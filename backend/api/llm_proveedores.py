@@ -0,0 +1,200 @@
+"""
+Proveedores de LLM para los resúmenes del inventario.
+
+Cada proveedor crea su cliente (``openai.OpenAI``, ``anthropic.Anthropic``)
+una vez por proceso y lo reutiliza, de modo que se conserva el pool de
+conexiones HTTP del SDK entre resúmenes. El timeout de cada llamada y los
+reintentos del SDK se configuran con ``LLM_TIMEOUT`` y
+``LLM_MAX_REINTENTOS``.
+
+Los proveedores se registran por nombre con ``registrar_proveedor``;
+``obtener_proveedor`` retorna la instancia compartida.
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+
+from .llm_prompt import serializar
+
+# Librerías de IA opcionales
+try:
+    import openai
+    OPENAI_DISPONIBLE = True
+except ImportError:
+    OPENAI_DISPONIBLE = False
+
+try:
+    import anthropic
+    ANTHROPIC_DISPONIBLE = True
+except ImportError:
+    ANTHROPIC_DISPONIBLE = False
+
+
+class ProveedorNoDisponible(Exception):
+    """Falta el SDK o la API key del proveedor."""
+
+
+class ProveedorLLM(ABC):
+    """
+    Proveedor de resúmenes con un cliente reutilizable.
+
+    Las subclases definen ``nombre``, ``etiqueta``, ``modelo``,
+    ``variable_api_key``, ``_crear_cliente`` y ``completar``.
+
+    Args:
+        timeout: segundos máximos por llamada
+        max_reintentos: reintentos del SDK ante errores transitorios
+    """
+    nombre = None
+    etiqueta = None
+    modelo = None
+    variable_api_key = None
+    sdk_disponible = True
+    paquete = None
+
+    def __init__(self, timeout=30, max_reintentos=2):
+        self.timeout = timeout
+        self.max_reintentos = max_reintentos
+        self._cliente = None
+        self._api_key_cliente = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_settings(cls):
+        return cls(
+            timeout=getattr(settings, 'LLM_TIMEOUT', 30),
+            max_reintentos=getattr(settings, 'LLM_MAX_REINTENTOS', 2),
+        )
+
+    def api_key(self):
+        return os.environ.get(self.variable_api_key) if self.variable_api_key else None
+
+    def verificar(self):
+        """
+        Raises:
+            ProveedorNoDisponible: si falta el SDK o la API key
+        """
+        if not self.sdk_disponible:
+            raise ProveedorNoDisponible(
+                f"{self.etiqueta} no está disponible. Instala: pip install {self.paquete}"
+            )
+        if self.variable_api_key and not self.api_key():
+            raise ProveedorNoDisponible(f"{self.variable_api_key} no configurada")
+
+    @property
+    def cliente(self):
+        """Cliente del SDK; se crea de nuevo solo si cambia la API key."""
+        api_key = self.api_key()
+        with self._lock:
+            if self._cliente is None or api_key != self._api_key_cliente:
+                self._cliente = self._crear_cliente(api_key)
+                self._api_key_cliente = api_key
+            return self._cliente
+
+    @abstractmethod
+    def _crear_cliente(self, api_key):
+        """Cliente del SDK autenticado con ``api_key``."""
+
+    @abstractmethod
+    def completar(self, contexto):
+        """Texto del modelo para el contexto del inventario."""
+
+
+_clases = {}
+_instancias = {}
+_instancias_lock = threading.Lock()
+
+
+def registrar_proveedor(clase):
+    """Registra una subclase de ``ProveedorLLM`` por su ``nombre`` (decorador)."""
+    _clases[clase.nombre] = clase
+    with _instancias_lock:
+        _instancias.pop(clase.nombre, None)
+    return clase
+
+
+def proveedores_registrados():
+    return list(_clases)
+
+
+def obtener_proveedor(nombre):
+    """
+    Instancia compartida del proveedor ``nombre``.
+
+    Raises:
+        KeyError: si no hay un proveedor registrado con ese nombre
+    """
+    proveedor = _instancias.get(nombre)
+    if proveedor is None:
+        with _instancias_lock:
+            proveedor = _instancias.get(nombre)
+            if proveedor is None:
+                proveedor = _clases[nombre].desde_settings()
+                _instancias[nombre] = proveedor
+    return proveedor
+
+
+@registrar_proveedor
+class ProveedorOpenAI(ProveedorLLM):
+    nombre = 'openai'
+    etiqueta = 'OpenAI'
+    modelo = 'gpt-3.5-turbo'
+    variable_api_key = 'OPENAI_API_KEY'
+    sdk_disponible = OPENAI_DISPONIBLE
+    paquete = 'openai'
+
+    def _crear_cliente(self, api_key):
+        return openai.OpenAI(
+            api_key=api_key,
+            timeout=self.timeout,
+            max_retries=self.max_reintentos,
+        )
+
+    def completar(self, contexto):
+        response = self.cliente.chat.completions.create(
+            model=self.modelo,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Eres un experto en gestión de inventarios. Genera un análisis breve y profesional del inventario proporcionado. Incluye alertas de stock bajo y recomendaciones. El contexto resume todo el inventario: buckets de stock, histograma de cantidades y los productos críticos por valor en riesgo."
+                },
+                {
+                    "role": "user",
+                    "content": f"Analiza este inventario: {serializar(contexto)}"
+                }
+            ],
+            max_tokens=500
+        )
+        return response.choices[0].message.content
+
+
+@registrar_proveedor
+class ProveedorAnthropic(ProveedorLLM):
+    nombre = 'anthropic'
+    etiqueta = 'Anthropic'
+    modelo = 'claude-3-haiku-20240307'
+    variable_api_key = 'ANTHROPIC_API_KEY'
+    sdk_disponible = ANTHROPIC_DISPONIBLE
+    paquete = 'anthropic'
+
+    def _crear_cliente(self, api_key):
+        return anthropic.Anthropic(
+            api_key=api_key,
+            timeout=self.timeout,
+            max_retries=self.max_reintentos,
+        )
+
+    def completar(self, contexto):
+        message = self.cliente.messages.create(
+            model=self.modelo,
+            max_tokens=500,
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"Como experto en gestión de inventarios, analiza brevemente este inventario (buckets de stock, histograma de cantidades y productos críticos por valor en riesgo) y proporciona alertas y recomendaciones: {serializar(contexto)}"
+                }
+            ]
+        )
+        return message.content[0].text
@@ -0,0 +1,59 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importacion_service import (
+    FORMATOS,
+    TAMANIO_LOTE_IMPORTACION,
+    formato_por_nombre,
+    importar_catalogo,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos y stock inicial desde un archivo CSV o NDJSON, '
+        'por lotes y sin cargarlo completo en memoria. Los productos se '
+        'actualizan si el código ya existe.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'archivo',
+            help="Ruta del archivo ('-' para leer de la entrada estándar)"
+        )
+        parser.add_argument(
+            '--formato',
+            choices=FORMATOS,
+            help='Formato del archivo (por defecto, según la extensión)'
+        )
+        parser.add_argument(
+            '--tamanio-lote',
+            type=int,
+            default=TAMANIO_LOTE_IMPORTACION,
+            help=f'Filas por transacción (default: {TAMANIO_LOTE_IMPORTACION})'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or formato_por_nombre(ruta)
+        if formato is None:
+            raise CommandError('No se pudo deducir el formato; usa --formato')
+
+        try:
+            if ruta == '-':
+                resultado = importar_catalogo(sys.stdin.buffer, formato, options['tamanio_lote'])
+            else:
+                with open(ruta, 'rb') as archivo:
+                    resultado = importar_catalogo(archivo, formato, options['tamanio_lote'])
+        except OSError as error:
+            raise CommandError(f'No se pudo leer {ruta}: {error}')
+
+        for detalle in resultado.detalle_errores:
+            self.stderr.write(f"Línea {detalle['linea']}: {detalle['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.filas} fila(s): {resultado.productos_creados} producto(s) creado(s), '
+            f'{resultado.productos_actualizados} actualizado(s), '
+            f'{resultado.inventarios_creados} inventario(s) creado(s), '
+            f'{resultado.errores} error(es)'
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.envio_service import identificador_trabajador, procesar_cola
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la cola de envíos: genera los reportes pendientes y '
+        'entrega los correos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los trabajos disponibles y termina'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando la cola está vacía (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        trabajador = identificador_trabajador()
+        self.stdout.write(f'Worker de envíos iniciado ({trabajador})')
+
+        while True:
+            close_old_connections()
+            procesados = procesar_cola(trabajador)
+            if procesados:
+                self.stdout.write(f'{procesados} trabajo(s) procesado(s)')
+            if options['una_vez']:
+                break
+            if not procesados:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from litethinking_domain.models import Empresa, ResumenInventario
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula desde cero los resúmenes de inventario por empresa. '
+        'Útil tras cargas masivas que no disparan señales.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'nits',
+            nargs='*',
+            help='NITs a recalcular (por defecto todas las empresas)'
+        )
+
+    def handle(self, *args, **options):
+        nits = options['nits'] or list(Empresa.objects.values_list('nit', flat=True))
+        existentes = set(Empresa.objects.filter(nit__in=nits).values_list('nit', flat=True))
+        faltantes = [nit for nit in nits if nit not in existentes]
+        if faltantes:
+            raise CommandError(f"Empresas no encontradas: {', '.join(faltantes)}")
+
+        for nit in nits:
+            resumen = ResumenInventario.recalcular(nit)
+            self.stdout.write(
+                f'{nit}: {resumen.total_productos} productos, '
+                f'{resumen.total_unidades} unidades'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{len(nits)} resumen(es) recalculado(s)'))
@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ia_service import resumir_empresas
+from api.llm_proveedores import ProveedorNoDisponible, proveedores_registrados
+from litethinking_domain.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera con un LLM el resumen del inventario de varias empresas, '
+        'con varias llamadas en paralelo. Pensado para la corrida nocturna.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'nits',
+            nargs='*',
+            help='NITs a resumir (por defecto todas las empresas)'
+        )
+        parser.add_argument(
+            '--proveedor',
+            default='openai',
+            choices=proveedores_registrados(),
+            help='Proveedor LLM (default: openai)'
+        )
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=None,
+            help='Llamadas simultáneas (default: LLM_CONCURRENCIA)'
+        )
+        parser.add_argument(
+            '--salida',
+            help='Archivo JSON Lines donde escribir los resúmenes'
+        )
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by('nit')
+        if options['nits']:
+            empresas = empresas.filter(nit__in=options['nits'])
+            faltantes = set(options['nits']) - set(empresas.values_list('nit', flat=True))
+            if faltantes:
+                raise CommandError(f"Empresas no encontradas: {', '.join(sorted(faltantes))}")
+
+        salida = open(options['salida'], 'w', encoding='utf-8') if options['salida'] else None
+        resumidas = fallidas = 0
+        try:
+            for nit, resumen, error in resumir_empresas(
+                empresas,
+                proveedor=options['proveedor'],
+                concurrencia=options['concurrencia'],
+            ):
+                if error is None:
+                    resumidas += 1
+                    self.stdout.write(f'{nit}: resumen generado')
+                else:
+                    fallidas += 1
+                    self.stderr.write(f'{nit}: {error}')
+                if salida is not None:
+                    salida.write(json.dumps(
+                        {'nit': nit, 'resumen': resumen, 'error': error},
+                        ensure_ascii=False,
+                    ) + '\n')
+        except ProveedorNoDisponible as error:
+            raise CommandError(str(error))
+        finally:
+            if salida is not None:
+                salida.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resumidas} resumen(es) generado(s), {fallidas} fallido(s)'
+        ))
@@ -0,0 +1,177 @@
+"""
+Paginación por cursor (keyset) para los listados grandes de la API.
+
+A diferencia de ``CursorPagination`` de DRF, que filtra solo por el primer
+campo del orden y resuelve los empates con un offset, aquí el cursor guarda
+la posición completa de la última fila (p. ej. ``fecha_actualizacion`` e
+``id``) y la siguiente página se obtiene con una comparación lexicográfica
+sobre todos los campos. Así cada página es una consulta por índice aunque
+miles de filas compartan la misma fecha o el mismo nombre.
+
+La paginación es opcional para no romper a los clientes que esperan una
+lista: solo se activa cuando la petición incluye ``cursor`` o ``page_size``.
+El orden lo fija cada paginador (el cursor depende de él), así que pedir
+``?ordering=`` junto con la paginación responde 400 en vez de ignorarlo.
+"""
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+    ordering = ('-id',)
+    invalid_cursor_message = 'Cursor inválido'
+    ordering_no_soportado_message = (
+        'La paginación por cursor tiene un orden fijo: no se puede combinar con ordering'
+    )
+
+    def esta_activa(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        valor = request.query_params.get(self.page_size_query_param)
+        if valor is None:
+            return self.page_size
+        try:
+            tamanio = int(valor)
+        except (TypeError, ValueError):
+            return self.page_size
+        if tamanio <= 0:
+            return self.page_size
+        return min(tamanio, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.esta_activa(request):
+            return None
+
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            raise ValidationError({api_settings.ORDERING_PARAM: self.ordering_no_soportado_message})
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.tamanio = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        posicion = self.decodificar_cursor(request, queryset.model)
+        if posicion is not None:
+            queryset = queryset.filter(self.filtro_posterior(posicion))
+
+        resultados = list(queryset[:self.tamanio + 1])
+        self.page = resultados[:self.tamanio]
+        self.hay_siguiente = len(resultados) > self.tamanio
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.hay_siguiente or not self.page:
+            return None
+        ultimo = self.page[-1]
+        posicion = [getattr(ultimo, campo.lstrip('-')) for campo in self.ordering]
+        url = replace_query_param(
+            self.base_url, self.cursor_query_param, self.codificar_cursor(posicion)
+        )
+        return replace_query_param(url, self.page_size_query_param, self.tamanio)
+
+    def get_previous_link(self):
+        return None
+
+    # ───────────────────────────────────────────────────────────────
+    # Cursor
+    # ───────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _serializar_valor(valor):
+        # isoformat completo: DjangoJSONEncoder recorta a milisegundos y el
+        # cursor debe conservar la posición exacta
+        if isinstance(valor, (datetime, date)):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return str(valor)
+        raise TypeError(f'Valor no serializable en el cursor: {valor!r}')
+
+    def codificar_cursor(self, posicion):
+        datos = json.dumps(posicion, default=self._serializar_valor, separators=(',', ':'))
+        return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii')
+
+    def decodificar_cursor(self, request, modelo):
+        """
+        Posición del cursor con cada valor convertido al tipo de su campo
+        en ``modelo``. Un cursor manipulado (p. ej. texto donde va una
+        fecha) responde 404 en lugar de fallar al ejecutar la consulta.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            posicion = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message) from None
+        if not isinstance(posicion, list) or len(posicion) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        valores = []
+        for campo, valor in zip(self.ordering, posicion):
+            if valor is None or isinstance(valor, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            field = modelo._meta.get_field(campo.lstrip('-'))
+            try:
+                valor = field.to_python(valor)
+                field.run_validators(valor)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message) from None
+            if valor is None:
+                raise NotFound(self.invalid_cursor_message)
+            valores.append(valor)
+        return valores
+
+    def filtro_posterior(self, posicion):
+        """
+        Construye el filtro "fila posterior a ``posicion``" para el orden
+        compuesto: (a > x) OR (a = x AND b > y) OR ...
+        """
+        filtro = Q()
+        iguales = {}
+        for campo, valor in zip(self.ordering, posicion):
+            nombre = campo.lstrip('-')
+            lookup = 'lt' if campo.startswith('-') else 'gt'
+            filtro |= Q(**iguales, **{f'{nombre}__{lookup}': valor})
+            iguales[nombre] = valor
+        return filtro
+
+
+class InventarioKeysetPagination(KeysetPagination):
+    ordering = ('-fecha_actualizacion', '-id')
+
+
+class ProductoKeysetPagination(KeysetPagination):
+    ordering = ('nombre', 'id')
@@ -0,0 +1,471 @@
+"""
+Caché en disco de los PDF de inventario.
+
+La llave es un SHA-256 de todo lo que se imprime en el reporte (datos de
+la empresa, filas del inventario con su precio, fecha de generación), el
+modo de generación y ``VERSION_PLANTILLA_PDF``. Un inventario sin cambios
+se sirve desde disco sin volver a pasar por ReportLab, y la misma llave
+sirve de ETag.
+
+Los archivos se guardan como ``<llave>.pdf``, con el SHA-256 del documento
+(calculado al generarlo) en ``<llave>.sha256``. Cada lectura actualiza la
+fecha de modificación y, al escribir, se eliminan los más antiguos hasta
+quedar bajo ``PDF_CACHE_MAX_BYTES`` (LRU por tamaño).
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import date
+
+from django.conf import settings
+
+from .email_service import (
+    VERSION_PLANTILLA_PDF,
+    EscritorConHash,
+    EstadisticasReporte,
+    escribir_pdf_inventario,
+    generar_pdf_inventario_por_bloques,
+)
+from .inventario_service import acontar_filas, contar_filas, iterar_filas_reporte
+from .pdf_pool import obtener_pool
+
+logger = logging.getLogger(__name__)
+
+EXTENSION = '.pdf'
+EXTENSION_HASH = '.sha256'
+
+
+def _filas_reporte(inventarios):
+    """Filas (código, nombre, cantidad, precio) en el orden del reporte."""
+    if hasattr(inventarios, 'codigos'):
+        # SnapshotInventario: se leen las columnas sin construir dicts
+        return zip(
+            inventarios.codigos,
+            inventarios.nombres,
+            inventarios.cantidades,
+            inventarios.precios,
+        )
+    return (
+        (
+            inv.get('producto_codigo', '-'),
+            inv.get('producto_nombre', '-'),
+            inv.get('cantidad', 0),
+            inv.get('producto_precio', 0),
+        )
+        for inv in inventarios
+    )
+
+
+def _estadisticas_filas(filas):
+    estadisticas = EstadisticasReporte()
+    for _, _, cantidad, precio in filas:
+        estadisticas.agregar(cantidad, precio)
+    return estadisticas.como_dict()
+
+
+def _umbral_por_bloques():
+    return getattr(settings, 'PDF_UMBRAL_POR_BLOQUES', 5000)
+
+
+def modo_por_bloques(total_filas):
+    """Si un inventario de ``total_filas`` filas se genera por bloques."""
+    return total_filas > _umbral_por_bloques()
+
+
+def empresa_por_bloques(empresa_nit):
+    """
+    Si el inventario actual de la empresa se genera por bloques. Cuenta
+    las filas reales (hasta el umbral + 1) en vez de leer el
+    ResumenInventario, que las operaciones masivas pueden dejar atrasado.
+    """
+    umbral = _umbral_por_bloques()
+    return contar_filas(empresa_nit, umbral + 1) > umbral
+
+
+async def aempresa_por_bloques(empresa_nit):
+    """Versión async de ``empresa_por_bloques``."""
+    umbral = _umbral_por_bloques()
+    return await acontar_filas(empresa_nit, umbral + 1) > umbral
+
+
+class _FirmaReporte:
+    """Llave de caché y totales calculados fila a fila (ver ``firmar_filas``)."""
+
+    def __init__(self, empresa, por_bloques, fecha):
+        self.digest = hashlib.sha256()
+        self.estadisticas = EstadisticasReporte()
+        cabecera = [
+            VERSION_PLANTILLA_PDF,
+            'bloques' if por_bloques else 'tabla',
+            (fecha or date.today()).isoformat(),
+            [empresa.get(campo, '') for campo in ('nit', 'nombre', 'direccion', 'telefono')],
+        ]
+        self.digest.update(json.dumps(cabecera, ensure_ascii=False).encode('utf-8'))
+
+    def agregar(self, fila):
+        self.digest.update(b'\n')
+        self.digest.update(json.dumps(fila, ensure_ascii=False, default=str).encode('utf-8'))
+        self.estadisticas.agregar(fila[2], fila[3])
+
+    def resultado(self):
+        return self.digest.hexdigest(), self.estadisticas.como_dict()
+
+
+def firmar_filas(empresa, filas, por_bloques=False, fecha=None):
+    """
+    Recorre las filas del reporte una vez y calcula la llave de caché y los
+    totales del resumen, sin guardar las filas.
+
+    A diferencia de ``generar_hash_inventario`` (que certifica solo
+    código, nombre y cantidad), la llave incluye todo lo que cambia el
+    documento: precios, orden de las filas, datos de la empresa, la fecha
+    impresa en el encabezado, el modo de generación y la versión de la
+    plantilla.
+
+    Args:
+        empresa: dict con datos de la empresa
+        filas: iterable de tuplas (codigo, nombre, cantidad, precio)
+        por_bloques: el PDF se genera con ``generar_pdf_inventario_por_bloques``
+        fecha: fecha de generación (hoy por defecto)
+
+    Returns:
+        Tupla (llave SHA-256 hexadecimal, dict de totales)
+    """
+    firma = _FirmaReporte(empresa, por_bloques, fecha)
+    for fila in filas:
+        firma.agregar(fila)
+    return firma.resultado()
+
+
+async def afirmar_filas(empresa, filas, por_bloques=False, fecha=None):
+    """Versión de ``firmar_filas`` para un iterable async de filas."""
+    firma = _FirmaReporte(empresa, por_bloques, fecha)
+    async for fila in filas:
+        firma.agregar(fila)
+    return firma.resultado()
+
+
+def clave_pdf_inventario(empresa, inventarios, fecha=None):
+    """
+    Llave de caché del PDF de un inventario ya cargado.
+
+    Returns:
+        Hash SHA-256 como string hexadecimal
+    """
+    clave, _ = firmar_filas(
+        empresa, _filas_reporte(inventarios), modo_por_bloques(len(inventarios)), fecha
+    )
+    return clave
+
+
+class CachePDF:
+    """
+    Caché de PDFs en un directorio con límite de tamaño.
+
+    Args:
+        directorio: carpeta donde se guardan los archivos
+        max_bytes: tamaño máximo total; 0 desactiva la caché
+    """
+
+    def __init__(self, directorio, max_bytes):
+        self.directorio = str(directorio)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def desde_settings(cls):
+        return cls(
+            getattr(settings, 'PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'inventario-pdf')),
+            getattr(settings, 'PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024),
+        )
+
+    @property
+    def activa(self):
+        return self.max_bytes > 0
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f'{clave}{EXTENSION}')
+
+    def _ruta_hash(self, clave):
+        return os.path.join(self.directorio, f'{clave}{EXTENSION_HASH}')
+
+    def _leer_hash(self, clave):
+        try:
+            with open(self._ruta_hash(clave), encoding='ascii') as archivo:
+                return archivo.read().strip() or None
+        except (OSError, ValueError):
+            return None
+
+    def abrir(self, clave):
+        """Archivo del PDF en caché abierto en modo binario, o None."""
+        if not self.activa:
+            return None
+        ruta = self._ruta(clave)
+        try:
+            archivo = open(ruta, 'rb')
+            os.utime(ruta)  # marca de uso reciente para el LRU
+        except FileNotFoundError:
+            return None
+        except OSError as error:
+            logger.warning('No se pudo leer %s de la caché de PDF: %s', ruta, error)
+            return None
+        return archivo
+
+    def obtener(self, clave):
+        """Contenido del PDF en caché, o None."""
+        archivo = self.abrir(clave)
+        if archivo is None:
+            return None
+        with archivo:
+            return archivo.read()
+
+    def obtener_con_hash(self, clave):
+        """
+        Tupla (contenido, SHA-256 hexadecimal) del PDF en caché, o
+        (None, None). El hash es el guardado junto al PDF al generarlo;
+        solo se recalcula si falta (PDF guardado sin hash).
+        """
+        contenido = self.obtener(clave)
+        if contenido is None:
+            return None, None
+        return contenido, self._leer_hash(clave) or hashlib.sha256(contenido).hexdigest()
+
+    def guardar(self, clave, contenido, hash_documento=None):
+        self.guardar_archivo(clave, io.BytesIO(contenido), len(contenido), hash_documento)
+
+    def _escribir(self, ruta, escribir):
+        # Escritura atómica: otro proceso nunca lee un archivo a medias
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            escribir(archivo)
+        os.replace(temporal, ruta)
+
+    def guardar_archivo(self, clave, origen, tamanio, hash_documento=None):
+        """
+        Copia a la caché el PDF de un archivo abierto (desde su posición
+        actual) y, si se indica, su SHA-256 hexadecimal.
+        """
+        if not self.activa or tamanio > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            # El hash anterior no debe quedar junto a un PDF nuevo
+            self._eliminar(self._ruta_hash(clave))
+            self._escribir(self._ruta(clave), lambda archivo: shutil.copyfileobj(origen, archivo))
+            if hash_documento:
+                self._escribir(
+                    self._ruta_hash(clave),
+                    lambda archivo: archivo.write(hash_documento.encode('ascii')),
+                )
+        except OSError as error:
+            logger.warning('No se pudo guardar el PDF %s en caché: %s', clave, error)
+            return
+        self.desalojar()
+
+    def desalojar(self):
+        """Elimina los PDF menos usados hasta quedar bajo ``max_bytes``."""
+        archivos = []
+        total = 0
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith(EXTENSION):
+                    continue
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+                total += info.st_size
+        if total <= self.max_bytes:
+            return
+        archivos.sort()
+        for _, tamanio, ruta in archivos:
+            self._eliminar(ruta)
+            self._eliminar(ruta[:-len(EXTENSION)] + EXTENSION_HASH)
+            total -= tamanio
+            if total <= self.max_bytes:
+                break
+
+    def limpiar(self):
+        if not os.path.isdir(self.directorio):
+            return
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith((EXTENSION, EXTENSION_HASH)):
+                self._eliminar(os.path.join(self.directorio, nombre))
+
+    @staticmethod
+    def _eliminar(ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def _generar_pdf(empresa, inventarios):
+    """
+    Genera el PDF de un inventario ya cargado (se ejecuta en el pool).
+
+    Returns:
+        Tupla (contenido, SHA-256 hexadecimal); el hash se calcula mientras
+        ReportLab escribe el documento
+    """
+    buffer = io.BytesIO()
+    destino = EscritorConHash(buffer)
+    if modo_por_bloques(len(inventarios)):
+        generar_pdf_inventario_por_bloques(
+            empresa,
+            _filas_reporte(inventarios),
+            _estadisticas_filas(_filas_reporte(inventarios)),
+            destino,
+        )
+    else:
+        escribir_pdf_inventario(empresa, inventarios, destino)
+    return buffer.getvalue(), destino.hexdigest()
+
+
+def _generar_pdf_por_bloques_en_ruta(empresa, empresa_nit, stats, ruta):
+    """
+    Genera por bloques el PDF de un inventario grande en ``ruta`` (se
+    ejecuta en el pool). Las filas se leen de la base de datos en el mismo
+    proceso que genera el PDF, así no viajan entre procesos.
+    """
+    with open(ruta, 'wb') as destino:
+        generar_pdf_inventario_por_bloques(
+            empresa, iterar_filas_reporte(empresa_nit), stats, destino
+        )
+
+
+def obtener_pdf_inventario(empresa, inventarios, clave=None):
+    """
+    PDF del inventario desde la caché, generándolo solo si no está.
+
+    Args:
+        empresa: dict con datos de la empresa
+        inventarios: SnapshotInventario o lista de dicts
+        clave: llave ya calculada con ``clave_pdf_inventario`` (opcional)
+
+    Returns:
+        bytes: Contenido del PDF
+
+    Raises:
+        PoolPDFSaturado, TiempoPDFAgotado: ver ``api.pdf_pool``
+    """
+    cache = CachePDF.desde_settings()
+    clave = clave or clave_pdf_inventario(empresa, inventarios)
+    pdf_content = cache.obtener(clave)
+    if pdf_content is None:
+        pdf_content, hash_documento = obtener_pool().ejecutar(_generar_pdf, empresa, inventarios)
+        cache.guardar(clave, pdf_content, hash_documento)
+    return pdf_content
+
+
+def obtener_pdf_con_hash(empresa, inventarios, clave=None):
+    """
+    Como ``obtener_pdf_inventario``, pero también retorna el hash del
+    documento (el de ``generar_hash_documento``), calculado mientras el PDF
+    se genera o se lee de la caché.
+
+    Returns:
+        Tupla (contenido, SHA-256 hexadecimal)
+    """
+    cache = CachePDF.desde_settings()
+    clave = clave or clave_pdf_inventario(empresa, inventarios)
+    pdf_content, hash_documento = cache.obtener_con_hash(clave)
+    if pdf_content is None:
+        pdf_content, hash_documento = obtener_pool().ejecutar(_generar_pdf, empresa, inventarios)
+        cache.guardar(clave, pdf_content, hash_documento)
+    return pdf_content, hash_documento
+
+
+async def aobtener_pdf_inventario(empresa, inventarios, clave=None):
+    """
+    Versión async de ``obtener_pdf_inventario``: el PDF se genera con
+    ``PoolPDF.ejecutar_async`` sin bloquear el event loop.
+    """
+    cache = CachePDF.desde_settings()
+    clave = clave or clave_pdf_inventario(empresa, inventarios)
+    pdf_content = cache.obtener(clave)
+    if pdf_content is None:
+        pdf_content, hash_documento = await obtener_pool().ejecutar_async(
+            _generar_pdf, empresa, inventarios
+        )
+        cache.guardar(clave, pdf_content, hash_documento)
+    return pdf_content
+
+
+async def aobtener_pdf_con_hash(empresa, inventarios, clave=None):
+    """Versión async de ``obtener_pdf_con_hash``."""
+    cache = CachePDF.desde_settings()
+    clave = clave or clave_pdf_inventario(empresa, inventarios)
+    pdf_content, hash_documento = cache.obtener_con_hash(clave)
+    if pdf_content is None:
+        pdf_content, hash_documento = await obtener_pool().ejecutar_async(
+            _generar_pdf, empresa, inventarios
+        )
+        cache.guardar(clave, pdf_content, hash_documento)
+    return pdf_content, hash_documento
+
+
+def abrir_pdf_por_bloques(empresa, empresa_nit, stats, clave):
+    """
+    PDF de un inventario grande como archivo abierto, listo para
+    ``FileResponse``.
+
+    Si no está en caché se genera por bloques en un archivo temporal, de
+    modo que ni las filas ni el documento completo quedan en memoria.
+
+    Args:
+        empresa: dict con datos de la empresa
+        empresa_nit: NIT de la empresa (las filas se leen al generar)
+        stats: totales calculados con ``firmar_filas``
+        clave: llave calculada con ``firmar_filas(..., por_bloques=True)``
+
+    Raises:
+        PoolPDFSaturado, TiempoPDFAgotado: ver ``api.pdf_pool``
+    """
+    cache = CachePDF.desde_settings()
+    archivo = cache.abrir(clave)
+    if archivo is not None:
+        return archivo
+
+    ruta = _ruta_temporal()
+    try:
+        obtener_pool().ejecutar(_generar_pdf_por_bloques_en_ruta, empresa, empresa_nit, stats, ruta)
+        return _guardar_generado(cache, clave, ruta)
+    finally:
+        # El archivo abierto sigue legible después de borrar la ruta
+        os.remove(ruta)
+
+
+async def aabrir_pdf_por_bloques(empresa, empresa_nit, stats, clave):
+    """Versión async de ``abrir_pdf_por_bloques``."""
+    cache = CachePDF.desde_settings()
+    archivo = cache.abrir(clave)
+    if archivo is not None:
+        return archivo
+
+    ruta = _ruta_temporal()
+    try:
+        await obtener_pool().ejecutar_async(
+            _generar_pdf_por_bloques_en_ruta, empresa, empresa_nit, stats, ruta
+        )
+        return _guardar_generado(cache, clave, ruta)
+    finally:
+        os.remove(ruta)
+
+
+def _ruta_temporal():
+    descriptor, ruta = tempfile.mkstemp(suffix=EXTENSION)
+    os.close(descriptor)
+    return ruta
+
+
+def _guardar_generado(cache, clave, ruta):
+    """Abre el PDF generado en ``ruta``, lo copia a la caché y lo deja al inicio."""
+    archivo = open(ruta, 'rb')
+    cache.guardar_archivo(clave, archivo, os.fstat(archivo.fileno()).st_size)
+    archivo.seek(0)
+    return archivo
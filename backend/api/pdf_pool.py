@@ -0,0 +1,193 @@
+"""
+Pool de procesos para generar PDFs.
+
+ReportLab es Python puro y consume CPU con el GIL tomado: generar un PDF en
+el hilo de la petición bloquea todo el worker de gunicorn. Con
+``PDF_POOL_TRABAJADORES`` > 0 los PDFs se generan en procesos aparte
+(iniciados con ``spawn`` y con Django, fuentes y estilos ya cargados), y el
+proceso web solo espera el resultado.
+
+Las vistas async usan ``ejecutar_async``, que espera el resultado sin
+bloquear el event loop.
+
+La cola es acotada: si ya hay ``PDF_POOL_MAX_PENDIENTES`` trabajos en curso
+o en espera, ``ejecutar`` falla de inmediato con ``PoolPDFSaturado`` en lugar
+de acumular peticiones. Con 0 trabajadores (valor por defecto, útil en
+desarrollo y pruebas) la función se ejecuta en el mismo proceso.
+"""
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolPDFSaturado(Exception):
+    """La cola del pool de PDFs está llena."""
+
+
+class TiempoPDFAgotado(Exception):
+    """Un PDF no terminó dentro del tiempo máximo por trabajo."""
+
+
+def _iniciar_trabajador():
+    """Carga Django y precalienta ReportLab en cada proceso del pool."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from .email_service import _estilos_reporte, generar_pdf_inventario
+    _estilos_reporte()
+    # Un documento vacío carga las fuentes y las clases de platypus
+    generar_pdf_inventario({}, [])
+
+
+def _ejecutar_en_trabajador(funcion, args):
+    from django.db import close_old_connections
+
+    close_old_connections()
+    try:
+        return funcion(*args)
+    finally:
+        close_old_connections()
+
+
+class PoolPDF:
+    """
+    Ejecuta funciones de generación de PDF en un pool de procesos.
+
+    Args:
+        trabajadores: procesos del pool; 0 ejecuta en el proceso actual
+        max_pendientes: trabajos en curso o en espera antes de rechazar
+        timeout: segundos máximos de espera por trabajo
+    """
+
+    def __init__(self, trabajadores=0, max_pendientes=None, timeout=60):
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes or max(trabajadores * 4, 1)
+        self.timeout = timeout
+        self._cupos = threading.BoundedSemaphore(self.max_pendientes)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_settings(cls):
+        return cls(
+            trabajadores=getattr(settings, 'PDF_POOL_TRABAJADORES', 0),
+            max_pendientes=getattr(settings, 'PDF_POOL_MAX_PENDIENTES', None),
+            timeout=getattr(settings, 'PDF_POOL_TIMEOUT', 60),
+        )
+
+    @property
+    def en_proceso(self):
+        """True si los trabajos se ejecutan en el proceso actual."""
+        return self.trabajadores <= 0
+
+    def _obtener_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.trabajadores,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_trabajador,
+                )
+            return self._executor
+
+    def _descartar_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _enviar(self, funcion, args):
+        """Toma un cupo de la cola y envía el trabajo al pool."""
+        if not self._cupos.acquire(blocking=False):
+            raise PoolPDFSaturado('Hay demasiados PDFs en proceso, intente más tarde')
+        try:
+            futuro = self._obtener_executor().submit(_ejecutar_en_trabajador, funcion, args)
+        except BaseException:
+            self._cupos.release()
+            raise
+        # El cupo se libera cuando el trabajo termina de verdad, aunque quien
+        # lo pidió haya dejado de esperar por timeout
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        return futuro
+
+    def ejecutar(self, funcion, *args):
+        """
+        Ejecuta ``funcion(*args)`` en el pool y espera el resultado.
+        ``funcion`` y sus argumentos deben poder serializarse con pickle.
+
+        Raises:
+            PoolPDFSaturado: si la cola está llena
+            TiempoPDFAgotado: si el trabajo supera ``timeout``
+        """
+        if self.en_proceso:
+            return funcion(*args)
+
+        futuro = self._enviar(funcion, args)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            futuro.cancel()
+            raise TiempoPDFAgotado(
+                f'La generación del PDF superó {self.timeout} segundos'
+            )
+        except BrokenProcessPool:
+            logger.exception('El pool de PDFs perdió un proceso; se reinicia')
+            self._descartar_executor()
+            raise
+
+    async def ejecutar_async(self, funcion, *args):
+        """
+        Versión para vistas async de ``ejecutar``: el event loop queda libre
+        mientras el PDF se genera en el pool.
+
+        Sin trabajadores la función corre en el hilo síncrono de Django
+        (``sync_to_async``), igual que una vista síncrona.
+        """
+        if self.en_proceso:
+            return await sync_to_async(funcion)(*args)
+
+        futuro = self._enviar(funcion, args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futuro), self.timeout)
+        except asyncio.TimeoutError:
+            futuro.cancel()
+            raise TiempoPDFAgotado(
+                f'La generación del PDF superó {self.timeout} segundos'
+            )
+        except BrokenProcessPool:
+            logger.exception('El pool de PDFs perdió un proceso; se reinicia')
+            self._descartar_executor()
+            raise
+
+    def cerrar(self):
+        self._descartar_executor()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Pool compartido del proceso (uno por PID: no se hereda tras un fork)."""
+    pid = os.getpid()
+    pool = _pools.get(pid)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(pid)
+            if pool is None:
+                pool = PoolPDF.desde_settings()
+                _pools[pid] = pool
+                atexit.register(pool.cerrar)
+    return pool
@@ -0,0 +1,329 @@
+"""
+Cliente HTTP de la API de Resend.
+
+Cada proceso reutiliza una única ``requests.Session`` con un pool de
+conexiones, de modo que los envíos consecutivos (p. ej. el worker de
+``procesar_envios``) no repiten DNS + TCP + TLS en cada correo. Todas las
+peticiones llevan timeout de conexión y de lectura, y los errores
+transitorios (429, 5xx, fallos de red) se reintentan con espera
+exponencial respetando ``Retry-After``.
+
+Los reintentos usan la cabecera ``Idempotency-Key`` de Resend, así que
+reenviar una petición cuya respuesta se perdió no duplica el correo.
+
+Las vistas async usan ``ClienteResendAsync`` (``httpx``, opcional), que
+espera la respuesta sin ocupar un hilo.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+import weakref
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+# Cliente HTTP async opcional
+try:
+    import httpx
+    HTTPX_DISPONIBLE = True
+except ImportError:
+    HTTPX_DISPONIBLE = False
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = 'https://api.resend.com'
+# Correos por petición que acepta POST /emails/batch
+TAMANIO_LOTE = 100
+ESTADOS_REINTENTABLES = frozenset({429, 500, 502, 503, 504})
+
+
+class ErrorResend(Exception):
+    """Respuesta de error de Resend (o fallo de red tras agotar reintentos)."""
+
+    def __init__(self, mensaje, status_code=None, respuesta=None):
+        super().__init__(mensaje)
+        self.status_code = status_code
+        self.respuesta = respuesta
+
+
+def _segundos_retry_after(valor):
+    """Interpreta ``Retry-After`` (segundos o fecha HTTP). None si no es válido."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (fecha - timezone.now()).total_seconds())
+
+
+class ClienteResend:
+    """
+    Cliente reutilizable de Resend con pool de conexiones.
+
+    Args:
+        api_key: API key de Resend
+        base_url: URL base de la API
+        timeout_conexion: segundos para establecer la conexión
+        timeout_lectura: segundos de espera de la respuesta
+        max_reintentos: reintentos ante errores transitorios
+        espera_base: primera espera entre reintentos (se duplica en cada uno)
+        espera_maxima: tope de cualquier espera, incluido ``Retry-After``
+        tamanio_pool: conexiones que se mantienen abiertas
+    """
+
+    def __init__(self, api_key, base_url=RESEND_API_URL, timeout_conexion=3.05,
+                 timeout_lectura=30, max_reintentos=3, espera_base=0.5,
+                 espera_maxima=30, tamanio_pool=10):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (timeout_conexion, timeout_lectura)
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.tamanio_pool = tamanio_pool
+        self._sesion = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_settings(cls, api_key):
+        return cls(
+            api_key,
+            base_url=getattr(settings, 'RESEND_API_URL', RESEND_API_URL),
+            timeout_conexion=getattr(settings, 'RESEND_TIMEOUT_CONEXION', 3.05),
+            timeout_lectura=getattr(settings, 'RESEND_TIMEOUT_LECTURA', 30),
+            max_reintentos=getattr(settings, 'RESEND_MAX_REINTENTOS', 3),
+            espera_maxima=getattr(settings, 'RESEND_ESPERA_MAXIMA', 30),
+            tamanio_pool=getattr(settings, 'RESEND_TAMANIO_POOL', 10),
+        )
+
+    @property
+    def sesion(self):
+        if self._sesion is None:
+            with self._lock:
+                if self._sesion is None:
+                    sesion = requests.Session()
+                    # Los reintentos los maneja el cliente (necesita Retry-After
+                    # y la idempotency key); el adaptador solo aporta el pool
+                    adaptador = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.tamanio_pool,
+                        max_retries=0,
+                    )
+                    sesion.mount('https://', adaptador)
+                    sesion.mount('http://', adaptador)
+                    sesion.headers.update({
+                        'Authorization': f'Bearer {self.api_key}',
+                        'Content-Type': 'application/json',
+                    })
+                    self._sesion = sesion
+        return self._sesion
+
+    def cerrar(self):
+        if self._sesion is not None:
+            self._sesion.close()
+            self._sesion = None
+
+    def dormir(self, segundos):
+        time.sleep(segundos)
+
+    def _espera(self, intento, respuesta=None):
+        espera = self.espera_base * (2 ** intento)
+        if respuesta is not None:
+            retry_after = _segundos_retry_after(respuesta.headers.get('Retry-After'))
+            if retry_after is not None:
+                espera = retry_after
+        return min(espera, self.espera_maxima)
+
+    def post(self, ruta, payload):
+        """
+        POST a la API con reintentos ante errores transitorios.
+
+        Returns:
+            dict: cuerpo JSON de la respuesta
+
+        Raises:
+            ErrorResend: respuesta no exitosa o red caída tras los reintentos
+        """
+        url = f'{self.base_url}/{ruta.lstrip("/")}'
+        headers = {'Idempotency-Key': str(uuid.uuid4())}
+        intento = 0
+        while True:
+            try:
+                respuesta = self.sesion.post(
+                    url, headers=headers, json=payload, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                espera = self._espera_reintento(intento, error=error)
+            else:
+                if respuesta.status_code in (200, 201):
+                    return respuesta.json()
+                espera = self._espera_reintento(intento, respuesta=respuesta)
+            self.dormir(espera)
+            intento += 1
+
+    def _espera_reintento(self, intento, respuesta=None, error=None):
+        """
+        Segundos a esperar antes de reintentar tras un fallo de red
+        (``error``) o una respuesta no exitosa.
+
+        Raises:
+            ErrorResend: si el fallo no es transitorio o no quedan reintentos
+        """
+        if error is not None:
+            if intento >= self.max_reintentos:
+                raise ErrorResend(f'Error de conexión con Resend: {error}') from error
+            espera = self._espera(intento)
+            logger.warning('Resend sin respuesta (%s); reintento en %.1fs', error, espera)
+            return espera
+        if (respuesta.status_code not in ESTADOS_REINTENTABLES
+                or intento >= self.max_reintentos):
+            raise ErrorResend(
+                f'Error enviando correo: {respuesta.status_code} - {respuesta.text}',
+                status_code=respuesta.status_code,
+                respuesta=respuesta,
+            )
+        espera = self._espera(intento, respuesta)
+        logger.warning(
+            'Resend respondió %s; reintento en %.1fs', respuesta.status_code, espera
+        )
+        return espera
+
+    def enviar(self, payload):
+        """Envía un correo (``POST /emails``)."""
+        return self.post('emails', payload)
+
+    def enviar_lote(self, payloads):
+        """
+        Envía hasta ``TAMANIO_LOTE`` correos en una sola petición
+        (``POST /emails/batch``).
+
+        El endpoint de lote de Resend no acepta adjuntos: si algún correo
+        lleva ``attachments`` se envían uno a uno por la misma sesión.
+
+        Returns:
+            list: respuesta de cada correo (``{'id': ...}``), en el mismo orden
+        """
+        if len(payloads) > TAMANIO_LOTE:
+            raise ValueError(f'Un lote admite como máximo {TAMANIO_LOTE} correos')
+        if not payloads:
+            return []
+        if any(payload.get('attachments') for payload in payloads):
+            return [self.enviar(payload) for payload in payloads]
+        respuesta = self.post('emails/batch', payloads)
+        return respuesta.get('data', [])
+
+
+class ClienteResendAsync(ClienteResend):
+    """
+    Variante async de ``ClienteResend`` sobre ``httpx.AsyncClient``, con
+    los mismos timeouts, reintentos e idempotency key. Mientras espera a
+    Resend el event loop sigue atendiendo otras peticiones.
+
+    Requiere ``httpx``; ver ``HTTPX_DISPONIBLE``.
+    """
+
+    @property
+    def sesion(self):
+        if self._sesion is None:
+            self._sesion = httpx.AsyncClient(
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json',
+                },
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(
+                    max_connections=self.tamanio_pool,
+                    max_keepalive_connections=self.tamanio_pool,
+                ),
+            )
+        return self._sesion
+
+    async def cerrar(self):
+        if self._sesion is not None:
+            await self._sesion.aclose()
+            self._sesion = None
+
+    async def dormir(self, segundos):
+        await asyncio.sleep(segundos)
+
+    async def post(self, ruta, payload):
+        """Versión async de ``ClienteResend.post``."""
+        url = f'{self.base_url}/{ruta.lstrip("/")}'
+        headers = {'Idempotency-Key': str(uuid.uuid4())}
+        intento = 0
+        while True:
+            try:
+                respuesta = await self.sesion.post(url, headers=headers, json=payload)
+            except httpx.TransportError as error:
+                espera = self._espera_reintento(intento, error=error)
+            else:
+                if respuesta.status_code in (200, 201):
+                    return respuesta.json()
+                espera = self._espera_reintento(intento, respuesta=respuesta)
+            await self.dormir(espera)
+            intento += 1
+
+    async def enviar(self, payload):
+        return await self.post('emails', payload)
+
+    async def enviar_lote(self, payloads):
+        """Versión async de ``ClienteResend.enviar_lote``."""
+        if len(payloads) > TAMANIO_LOTE:
+            raise ValueError(f'Un lote admite como máximo {TAMANIO_LOTE} correos')
+        if not payloads:
+            return []
+        if any(payload.get('attachments') for payload in payloads):
+            # Con adjuntos van uno a uno, pero en paralelo por el mismo pool
+            return list(await asyncio.gather(*(self.enviar(payload) for payload in payloads)))
+        respuesta = await self.post('emails/batch', payloads)
+        return respuesta.get('data', [])
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def obtener_cliente(api_key):
+    """
+    Cliente compartido del proceso para ``api_key``.
+
+    Se indexa también por PID: un proceso hijo (fork) no debe heredar los
+    sockets del pool del padre.
+    """
+    clave = (os.getpid(), api_key)
+    cliente = _clientes.get(clave)
+    if cliente is None:
+        with _clientes_lock:
+            cliente = _clientes.get(clave)
+            if cliente is None:
+                cliente = ClienteResend.desde_settings(api_key)
+                _clientes[clave] = cliente
+    return cliente
+
+
+# Un httpx.AsyncClient pertenece al event loop que lo creó
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def obtener_cliente_async(api_key):
+    """
+    Cliente async compartido por el event loop actual para ``api_key``.
+    Debe llamarse desde una corrutina.
+    """
+    por_api_key = _clientes_async.setdefault(asyncio.get_running_loop(), {})
+    cliente = por_api_key.get(api_key)
+    if cliente is None:
+        cliente = ClienteResendAsync.desde_settings(api_key)
+        por_api_key[api_key] = cliente
+    return cliente
@@ -1,6 +1,50 @@
 from rest_framework import serializers
 
-from litethinking_domain.models import Empresa, Producto, Inventario, HistorialEnvio
+from litethinking_domain.models import (
+    Empresa,
+    Producto,
+    Inventario,
+    HistorialEnvio,
+    ResumenInventario,
+)
+
+
+PARAMETRO_CAMPOS = 'fields'
+
+
+def campos_solicitados(request):
+    """
+    Lee el parámetro ``?fields=a,b,c`` de una petición de lectura.
+
+    Returns:
+        Conjunto de nombres de campo, o None si no se pidió proyección
+    """
+    if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return None
+    valor = request.query_params.get(PARAMETRO_CAMPOS)
+    if not valor:
+        return None
+    return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+
+class CamposDinamicosMixin:
+    """
+    Permite al cliente pedir solo algunos campos con ``?fields=``.
+    Solo aplica en peticiones de lectura; las escrituras usan todos los campos.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get('request'))
+        if campos is None:
+            return
+        desconocidos = campos - set(self.fields)
+        if desconocidos:
+            raise serializers.ValidationError({
+                PARAMETRO_CAMPOS: f"Campos no válidos: {', '.join(sorted(desconocidos))}"
+            })
+        for nombre in set(self.fields) - campos:
+            self.fields.pop(nombre)
 
 
 class EmpresaSerializer(serializers.ModelSerializer):
@@ -14,7 +58,7 @@ class EmpresaSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     empresa_nombre = serializers.CharField(
         source='empresa.nombre',
         read_only=True
@@ -33,7 +77,7 @@ class ProductoSerializer(serializers.ModelSerializer):
         ]
 
 
-class InventarioSerializer(serializers.ModelSerializer):
+class InventarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     producto_codigo = serializers.CharField(
         source='producto.codigo',
         read_only=True
@@ -84,6 +128,7 @@ class HistorialEnvioSerializer(serializers.ModelSerializer):
         read_only=True
     )
     usuario_nombre = serializers.SerializerMethodField()
+    merkle_raiz = serializers.CharField(read_only=True)
     
     class Meta:
         model = HistorialEnvio
@@ -102,6 +147,7 @@ class HistorialEnvioSerializer(serializers.ModelSerializer):
             # Blockchain
             'documento_hash',
             'contenido_hash',
+            'merkle_raiz',
             # Métricas
             'total_productos',
             'total_unidades',
@@ -130,6 +176,7 @@ class HistorialEnvioSerializer(serializers.ModelSerializer):
             'proveedor',
             'documento_hash',
             'contenido_hash',
+            'merkle_raiz',
             'total_productos',
             'total_unidades',
             'valor_inventario',
@@ -145,3 +192,108 @@ class HistorialEnvioSerializer(serializers.ModelSerializer):
         if obj.usuario:
             return obj.usuario.get_full_name() or obj.usuario.username
         return None
+
+
+class ResumenInventarioSerializer(serializers.ModelSerializer):
+    """
+    Serializer de los agregados precalculados del inventario.
+    Expone las mismas métricas que el análisis IA sin recorrer las filas.
+    """
+    empresa_nombre = serializers.CharField(
+        source='empresa.nombre',
+        read_only=True
+    )
+    valor_total = serializers.FloatField(read_only=True)
+    productos_stock_saludable = serializers.IntegerField(read_only=True)
+    pct_sin_stock = serializers.SerializerMethodField()
+    pct_stock_bajo = serializers.SerializerMethodField()
+    pct_stock_saludable = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ResumenInventario
+        fields = [
+            'empresa',
+            'empresa_nombre',
+            'total_productos',
+            'total_unidades',
+            'productos_sin_stock',
+            'productos_stock_bajo',
+            'productos_stock_medio',
+            'productos_stock_alto',
+            'productos_stock_saludable',
+            'valor_total',
+            'valor_por_moneda',
+            'pct_sin_stock',
+            'pct_stock_bajo',
+            'pct_stock_saludable',
+            'fecha_actualizacion',
+        ]
+        read_only_fields = fields
+
+    def get_pct_sin_stock(self, obj):
+        return round(obj.pct_sin_stock, 1)
+
+    def get_pct_stock_bajo(self, obj):
+        return round(obj.pct_stock_bajo, 1)
+
+    def get_pct_stock_saludable(self, obj):
+        return round(obj.pct_stock_saludable, 1)
+
+
+class EnvioLoteSerializer(serializers.Serializer):
+    """
+    Valida un envío masivo: cada empresa de ``empresas`` se envía a cada
+    correo de ``destinatarios``.
+    """
+    MAX_DESTINATARIOS = 5000
+
+    empresas = serializers.ListField(
+        child=serializers.CharField(max_length=20),
+        allow_empty=False,
+        max_length=100
+    )
+    destinatarios = serializers.ListField(
+        child=serializers.EmailField(),
+        allow_empty=False,
+        max_length=MAX_DESTINATARIOS
+    )
+    incluir_analisis_ia = serializers.BooleanField(default=True)
+    incluir_blockchain = serializers.BooleanField(default=True)
+    adjuntar_pdf = serializers.BooleanField(default=True)
+
+    def validate_destinatarios(self, value):
+        # Sin duplicados (sin distinguir mayúsculas), conservando el orden
+        unicos = {}
+        for email in value:
+            unicos.setdefault(email.lower(), email)
+        return list(unicos.values())
+
+    def validate_empresas(self, value):
+        nits = list(dict.fromkeys(value))
+        empresas = Empresa.objects.in_bulk(nits, field_name='nit')
+        faltantes = [nit for nit in nits if nit not in empresas]
+        if faltantes:
+            raise serializers.ValidationError(
+                f"Empresas no encontradas: {', '.join(faltantes)}"
+            )
+        return [empresas[nit] for nit in nits]
+
+
+class AjusteInventarioLoteSerializer(serializers.Serializer):
+    """
+    Valida la forma de un ajuste masivo de existencias. Cada ajuste se
+    valida en ``ajuste_service`` para responder con un resultado por ítem.
+    """
+    MAX_AJUSTES = 20000
+
+    empresa = serializers.CharField(max_length=20, required=False)
+    ajustes = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_AJUSTES
+    )
+
+    def validate_empresa(self, value):
+        if not Empresa.objects.filter(nit=value).exists():
+            raise serializers.ValidationError('Empresa no encontrada')
+        return value
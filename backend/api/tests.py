@@ -8,6 +8,7 @@ from unittest.mock import patch, MagicMock
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
@@ -320,6 +321,50 @@ class ProductoAPITest(APITestCase):
         inventario = Inventario.objects.filter(producto=producto).first()
         self.assertIsNotNone(inventario)
         self.assertEqual(inventario.cantidad, 50)
+    
+    def test_importar_csv(self):
+        """Test: Importar un CSV crea productos con su stock y actualiza los existentes"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from litethinking_domain.models import ResumenInventario
+        
+        contenido = (
+            'empresa,codigo,nombre,precio_cop,cantidad,empresa_nombre\n'
+            '900123456-1,PROD-001,Producto Renombrado,12000,99,\n'
+            '900123456-1,PROD-100,Nuevo,500,7,\n'
+            '800,PROD-200,De empresa nueva,100,3,Empresa Nueva\n'
+            '700,PROD-300,Sin empresa,100,3,\n'
+            '900123456-1,PROD-400,Cantidad mala,100,-1,\n'
+        ).encode('utf-8')
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(
+            reverse('producto-importar'),
+            {'archivo': SimpleUploadedFile('catalogo.csv', contenido)},
+            format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['filas'], 5)
+        self.assertEqual(response.data['productos_creados'], 2)
+        self.assertEqual(response.data['productos_actualizados'], 1)
+        self.assertEqual(response.data['inventarios_creados'], 3)
+        self.assertEqual(sorted(e['linea'] for e in response.data['detalle_errores']), [5, 6])
+        
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.nombre, 'Producto Renombrado')
+        self.assertEqual(self.producto.precios, {'COP': 12000})
+        self.assertEqual(Inventario.objects.get(producto__codigo='PROD-100').cantidad, 7)
+        self.assertEqual(Empresa.objects.get(nit='800').nombre, 'Empresa Nueva')
+        self.assertEqual(ResumenInventario.objects.get(empresa_id='900123456-1').total_unidades, 106)
+    
+    def test_importar_requiere_archivo_y_formato(self):
+        """Test: Importar sin archivo o con formato desconocido"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        
+        url = reverse('producto-importar')
+        self.client.force_authenticate(user=self.admin_user)
+        self.assertEqual(self.client.post(url, {}, format='multipart').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'archivo': SimpleUploadedFile('c.xlsx', b'x')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -381,6 +426,395 @@ class InventarioAPITest(APITestCase):
         self.inventario.refresh_from_db()
         self.assertEqual(self.inventario.cantidad, 200)
 
+    def test_ajuste_masivo(self):
+        """Test: Ajuste masivo por id y por código, con un resultado por ítem"""
+        from litethinking_domain.models import ResumenInventario
+
+        otro = Inventario.objects.create(
+            producto=Producto.objects.create(
+                codigo='PROD-002', nombre='Otro', precios={'COP': 500}, empresa=self.empresa
+            ),
+            cantidad=5
+        )
+        fecha_anterior = self.inventario.fecha_actualizacion
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(reverse('inventario-ajustes'), {'ajustes': [
+            {'producto_codigo': 'PROD-001', 'cantidad': 40},
+            {'id': otro.id, 'delta': -2},
+            {'id': otro.id, 'delta': -10},
+            {'producto_codigo': 'NO-EXISTE', 'cantidad': 1},
+            {'id': otro.id, 'cantidad': 3, 'delta': 1},
+            {'producto_codigo': 'PROD-001', 'cantidad': 40},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data['actualizados'], response.data['sin_cambios'], response.data['errores']),
+            (2, 1, 3)
+        )
+        resultados = response.data['resultados']
+        self.assertEqual(resultados[0]['cantidad_anterior'], 100)
+        self.assertEqual(resultados[1]['cantidad'], 3)
+        self.assertIn('negativa', resultados[2]['error'])
+        self.assertEqual(resultados[3]['error'], 'Inventario no encontrado')
+
+        self.inventario.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual((self.inventario.cantidad, otro.cantidad), (40, 3))
+        self.assertGreater(self.inventario.fecha_actualizacion, fecha_anterior)
+        resumen = ResumenInventario.objects.get(empresa=self.empresa)
+        self.assertEqual(resumen.total_unidades, 43)
+        self.assertEqual(resumen.productos_stock_bajo, 1)
+
+    def test_ajuste_masivo_valida_empresa_y_permisos(self):
+        """Test: El ajuste masivo requiere admin y respeta la empresa indicada"""
+        url = reverse('inventario-ajustes')
+        datos = {'empresa': '900123456-1', 'ajustes': [{'id': self.inventario.id, 'cantidad': 1}]}
+
+        normal = User.objects.create_user(username='normal', email='n@example.com', password='x')
+        self.client.force_authenticate(user=normal)
+        self.assertEqual(self.client.post(url, datos, format='json').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin_user)
+        otra = self.client.post(url, {**datos, 'empresa': 'NO-EXISTE'}, format='json')
+        self.assertEqual(otra.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {'ajustes': []}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        Empresa.objects.create(nit='800', nombre='Otra', direccion='D', telefono='T')
+        ajena = self.client.post(url, {**datos, 'empresa': '800'}, format='json')
+        self.assertEqual(ajena.data['errores'], 1)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 100)
+
+    def test_exportar_csv_y_ndjson(self):
+        """Test: Exportar el inventario por partes en CSV y NDJSON"""
+        import csv
+        import io
+
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('inventario-exportar')
+        respuesta_csv = self.client.get(url, {'empresa': self.empresa.nit})
+        self.assertEqual(respuesta_csv.status_code, status.HTTP_200_OK)
+        self.assertTrue(respuesta_csv.streaming)
+        self.assertIn('inventario.csv', respuesta_csv['Content-Disposition'])
+        filas = list(csv.DictReader(io.StringIO(
+            b''.join(respuesta_csv.streaming_content).decode('utf-8')
+        )))
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['producto_codigo'], 'PROD-001')
+        self.assertEqual(json.loads(filas[0]['producto_precios']), {'COP': 10000})
+
+        respuesta_ndjson = self.client.get(url, {'formato': 'ndjson'})
+        lineas = b''.join(respuesta_ndjson.streaming_content).decode('utf-8').splitlines()
+        fila = json.loads(lineas[0])
+        self.assertEqual((fila['empresa_nit'], fila['cantidad']), ('900123456-1', 100))
+        self.assertEqual(fila['producto_precios'], {'COP': 10000})
+
+        self.assertEqual(self.client.get(url, {'formato': 'xlsx'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_exportar_con_busqueda_y_orden(self):
+        """Test: La exportación aplica ?search= y ?ordering= como el listado"""
+        otro = Producto.objects.create(
+            codigo='PROD-002', nombre='Accesorio', precios={'COP': 500}, empresa=self.empresa
+        )
+        Inventario.objects.create(producto=otro, cantidad=3)
+
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('inventario-exportar')
+
+        def codigos(params):
+            response = self.client.get(url, {'formato': 'ndjson', **params})
+            lineas = b''.join(response.streaming_content).decode('utf-8').splitlines()
+            return [json.loads(linea)['producto_codigo'] for linea in lineas]
+
+        self.assertEqual(codigos({'search': 'Accesorio'}), ['PROD-002'])
+        self.assertEqual(codigos({'ordering': 'producto__nombre'}), ['PROD-002', 'PROD-001'])
+        self.assertEqual(codigos({'ordering': '-producto__nombre'}), ['PROD-001', 'PROD-002'])
+
+    async def test_exportar_bajo_asgi_por_partes(self):
+        """Test: Bajo ASGI el CSV se envía por partes, sin consumir el iterador completo"""
+        import warnings
+        from asgiref.sync import sync_to_async
+
+        otro = await Producto.objects.acreate(
+            codigo='PROD-002', nombre='Accesorio', precios={'COP': 500}, empresa=self.empresa
+        )
+        await Inventario.objects.acreate(producto=otro, cantidad=3)
+        await self.async_client.aforce_login(self.admin_user)
+
+        partes = []
+        with patch('api.exportacion_service.TAMANIO_LOTE_EXPORTACION', 1), \
+                warnings.catch_warnings():
+            # Aviso de StreamingHttpResponse al bufferizar un iterador síncrono
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            response = await self.async_client.get(reverse('inventario-exportar'))
+            self.assertTrue(response.is_async)
+            async for parte in response:
+                partes.append(parte)
+        await sync_to_async(response.close)()
+
+        # Encabezado y una parte por fila
+        self.assertEqual(len(partes), 3)
+        self.assertTrue(partes[0].startswith(b'id,empresa_nit'))
+
+    def test_exportar_parquet(self):
+        """Test: Exportar el inventario en Parquet (requiere pyarrow)"""
+        from .exportacion_service import PYARROW_DISPONIBLE
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(reverse('inventario-exportar'), {'formato': 'parquet'})
+        if not PYARROW_DISPONIBLE:
+            self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+            return
+
+        import io
+        import pyarrow.parquet as pq
+
+        tabla = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tabla.column('producto_codigo').to_pylist(), ['PROD-001'])
+        self.assertEqual(tabla.column('cantidad').to_pylist(), [100])
+
+
+class PaginacionCursorAPITest(APITestCase):
+    """Tests para paginación por cursor y proyección de campos"""
+    
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.empresa = Empresa.objects.create(
+            nit='900123456-1',
+            nombre='Empresa Test',
+            direccion='Calle 123',
+            telefono='3001234567'
+        )
+        # Nombres repetidos para forzar empates en el orden
+        for i in range(7):
+            producto = Producto.objects.create(
+                codigo=f'PROD-{i:03d}',
+                nombre='Producto Repetido' if i % 2 else f'Producto {i}',
+                precios={'COP': 1000},
+                empresa=self.empresa
+            )
+            Inventario.objects.create(producto=producto, cantidad=i)
+        # Misma fecha para todas las filas, como tras un ajuste masivo
+        Inventario.objects.update(fecha_actualizacion=timezone.now())
+        self.client.force_authenticate(user=self.admin_user)
+    
+    def _recorrer(self, url, params):
+        ids = []
+        paginas = 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            paginas += 1
+            if not response.data['next']:
+                return ids, paginas
+            response = self.client.get(response.data['next'])
+    
+    def test_listado_sin_parametros_no_pagina(self):
+        """Test: Sin cursor ni page_size se mantiene la lista completa"""
+        response = self.client.get(reverse('inventario-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+    
+    def test_cursor_inventario_recorre_todo_sin_duplicados(self):
+        """Test: El cursor recorre todas las filas aunque compartan fecha"""
+        ids, paginas = self._recorrer(reverse('inventario-list'), {'page_size': 3})
+        self.assertEqual(paginas, 3)
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+    
+    def test_cursor_producto_con_nombres_repetidos(self):
+        """Test: El cursor de productos desempata por id"""
+        ids, _ = self._recorrer(reverse('producto-list'), {'page_size': 2})
+        esperado = list(
+            Producto.objects.order_by('nombre', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, esperado)
+    
+    def test_cursor_invalido(self):
+        """Test: Un cursor corrupto responde 404"""
+        response = self.client.get(reverse('inventario-list'), {'cursor': 'no-valido'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_con_tipos_invalidos(self):
+        """Test: Un cursor bien codificado pero con valores de otro tipo responde 404"""
+        from .pagination import KeysetPagination
+
+        codificar = KeysetPagination().codificar_cursor
+        casos = [
+            ('inventario-list', ['abc', 1]),
+            ('inventario-list', ['2026-01-01T00:00:00+00:00', 'uno']),
+            ('inventario-list', [None, 1]),
+            ('producto-list', [['lista'], 1]),
+            ('producto-list', ['Producto', 10 ** 30]),
+        ]
+        for nombre_url, posicion in casos:
+            with self.subTest(posicion=posicion):
+                response = self.client.get(reverse(nombre_url), {'cursor': codificar(posicion)})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Un cursor válido sigue funcionando
+        response = self.client.get(
+            reverse('producto-list'), {'cursor': codificar(['Producto', 0]), 'page_size': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cursor_con_ordering(self):
+        """Test: ordering con paginación por cursor responde 400 en vez de ignorarse"""
+        response = self.client.get(
+            reverse('producto-list'), {'page_size': 2, 'ordering': '-codigo'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+    
+    def test_campos_dispersos(self):
+        """Test: ?fields= limita los campos de la respuesta"""
+        response = self.client.get(
+            reverse('inventario-list'),
+            {'fields': 'id,producto_codigo,cantidad', 'page_size': 5}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data['results'][0].keys()),
+            {'id', 'producto_codigo', 'cantidad'}
+        )
+    
+    def test_campos_dispersos_una_sola_consulta(self):
+        """Test: La proyección no genera consultas adicionales por fila"""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('producto-list'),
+                {'fields': 'id,nombre,empresa_nombre'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0].keys()), {'id', 'nombre', 'empresa_nombre'})
+    
+    def test_campo_desconocido(self):
+        """Test: Pedir un campo inexistente responde 400"""
+        response = self.client.get(reverse('producto-list'), {'fields': 'id,no_existe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS DE BÚSQUEDA DE TEXTO COMPLETO
+# ═══════════════════════════════════════════════════════════════
+
+class BusquedaProductosAPITest(APITestCase):
+    """Tests para la búsqueda de productos con el índice de texto completo"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.empresa = Empresa.objects.create(
+            nit='900123456-1',
+            nombre='Textiles Andinos',
+            direccion='Calle 123',
+            telefono='3001234567'
+        )
+        self.otra_empresa = Empresa.objects.create(
+            nit='900654321-1',
+            nombre='Ferretería Central',
+            direccion='Carrera 45',
+            telefono='3007654321'
+        )
+        self.camiseta = Producto.objects.create(
+            codigo='CAM-001',
+            nombre='Camiseta algodón',
+            caracteristicas='Manga corta',
+            empresa=self.empresa
+        )
+        self.pantalon = Producto.objects.create(
+            codigo='PAN-002',
+            nombre='Pantalón',
+            caracteristicas='Incluye camiseta de regalo',
+            empresa=self.empresa
+        )
+        self.martillo = Producto.objects.create(
+            codigo='MAR-003',
+            nombre='Martillo',
+            caracteristicas='Mango de madera',
+            empresa=self.otra_empresa
+        )
+        for producto in (self.camiseta, self.pantalon, self.martillo):
+            Inventario.objects.create(producto=producto, cantidad=1)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def _buscar(self, nombre_url, texto, **params):
+        response = self.client.get(reverse(nombre_url), {'search': texto, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_prefijo_ordenado_por_relevancia(self):
+        """Test: Un prefijo encuentra las coincidencias, primero la del nombre"""
+        datos = self._buscar('producto-list', 'camis')
+        self.assertEqual([item['id'] for item in datos], [self.camiseta.id, self.pantalon.id])
+
+    def test_sin_tildes_ni_mayusculas(self):
+        """Test: La búsqueda ignora tildes y mayúsculas"""
+        datos = self._buscar('producto-list', 'ALGODON')
+        self.assertEqual([item['id'] for item in datos], [self.camiseta.id])
+
+    def test_varias_palabras_y_codigo(self):
+        """Test: Todas las palabras deben coincidir; el código también se indexa"""
+        self.assertEqual(
+            [item['id'] for item in self._buscar('producto-list', 'mango madera')],
+            [self.martillo.id]
+        )
+        self.assertEqual(
+            [item['id'] for item in self._buscar('producto-list', 'PAN-00')],
+            [self.pantalon.id]
+        )
+
+    def test_por_nombre_de_empresa(self):
+        """Test: Coinciden los productos de la empresa con ese nombre"""
+        datos = self._buscar('producto-list', 'Ferretería')
+        self.assertEqual([item['id'] for item in datos], [self.martillo.id])
+
+    def test_indice_sigue_los_cambios(self):
+        """Test: El índice se actualiza al editar y al borrar productos"""
+        self.martillo.nombre = 'Destornillador'
+        self.martillo.save()
+        self.assertEqual(self._buscar('producto-list', 'martillo'), [])
+        self.assertEqual(
+            [item['id'] for item in self._buscar('producto-list', 'destorn')],
+            [self.martillo.id]
+        )
+        self.camiseta.delete()
+        self.assertEqual(
+            [item['id'] for item in self._buscar('producto-list', 'camiseta')],
+            [self.pantalon.id]
+        )
+
+    def test_orden_explicito_tiene_prioridad(self):
+        """Test: Con ?ordering= no se ordena por relevancia"""
+        datos = self._buscar('producto-list', 'camis', ordering='-nombre')
+        self.assertEqual([item['id'] for item in datos], [self.pantalon.id, self.camiseta.id])
+
+    def test_inventario(self):
+        """Test: El inventario se busca por su producto, con paginación por cursor"""
+        datos = self._buscar('inventario-list', 'camis')
+        self.assertEqual(
+            [item['producto'] for item in datos], [self.camiseta.id, self.pantalon.id]
+        )
+        datos = self._buscar('inventario-list', 'camis', page_size=1)
+        self.assertEqual(len(datos['results']), 1)
+        self.assertIsNotNone(datos['next'])
+
+    def test_texto_sin_palabras(self):
+        """Test: Un texto sin palabras no rompe la consulta FTS"""
+        datos = self._buscar('producto-list', '"*')
+        self.assertEqual(datos, [])
+
 
 # ═══════════════════════════════════════════════════════════════
 # TESTS DE GENERACIÓN DE PDF
@@ -426,6 +860,93 @@ class GenerarPDFAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['Content-Type'], 'application/pdf')
     
+    def test_generar_pdf_etag_y_cache(self):
+        """Test: Un inventario sin cambios responde 304 y no se vuelve a renderizar"""
+        import tempfile
+        from django.test import override_settings
+        
+        self.client.force_authenticate(user=self.user)
+        with tempfile.TemporaryDirectory() as directorio, override_settings(PDF_CACHE_DIR=directorio):
+            with patch('api.pdf_cache.escribir_pdf_inventario', side_effect=lambda e, i, destino: destino.write(b'%PDF-test')) as mock_pdf:
+                primera = self.client.get(self.pdf_url)
+                segunda = self.client.get(self.pdf_url)
+                no_modificado = self.client.get(self.pdf_url, HTTP_IF_NONE_MATCH=primera['ETag'])
+                
+                self.inventario.cantidad = 50
+                self.inventario.save()
+                cambiado = self.client.get(self.pdf_url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        
+        self.assertEqual(primera.content, b'%PDF-test')
+        self.assertEqual(segunda.content, b'%PDF-test')
+        self.assertEqual(primera['ETag'], segunda['ETag'])
+        self.assertEqual(no_modificado.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cambiado.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(cambiado['ETag'], primera['ETag'])
+        self.assertEqual(mock_pdf.call_count, 2)
+    
+    def test_generar_pdf_por_bloques(self):
+        """Test: Un inventario grande se genera por bloques y se envía por partes"""
+        import tempfile
+        from django.test import override_settings
+        
+        for i in range(5):
+            producto = Producto.objects.create(
+                codigo=f'BLQ-{i}', nombre=f'Bloque {i}', precios={'COP': 100}, empresa=self.empresa
+            )
+            Inventario.objects.create(producto=producto, cantidad=i)
+        
+        self.client.force_authenticate(user=self.user)
+        with tempfile.TemporaryDirectory() as directorio, \
+                override_settings(PDF_CACHE_DIR=directorio, PDF_UMBRAL_POR_BLOQUES=3):
+            response = self.client.get(self.pdf_url)
+            contenido = b''.join(response.streaming_content)
+            repetida = self.client.get(self.pdf_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(repetida.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_generar_pdf_por_bloques_con_resumen_atrasado(self):
+        """Test: El modo por bloques cuenta las filas reales, no el resumen"""
+        import tempfile
+        from django.test import override_settings
+        from litethinking_domain.models import ResumenInventario
+
+        # bulk_create no dispara señales: el resumen queda atrasado
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'BLK-{i}', nombre=f'Masivo {i}', precios={'COP': 100}, empresa=self.empresa)
+            for i in range(5)
+        ])
+        Inventario.objects.bulk_create([Inventario(producto=p, cantidad=1) for p in productos])
+        self.assertLessEqual(ResumenInventario.obtener(self.empresa.nit).total_productos, 3)
+
+        self.client.force_authenticate(user=self.user)
+        with tempfile.TemporaryDirectory() as directorio, \
+                override_settings(PDF_CACHE_DIR=directorio, PDF_UMBRAL_POR_BLOQUES=3):
+            response = self.client.get(self.pdf_url)
+            contenido = b''.join(response.streaming_content)
+
+        self.assertTrue(response.streaming)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+
+    def test_generar_pdf_pool_saturado(self):
+        """Test: Con la cola de PDFs llena se responde 503"""
+        import tempfile
+        from django.test import override_settings
+        from .pdf_pool import PoolPDFSaturado
+        
+        pool = MagicMock()
+        pool.ejecutar.side_effect = PoolPDFSaturado('Hay demasiados PDFs en proceso')
+        self.client.force_authenticate(user=self.user)
+        with tempfile.TemporaryDirectory() as directorio, override_settings(PDF_CACHE_DIR=directorio):
+            with patch('api.pdf_cache.obtener_pool', return_value=pool):
+                response = self.client.get(self.pdf_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+    
     def test_generar_pdf_empresa_no_existe(self):
         """Test: Generar PDF de empresa que no existe"""
         self.client.force_authenticate(user=self.user)
@@ -503,9 +1024,9 @@ class EnviarCorreoAPITest(APITestCase):
         response = self.client.post(self.correo_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
     
-    @patch('api.views.enviar_correo_resend')
+    @patch('api.envio_service.enviar_correo_resend')
     def test_enviar_correo_exitoso(self, mock_enviar):
-        """Test: Enviar correo exitosamente (mock)"""
+        """Test: El envío se encola (202) y el worker lo entrega (mock)"""
         mock_enviar.return_value = {'id': 'test-id-123'}
         self.client.force_authenticate(user=self.user)
         data = {
@@ -515,13 +1036,65 @@ class EnviarCorreoAPITest(APITestCase):
             'incluir_blockchain': False
         }
         response = self.client.post(self.correo_url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertTrue(response.data['success'])
+        mock_enviar.assert_not_called()
         
-        # Verificar que se creó el historial
+        # Verificar que se creó el historial pendiente
         historial = HistorialEnvio.objects.filter(empresa=self.empresa).first()
         self.assertIsNotNone(historial)
+        self.assertEqual(historial.estado, 'pendiente')
+        self.assertEqual(response.data['historial_id'], historial.id)
+        
+        # El worker procesa la cola y entrega el correo
+        from .envio_service import procesar_cola
+        self.assertEqual(procesar_cola(), 1)
+        historial.refresh_from_db()
         self.assertEqual(historial.estado, 'enviado')
+        self.assertEqual(historial.proveedor, 'resend')
+        self.assertEqual(historial.total_unidades, 100)
+        mock_enviar.assert_called_once()
+
+    def test_envio_lote_validaciones(self):
+        """Test: El envío masivo valida empresas y correos"""
+        self.client.force_authenticate(user=self.user)
+        url = reverse('inventario-enviar-correo-lote')
+        
+        response = self.client.post(url, {
+            'empresas': ['NO-EXISTE'],
+            'destinatarios': ['a@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('empresas', response.data)
+        
+        response = self.client.post(url, {
+            'empresas': [self.empresa.nit],
+            'destinatarios': ['no-es-correo'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('destinatarios', response.data)
+    
+    @patch('api.envio_service.enviar_lote_resend')
+    def test_envio_lote_exitoso(self, mock_lote):
+        """Test: El envío masivo crea un historial por destinatario y un trabajo por empresa"""
+        mock_lote.side_effect = lambda payloads: [{'id': f'id-{i}'} for i in range(len(payloads))]
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('inventario-enviar-correo-lote'), {
+            'empresas': [self.empresa.nit],
+            'destinatarios': ['a@example.com', 'b@example.com', 'A@example.com'],
+            'incluir_analisis_ia': False,
+            'adjuntar_pdf': False,
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['total_envios'], 2)
+        self.assertEqual(len(response.data['trabajos']), 1)
+        
+        from .envio_service import procesar_cola
+        self.assertEqual(procesar_cola(), 1)
+        enviados = HistorialEnvio.objects.filter(empresa=self.empresa, estado='enviado')
+        self.assertEqual(enviados.count(), 2)
+        mock_lote.assert_called_once()
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -569,6 +1142,103 @@ class HistorialEnviosAPITest(APITestCase):
         response = self.client.get(self.list_url, {'empresa': self.empresa.nit})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreater(len(response.data), 0)
+    
+    def test_prueba_merkle_producto(self):
+        """Test: Prueba de inclusión de un producto del envío"""
+        from litethinking_domain.models import ArbolMerkleInventario
+        
+        arbol = ArbolMerkleInventario.desde_filas([
+            ('PROD-001', 'Producto 1', 10),
+            ('PROD-002', 'Producto 2', 0),
+            ('PROD-003', 'Producto 3', 7),
+        ])
+        arbol.guardar()
+        self.historial.arbol_merkle = arbol
+        self.historial.save()
+        
+        self.client.force_authenticate(user=self.user)
+        url = reverse('historial-envio-prueba', kwargs={'pk': self.historial.pk})
+        response = self.client.get(url, {'codigo': 'PROD-002', 'nombre': 'Producto 2', 'cantidad': '0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['raiz'], arbol.raiz)
+        self.assertTrue(response.data['valida'])
+        self.assertEqual(len(response.data['pruebas'][0]['prueba']), 2)
+        
+        alterada = self.client.get(url, {'codigo': 'PROD-002', 'nombre': 'Producto 2', 'cantidad': '5'})
+        self.assertFalse(alterada.data['valida'])
+        self.assertEqual(self.client.get(url, {'codigo': 'OTRO'}).status_code, status.HTTP_404_NOT_FOUND)
+        
+        detalle = self.client.get(reverse('historial-envio-detail', kwargs={'pk': self.historial.pk}))
+        self.assertEqual(detalle.data['merkle_raiz'], arbol.raiz)
+    
+    def test_exportar_historial_ndjson(self):
+        """Test: Exportar el historial de envíos en NDJSON"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('historial-envio-exportar'), {'formato': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        fila = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(fila['email_destino'], 'destino@example.com')
+        self.assertEqual(fila['valor_inventario'], '0.00')
+        self.assertIsNone(fila['fecha_envio'])
+
+
+class VerificarDocumentoAPITest(APITestCase):
+    """Tests para la verificación pública de documentos por hash"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.empresa = Empresa.objects.create(
+            nit='900123456-1',
+            nombre='Empresa Test',
+            direccion='Calle 123',
+            telefono='3001234567'
+        )
+        self.historial = HistorialEnvio.objects.create(
+            empresa=self.empresa,
+            email_destino='destino@example.com',
+            asunto='Reporte',
+            estado='enviado',
+            documento_hash='ab' * 32,
+            contenido_hash='cd' * 32,
+            fecha_envio=timezone.now(),
+        )
+
+    def test_verificar_por_url_de_verificacion(self):
+        """Test: La URL del historial resuelve el documento sin autenticación"""
+        response = self.client.get(self.historial.verificacion_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['valido'])
+        envio = response.data['envios'][0]
+        self.assertEqual(envio['empresa_nit'], '900123456-1')
+        self.assertEqual(envio['destinatario'], 'd***@example.com')
+        self.assertEqual(envio['documento_hash'], 'ab' * 32)
+
+    def test_verificar_por_hash_completo_o_de_contenido(self):
+        """Test: Hash completo del PDF o del contenido"""
+        for valor in ('AB' * 32, 'cd' * 32):
+            url = reverse('verificar-documento', kwargs={'hash_documento': valor})
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_documento_no_emitido(self):
+        """Test: Prefijos que no coinciden, envíos fallidos y hashes inválidos"""
+        url = lambda valor: reverse('verificar-documento', kwargs={'hash_documento': valor})
+        self.assertEqual(self.client.get(url('ab' * 8 + 'ff')).status_code, status.HTTP_404_NOT_FOUND)
+
+        HistorialEnvio.objects.filter(pk=self.historial.pk).update(estado='fallido')
+        self.assertEqual(self.client.get(url('ab' * 8)).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(self.client.get(url('abc')).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url('z' * 16)).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resultado_en_cache(self):
+        """Test: Un documento encontrado se responde desde la caché"""
+        self.client.get(self.historial.verificacion_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.historial.verificacion_url)
+        self.assertTrue(response.data['valido'])
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -628,3 +1298,224 @@ class AnalisisIAAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.data['success'])
         self.assertIn('analisis', response.data)
+
+
+
+class ResumenInventarioAPITest(APITestCase):
+    """Tests para el endpoint de resumen precalculado"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.empresa = Empresa.objects.create(
+            nit='900123456-1',
+            nombre='Empresa Test',
+            direccion='Calle 123',
+            telefono='3001234567'
+        )
+        for i, cantidad in enumerate([0, 5, 30, 100]):
+            producto = Producto.objects.create(
+                codigo=f'PROD-{i}',
+                nombre=f'Producto {i}',
+                precios={'COP': 100},
+                empresa=self.empresa
+            )
+            Inventario.objects.create(producto=producto, cantidad=cantidad)
+        self.client.force_authenticate(user=self.user)
+    
+    def test_resumen_empresa(self):
+        """Test: El resumen expone buckets, unidades y valor"""
+        url = reverse('inventario-resumen', kwargs={'empresa_nit': self.empresa.nit})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_productos'], 4)
+        self.assertEqual(response.data['total_unidades'], 135)
+        self.assertEqual(response.data['productos_sin_stock'], 1)
+        self.assertEqual(response.data['productos_stock_bajo'], 1)
+        self.assertEqual(response.data['productos_stock_saludable'], 2)
+        self.assertEqual(response.data['valor_total'], 13500.0)
+        self.assertEqual(response.data['pct_sin_stock'], 25.0)
+    
+    def test_resumen_empresa_no_existe(self):
+        """Test: Resumen de empresa que no existe"""
+        url = reverse('inventario-resumen', kwargs={'empresa_nit': 'NO-EXISTE'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_analisis_solo_metricas(self):
+        """Test: El análisis puede responder solo con las métricas agregadas"""
+        url = reverse('inventario-analisis', kwargs={'empresa_nit': self.empresa.nit})
+        response = self.client.get(url, {'solo_metricas': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['metricas']['total_productos'], 4)
+        self.assertNotIn('analisis', response.data)
+    
+    def test_analisis_incremental(self):
+        """Test: El modo incremental da el mismo análisis que el completo"""
+        url = reverse('inventario-analisis', kwargs={'empresa_nit': self.empresa.nit})
+        Inventario.objects.filter(cantidad=30).get().delete()
+        inventario = Inventario.objects.get(cantidad=5)
+        self.client.get(url, {'incremental': 'true'})
+        inventario.cantidad = 0
+        inventario.save()
+        
+        incremental = self.client.get(url, {'incremental': 'true'}).data['analisis']
+        completo = self.client.get(url).data['analisis']
+        self.assertEqual(incremental['metricas'], completo['metricas'])
+        self.assertEqual(incremental['detalles'], completo['detalles'])
+        self.assertEqual(len(incremental['detalles']['sin_stock']), 2)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS DE VISTAS ASYNC
+# ═══════════════════════════════════════════════════════════════
+
+class VistasAsyncAPITest(APITestCase):
+    """Tests para las variantes async de PDF, análisis y correo"""
+    
+    def setUp(self):
+        import tempfile
+        from rest_framework_simplejwt.tokens import RefreshToken
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.empresa = Empresa.objects.create(
+            nit='900123456-1',
+            nombre='Empresa Test',
+            direccion='Calle 123',
+            telefono='3001234567'
+        )
+        self.producto = Producto.objects.create(
+            codigo='PROD-001',
+            nombre='Producto Test',
+            caracteristicas='Características',
+            precios={'COP': 10000},
+            empresa=self.empresa
+        )
+        Inventario.objects.create(producto=self.producto, cantidad=100)
+        
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = self.settings(PDF_CACHE_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        token = RefreshToken.for_user(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+    
+    def test_requiere_jwt(self):
+        """Test: Sin token (o con uno inválido) responde 401"""
+        url = reverse('inventario-pdf-async', kwargs={'empresa_nit': self.empresa.nit})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer no-es-un-token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_pdf_async_igual_al_sincrono(self):
+        """Test: El PDF async tiene la misma llave (ETag) que el síncrono"""
+        url = reverse('inventario-pdf-async', kwargs={'empresa_nit': self.empresa.nit})
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        
+        self.client.force_authenticate(user=self.user)
+        sincrono = self.client.get(
+            reverse('inventario-pdf', kwargs={'empresa_nit': self.empresa.nit})
+        )
+        self.assertEqual(response['ETag'], sincrono['ETag'])
+        
+        no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(no_modificado.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_pdf_async_por_bloques(self):
+        """Test: Inventarios grandes se generan por bloques también en async"""
+        url = reverse('inventario-pdf-async', kwargs={'empresa_nit': self.empresa.nit})
+        with self.settings(PDF_UMBRAL_POR_BLOQUES=0):
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+    
+    def test_pdf_async_empresa_no_existe(self):
+        """Test: PDF async de empresa que no existe"""
+        url = reverse('inventario-pdf-async', kwargs={'empresa_nit': 'NO-EXISTE'})
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_analisis_async(self):
+        """Test: Análisis completo y solo métricas"""
+        url = reverse('inventario-analisis-async', kwargs={'empresa_nit': self.empresa.nit})
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['success'])
+        self.assertIn('analisis', response.json())
+        
+        response = self.client.get(url, {'solo_metricas': '1'}, **self.auth)
+        self.assertEqual(response.json()['metricas']['total_unidades'], 100)
+    
+    @patch('api.envio_service.aenviar_correo_resend')
+    def test_enviar_correo_async_entrega_en_la_peticion(self, mock_enviar):
+        """Test: El correo se entrega en la misma petición"""
+        mock_enviar.return_value = {'id': 'test-id-123'}
+        url = reverse('inventario-enviar-correo-async')
+        data = {
+            'empresa_nit': self.empresa.nit,
+            'email_destino': 'destino@example.com',
+            'incluir_analisis_ia': False,
+        }
+        response = self.client.post(
+            url, json.dumps(data), content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['estado'], 'enviado')
+        mock_enviar.assert_called_once()
+        
+        historial = HistorialEnvio.objects.get(pk=response.json()['historial_id'])
+        self.assertEqual(historial.estado, 'enviado')
+        self.assertEqual(historial.total_unidades, 100)
+        self.assertTrue(historial.documento_hash)
+        self.assertEqual(historial.trabajos.get().estado, 'completado')
+    
+    @patch('api.envio_service.aenviar_correo_resend')
+    def test_enviar_correo_async_fallido_queda_en_cola(self, mock_enviar):
+        """Test: Si la entrega falla, el worker la reintenta"""
+        from litethinking_domain.models import TrabajoEnvio
+        
+        mock_enviar.side_effect = RuntimeError('Resend caído')
+        url = reverse('inventario-enviar-correo-async')
+        data = {'empresa_nit': self.empresa.nit, 'email_destino': 'destino@example.com'}
+        response = self.client.post(
+            url, json.dumps(data), content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        
+        trabajo = TrabajoEnvio.objects.get(pk=response.json()['trabajo_id'])
+        self.assertEqual(trabajo.estado, 'pendiente')
+        self.assertEqual(trabajo.intentos, 1)
+        self.assertIn('Resend caído', trabajo.mensaje_error)
+    
+    def test_enviar_correo_async_validaciones(self):
+        """Test: Faltan datos o la empresa no existe"""
+        url = reverse('inventario-enviar-correo-async')
+        response = self.client.post(
+            url, json.dumps({'email_destino': 'a@b.com'}), content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            url,
+            json.dumps({'empresa_nit': 'NO-EXISTE', 'email_destino': 'a@b.com'}),
+            content_type='application/json',
+            **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for cuerpo in ('[]', '"texto"', '3'):
+            response = self.client.post(url, cuerpo, content_type='application/json', **self.auth)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 405)
@@ -8,9 +8,12 @@ from .views import (
 	ProductoViewSet,
 	GenerarPDFView,
 	EnviarCorreoInventarioView,
+	EnviarCorreoLoteView,
 	HistorialEnviosViewSet,
 	AnalisisInventarioView,
+	ResumenInventarioView,
 )
+from . import views_async
 
 router = DefaultRouter()
 router.register('empresas', EmpresaViewSet, basename='empresa')
@@ -23,7 +26,13 @@ urlpatterns = [
 	# Endpoints para PDF y correo
 	path('inventarios/pdf/<str:empresa_nit>/', GenerarPDFView.as_view(), name='inventario-pdf'),
 	path('inventarios/enviar-correo/', EnviarCorreoInventarioView.as_view(), name='inventario-enviar-correo'),
+	path('inventarios/enviar-correo/lote/', EnviarCorreoLoteView.as_view(), name='inventario-enviar-correo-lote'),
 	path('inventarios/analisis/<str:empresa_nit>/', AnalisisInventarioView.as_view(), name='inventario-analisis'),
+	path('inventarios/resumen/<str:empresa_nit>/', ResumenInventarioView.as_view(), name='inventario-resumen'),
+	# Variantes async (servidas con config.asgi)
+	path('async/inventarios/pdf/<str:empresa_nit>/', views_async.generar_pdf, name='inventario-pdf-async'),
+	path('async/inventarios/enviar-correo/', views_async.enviar_correo_inventario, name='inventario-enviar-correo-async'),
+	path('async/inventarios/analisis/<str:empresa_nit>/', views_async.analisis_inventario, name='inventario-analisis-async'),
 ]
 
 urlpatterns += router.urls
@@ -0,0 +1,117 @@
+"""
+Verificación pública de documentos enviados.
+
+Responde "¿se emitió este PDF, cuándo y a quién?" a partir del hash del
+documento (o de su prefijo de 16 caracteres, el de ``verificacion_url``).
+La búsqueda es una sola consulta sobre columnas indexadas:
+
+- prefijo (16 a 63 caracteres): ``documento_prefijo`` y, si el prefijo es
+  más largo, se descartan en memoria los que no coinciden;
+- hash completo (64 caracteres): ``documento_hash`` o ``contenido_hash``.
+
+Los resultados positivos se guardan en la caché de Django durante
+``VERIFICACION_CACHE_TTL`` segundos: un documento enviado no cambia, así
+que el camino caliente no toca la base de datos. Los negativos no se
+guardan, para que un envío recién completado se vea de inmediato.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from litethinking_domain.models import HistorialEnvio
+from litethinking_domain.models.historial_envio import LARGO_PREFIJO
+
+LARGO_HASH = 64
+# Envíos que se listan por documento
+MAX_ENVIOS_VERIFICACION = 20
+
+_HEXADECIMAL = re.compile(r'[0-9a-f]+')
+
+
+class HashInvalido(ValueError):
+    """El hash no es hexadecimal o no tiene entre 16 y 64 caracteres."""
+
+
+def normalizar_hash(valor):
+    """
+    Hash o prefijo en minúsculas.
+
+    Raises:
+        HashInvalido: si no es un prefijo válido de un SHA-256
+    """
+    valor = (valor or '').strip().lower()
+    if not LARGO_PREFIJO <= len(valor) <= LARGO_HASH or not _HEXADECIMAL.fullmatch(valor):
+        raise HashInvalido(
+            f'El hash debe tener entre {LARGO_PREFIJO} y {LARGO_HASH} caracteres hexadecimales'
+        )
+    return valor
+
+
+def enmascarar_email(email):
+    """``juan.perez@dominio.com`` → ``j***@dominio.com``."""
+    usuario, _, dominio = email.partition('@')
+    if not dominio:
+        return '***'
+    return f'{usuario[:1]}***@{dominio}'
+
+
+def _clave_cache(valor):
+    return f'verificacion:{valor}'
+
+
+def _consultar(valor):
+    envios = HistorialEnvio.objects.filter(estado='enviado')
+    if len(valor) == LARGO_HASH:
+        envios = envios.filter(Q(documento_hash=valor) | Q(contenido_hash=valor))
+    else:
+        envios = envios.filter(documento_prefijo=valor[:LARGO_PREFIJO])
+    filas = envios.order_by('fecha_envio', 'id').values(
+        'documento_hash',
+        'contenido_hash',
+        'arbol_merkle_id',
+        'email_destino',
+        'fecha_envio',
+        'empresa__nit',
+        'empresa__nombre',
+    )[:MAX_ENVIOS_VERIFICACION]
+    return [
+        fila for fila in filas
+        if len(valor) == LARGO_HASH or fila['documento_hash'].startswith(valor)
+    ]
+
+
+def verificar_documento(valor):
+    """
+    Envíos (estado ``enviado``) del documento con ese hash o prefijo.
+
+    Returns:
+        dict con ``valido`` y la lista ``envios`` (empresa, fecha de envío,
+        destinatario enmascarado y hashes), de la más antigua a la más reciente
+
+    Raises:
+        HashInvalido: si ``valor`` no es un hash o prefijo válido
+    """
+    valor = normalizar_hash(valor)
+    clave = _clave_cache(valor)
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    envios = [
+        {
+            'empresa_nit': fila['empresa__nit'],
+            'empresa_nombre': fila['empresa__nombre'],
+            'destinatario': enmascarar_email(fila['email_destino']),
+            'fecha_envio': fila['fecha_envio'].isoformat() if fila['fecha_envio'] else None,
+            'documento_hash': fila['documento_hash'],
+            'contenido_hash': fila['contenido_hash'],
+            'merkle_raiz': fila['arbol_merkle_id'] or '',
+        }
+        for fila in _consultar(valor)
+    ]
+    resultado = {'hash': valor, 'valido': bool(envios), 'envios': envios}
+    if envios:
+        cache.set(clave, resultado, getattr(settings, 'VERIFICACION_CACHE_TTL', 300))
+    return resultado
@@ -1,32 +1,68 @@
 import base64
-import json
-from datetime import datetime
 
-from django.http import HttpResponse
-from django.utils import timezone
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import filters, permissions, viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from litethinking_domain.models import Empresa, Inventario, Producto, HistorialEnvio
+from litethinking_domain.merkle import hash_hoja, verificar_prueba
+from litethinking_domain.models import (
+	ArbolMerkleInventario,
+	Empresa,
+	Inventario,
+	Producto,
+	HistorialEnvio,
+	ResumenInventario,
+)
+from .analisis_incremental import analizar_inventario_incremental
+from .analitica import MetricasInventario
+from .filters import BusquedaProductoFilter
+from .pagination import InventarioKeysetPagination, ProductoKeysetPagination
 from .serializers import (
+	campos_solicitados,
 	EmpresaSerializer,
 	InventarioSerializer,
 	ProductoSerializer,
 	HistorialEnvioSerializer,
+	ResumenInventarioSerializer,
+	EnvioLoteSerializer,
+	AjusteInventarioLoteSerializer,
+)
+from .ajuste_service import aplicar_ajustes
+from .envio_service import encolar_envio, encolar_envio_lote
+from .exportacion_service import (
+	COLUMNAS_HISTORIAL,
+	COLUMNAS_INVENTARIO,
+	FORMATOS_EXPORTACION,
+	FORMATOS_TEXTO,
+	TIPOS_CONTENIDO,
+	FormatoNoDisponible,
+	aiterar_partes,
+	escribir_columnar,
+	generar_csv,
+	generar_ndjson,
+	iterar_filas,
 )
-from .email_service import (
-	generar_pdf_inventario,
-	generar_html_correo,
-	generar_html_correo_avanzado,
-	enviar_correo_resend,
-	enviar_correo_django,
-	generar_hash_documento,
-	generar_hash_inventario,
+from .importacion_service import FORMATOS, formato_por_nombre, importar_catalogo
+from .ia_service import analizar_inventario
+from .inventario_service import (
+	cargar_snapshot_inventario,
+	empresa_a_dict,
+	iterar_filas_reporte,
 )
-from .ia_service import analizar_inventario, generar_resumen_para_correo
+from .pdf_cache import (
+	abrir_pdf_por_bloques,
+	clave_pdf_inventario,
+	empresa_por_bloques,
+	firmar_filas,
+	obtener_pdf_inventario,
+)
+from .pdf_pool import PoolPDFSaturado, TiempoPDFAgotado
+from .verificacion_service import HashInvalido, verificar_documento
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -38,6 +74,63 @@ class IsAdminOrReadOnly(permissions.BasePermission):
 		return bool(request.user and request.user.is_staff)
 
 
+class ProyeccionCamposMixin:
+	"""
+	Cuando el cliente pide ``?fields=``, limita la consulta a las columnas y
+	relaciones que usan esos campos (``only`` + ``select_related``).
+	"""
+
+	def get_queryset(self):
+		queryset = super().get_queryset()
+		if campos_solicitados(self.request) is None:
+			return queryset
+
+		columnas = set()
+		relaciones = set()
+		for campo in self.get_serializer().fields.values():
+			if campo.source == '*':
+				continue
+			partes = campo.source_attrs
+			columnas.add('__'.join(partes))
+			for i in range(1, len(partes)):
+				relaciones.add('__'.join(partes[:i]))
+
+		# El cursor necesita los campos de orden de la última fila
+		if self.paginator is not None:
+			columnas.update(campo.lstrip('-') for campo in getattr(self.paginator, 'ordering', ()))
+
+		return queryset.select_related(None).select_related(*relaciones).only(*columnas)
+
+
+def respuesta_exportacion(request, columnas, queryset, nombre):
+	"""
+	Exporta ``queryset`` en el formato de ``?formato=`` (csv por defecto):
+	CSV y NDJSON por partes (async bajo ASGI), Parquet y Arrow desde un
+	archivo temporal.
+	"""
+	formato = request.query_params.get('formato', 'csv')
+	if formato not in FORMATOS_EXPORTACION:
+		return Response(
+			{'error': f"Formato no soportado. Usa {', '.join(FORMATOS_EXPORTACION)}"},
+			status=status.HTTP_400_BAD_REQUEST
+		)
+	filas = iterar_filas(columnas, queryset)
+	if formato in FORMATOS_TEXTO:
+		generar = generar_csv if formato == 'csv' else generar_ndjson
+		partes = generar(columnas, filas)
+		if isinstance(request._request, ASGIRequest):
+			partes = aiterar_partes(partes)
+		response = StreamingHttpResponse(partes, content_type=TIPOS_CONTENIDO[formato])
+	else:
+		try:
+			archivo = escribir_columnar(columnas, filas, formato)
+		except FormatoNoDisponible as e:
+			return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+		response = FileResponse(archivo, content_type=TIPOS_CONTENIDO[formato])
+	response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+	return response
+
+
 class EmpresaViewSet(viewsets.ModelViewSet):
 	queryset = Empresa.objects.all().order_by('nombre')
 	serializer_class = EmpresaSerializer
@@ -48,12 +141,15 @@ class EmpresaViewSet(viewsets.ModelViewSet):
 	ordering = ['nombre']
 
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(ProyeccionCamposMixin, viewsets.ModelViewSet):
 	queryset = Producto.objects.select_related('empresa').all()
 	serializer_class = ProductoSerializer
 	permission_classes = [IsAdminOrReadOnly]
-	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+	pagination_class = ProductoKeysetPagination
+	# Índice de texto completo; search_fields queda para motores sin él
+	filter_backends = [filters.OrderingFilter, BusquedaProductoFilter]
 	search_fields = ['codigo', 'nombre', 'caracteristicas', 'empresa__nombre']
+	busqueda_producto = 'pk'
 	ordering_fields = ['nombre', 'codigo', 'empresa__nombre']
 	ordering = ['nombre']
 
@@ -79,20 +175,43 @@ class ProductoViewSet(viewsets.ModelViewSet):
 		headers = self.get_success_headers(serializer.data)
 		return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+	@action(detail=False, methods=['post'])
+	def importar(self, request):
+		"""
+		Importa productos y stock inicial desde ``archivo`` (CSV o NDJSON,
+		multipart). El formato se toma de ``formato`` o de la extensión.
+		"""
+		archivo = request.FILES.get('archivo')
+		if archivo is None:
+			return Response(
+				{'error': 'Se requiere el archivo'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		formato = request.data.get('formato') or formato_por_nombre(archivo.name)
+		if formato not in FORMATOS:
+			return Response(
+				{'error': f"Formato no soportado. Usa {' o '.join(FORMATOS)}"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		resultado = importar_catalogo(archivo, formato)
+		return Response(resultado.como_dict())
 
-class InventarioViewSet(viewsets.ModelViewSet):
+
+class InventarioViewSet(ProyeccionCamposMixin, viewsets.ModelViewSet):
 	queryset = (
 		Inventario.objects.select_related('producto', 'producto__empresa')
 		.all()
 	)
 	serializer_class = InventarioSerializer
 	permission_classes = [permissions.IsAuthenticated, IsAdminOrReadOnly]
-	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+	pagination_class = InventarioKeysetPagination
+	filter_backends = [filters.OrderingFilter, BusquedaProductoFilter]
 	search_fields = [
 		'producto__codigo',
 		'producto__nombre',
 		'producto__empresa__nombre',
 	]
+	busqueda_producto = 'producto'
 	ordering_fields = ['fecha_actualizacion', 'producto__nombre']
 	ordering = ['-fecha_actualizacion']
 
@@ -106,6 +225,26 @@ class InventarioViewSet(viewsets.ModelViewSet):
 			queryset = queryset.filter(producto__codigo=producto_codigo)
 		return queryset
 
+	@action(detail=False, methods=['post'])
+	def ajustes(self, request):
+		"""
+		Ajuste masivo de existencias en una transacción: ``ajustes`` es una
+		lista de ``{id | producto_codigo, cantidad | delta}``. Responde con
+		un resultado por ajuste.
+		"""
+		serializer = AjusteInventarioLoteSerializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		datos = serializer.validated_data
+		return Response(aplicar_ajustes(datos['ajustes'], empresa_nit=datos.get('empresa')))
+
+	@action(detail=False, methods=['get'])
+	def exportar(self, request):
+		"""
+		Exporta el inventario (con producto y empresa) en CSV, NDJSON, Parquet
+		o Arrow, con los mismos filtros, búsqueda y orden que el listado.
+		"""
+		return respuesta_exportacion(request, COLUMNAS_INVENTARIO, self.filter_queryset(self.get_queryset()), 'inventario')
+
 
 class GenerarPDFView(APIView):
 	permission_classes = [IsAuthenticated]
@@ -113,45 +252,75 @@ class GenerarPDFView(APIView):
 	def get(self, request, empresa_nit):
 		try:
 			empresa = Empresa.objects.get(nit=empresa_nit)
-			empresa_data = {
-				'nit': empresa.nit,
-				'nombre': empresa.nombre,
-				'direccion': empresa.direccion,
-				'telefono': empresa.telefono,
-			}
+			filename = f"Inventario_{empresa.nombre.replace(' ', '_')}_{empresa_nit}.pdf"
 			
-			inventarios = Inventario.objects.filter(
-				producto__empresa__nit=empresa_nit
-			).select_related('producto')
+			if empresa_por_bloques(empresa_nit):
+				return self._pdf_por_bloques(request, empresa, filename)
 			
-			inventarios_data = []
-			for inv in inventarios:
-				inventarios_data.append({
-					'id': inv.id,
-					'producto_codigo': inv.producto.codigo,
-					'producto_nombre': inv.producto.nombre,
-					'cantidad': inv.cantidad,
-					'fecha_actualizacion': inv.fecha_actualizacion.isoformat() if inv.fecha_actualizacion else None,
-				})
+			empresa_data = empresa_a_dict(empresa)
+			inventarios_data = cargar_snapshot_inventario(empresa_nit, empresa_data)
 			
-			pdf_content = generar_pdf_inventario(empresa_data, inventarios_data)
+			# La llave de la caché identifica el contenido del PDF: sirve de ETag
+			clave = clave_pdf_inventario(empresa_data, inventarios_data)
+			if self._no_modificado(request, clave):
+				return self._respuesta_no_modificado(clave)
 			
+			pdf_content = obtener_pdf_inventario(empresa_data, inventarios_data, clave=clave)
 			response = HttpResponse(pdf_content, content_type='application/pdf')
-			filename = f"Inventario_{empresa.nombre.replace(' ', '_')}_{empresa_nit}.pdf"
-			response['Content-Disposition'] = f'attachment; filename="{filename}"'
-			return response
+			return self._con_cabeceras(response, clave, filename)
 			
 		except Empresa.DoesNotExist:
 			return Response(
 				{'error': 'Empresa no encontrada'},
 				status=status.HTTP_404_NOT_FOUND
 			)
+		except (PoolPDFSaturado, TiempoPDFAgotado) as e:
+			return Response(
+				{'error': str(e)},
+				status=status.HTTP_503_SERVICE_UNAVAILABLE,
+				headers={'Retry-After': '5'}
+			)
 		except Exception as e:
 			return Response(
 				{'error': str(e)},
 				status=status.HTTP_500_INTERNAL_SERVER_ERROR
 			)
 
+	def _pdf_por_bloques(self, request, empresa, filename):
+		"""
+		Inventarios grandes: se recorren las filas una vez para la llave y
+		los totales, y otra para generar el PDF por bloques. La respuesta
+		se envía por partes desde un archivo temporal.
+		"""
+		empresa_data = empresa_a_dict(empresa)
+		clave, stats = firmar_filas(
+			empresa_data, iterar_filas_reporte(empresa.nit), por_bloques=True
+		)
+		if self._no_modificado(request, clave):
+			return self._respuesta_no_modificado(clave)
+		
+		archivo = abrir_pdf_por_bloques(empresa_data, empresa.nit, stats, clave)
+		response = FileResponse(archivo, content_type='application/pdf')
+		return self._con_cabeceras(response, clave, filename)
+
+	@staticmethod
+	def _no_modificado(request, clave):
+		return quote_etag(clave) in parse_etags(request.headers.get('If-None-Match', ''))
+
+	@staticmethod
+	def _respuesta_no_modificado(clave):
+		response = HttpResponseNotModified()
+		response['ETag'] = quote_etag(clave)
+		response['Cache-Control'] = 'private, no-cache'
+		return response
+
+	@staticmethod
+	def _con_cabeceras(response, clave, filename):
+		response['Content-Disposition'] = f'attachment; filename="{filename}"'
+		response['ETag'] = quote_etag(clave)
+		response['Cache-Control'] = 'private, no-cache'
+		return response
+
 
 class EnviarCorreoInventarioView(APIView):
 	permission_classes = [IsAuthenticated]
@@ -177,165 +346,26 @@ class EnviarCorreoInventarioView(APIView):
 				)
 			
 			empresa = Empresa.objects.get(nit=empresa_nit)
-			empresa_data = {
-				'nit': empresa.nit,
-				'nombre': empresa.nombre,
-				'direccion': empresa.direccion,
-				'telefono': empresa.telefono,
-			}
-			
-			inventarios = Inventario.objects.filter(
-				producto__empresa__nit=empresa_nit
-			).select_related('producto')
+			adjunto_pdf = base64.b64decode(pdf_base64) if pdf_base64 else None
 			
-			inventarios_data = []
-			valor_total = 0
-			for inv in inventarios:
-				precio = 0
-				if inv.producto.precios:
-					try:
-						precios = inv.producto.precios if isinstance(inv.producto.precios, dict) else json.loads(inv.producto.precios)
-						precio = precios.get('COP', precios.get('USD', 0))
-					except:
-						pass
-				
-				valor_total += inv.cantidad * precio
-				inventarios_data.append({
-					'id': inv.id,
-					'producto_codigo': inv.producto.codigo,
-					'producto_nombre': inv.producto.nombre,
-					'producto_precio': precio,
-					'cantidad': inv.cantidad,
-					'fecha_actualizacion': inv.fecha_actualizacion.isoformat() if inv.fecha_actualizacion else None,
-				})
-			
-			if pdf_base64:
-				pdf_content = base64.b64decode(pdf_base64)
-			else:
-				pdf_content = generar_pdf_inventario(empresa_data, inventarios_data)
-			
-			total_productos = len(inventarios_data)
-			total_unidades = sum(inv['cantidad'] for inv in inventarios_data)
-			
-			alertas = []
-			resumen_ia = ""
-			if incluir_analisis_ia:
-				try:
-					resumen_ia, alertas = generar_resumen_para_correo(empresa_data, inventarios_data)
-				except Exception as ia_error:
-					print(f"Error en análisis IA: {ia_error}")
-			
-			hash_documento = None
-			hash_contenido = None
-			if incluir_blockchain:
-				hash_documento = generar_hash_documento(pdf_content)
-				hash_contenido = generar_hash_inventario(inventarios_data)
-			
-			if incluir_analisis_ia or incluir_blockchain:
-				html_correo = generar_html_correo_avanzado(
-					empresa_data,
-					total_productos,
-					total_unidades,
-					alertas=alertas if incluir_analisis_ia else None,
-					hash_documento=hash_documento if incluir_blockchain else None
-				)
-			else:
-				html_correo = generar_html_correo(empresa_data, total_productos, total_unidades)
-			
-			asunto = f"📦 Reporte de Inventario - {empresa.nombre}"
-			if alertas:
-				criticas = len([a for a in alertas if a.get('prioridad') == 'critica'])
-				if criticas > 0:
-					asunto = f"⚠️ Reporte de Inventario (Alertas) - {empresa.nombre}"
-			
-			nombre_archivo = f"Inventario_{empresa.nombre.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
-			
-			historial = HistorialEnvio.objects.create(
-				empresa=empresa,
-				usuario=request.user,
-				email_destino=email_destino,
-				asunto=asunto,
-				estado='pendiente',
-				documento_hash=hash_documento or '',
-				contenido_hash=hash_contenido or '',
-				total_productos=total_productos,
-				total_unidades=total_unidades,
-				valor_inventario=valor_total,
-				resumen_ia=resumen_ia,
-				alertas_ia=alertas,
+			# El PDF, el análisis IA y la entrega los hace el worker
+			# (manage.py procesar_envios); aquí solo se encola
+			historial, trabajo = encolar_envio(
+				empresa,
+				request.user,
+				email_destino,
+				incluir_analisis_ia=incluir_analisis_ia,
+				incluir_blockchain=incluir_blockchain,
+				adjunto_pdf=adjunto_pdf,
 			)
 			
-			try:
-				resultado = enviar_correo_resend(
-					destinatario=email_destino,
-					asunto=asunto,
-					cuerpo_html=html_correo,
-					adjunto_pdf=pdf_content,
-					nombre_archivo=nombre_archivo
-				)
-				
-				historial.estado = 'enviado'
-				historial.proveedor = 'resend'
-				historial.respuesta_api = resultado
-				historial.fecha_envio = timezone.now()
-				historial.save()
-				
-				return Response({
-					'success': True,
-					'message': f'Correo enviado exitosamente a {email_destino}',
-					'provider': 'resend',
-					'historial_id': historial.id,
-					'hash_documento': hash_documento,
-					'alertas_count': len(alertas),
-					'details': resultado
-				})
-				
-			except ValueError as ve:
-				# Si no hay API key de Resend, intentar con Django Email
-				try:
-					enviados = enviar_correo_django(
-						destinatario=email_destino,
-						asunto=asunto,
-						cuerpo=html_correo,
-						adjunto_pdf=pdf_content,
-						nombre_archivo=nombre_archivo
-					)
-					
-					if enviados > 0:
-						historial.estado = 'enviado'
-						historial.proveedor = 'django_smtp'
-						historial.fecha_envio = timezone.now()
-						historial.save()
-						
-						return Response({
-							'success': True,
-							'message': f'Correo enviado exitosamente a {email_destino}',
-							'provider': 'django_smtp',
-							'historial_id': historial.id,
-							'hash_documento': hash_documento,
-							'alertas_count': len(alertas)
-						})
-					else:
-						historial.estado = 'fallido'
-						historial.mensaje_error = 'No se pudo enviar el correo (0 enviados)'
-						historial.save()
-						
-						return Response({
-							'success': False,
-							'error': 'No se pudo enviar el correo',
-							'suggestion': 'Configura RESEND_API_KEY o las credenciales SMTP de Django'
-						}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-						
-				except Exception as smtp_error:
-					historial.estado = 'fallido'
-					historial.mensaje_error = str(smtp_error)
-					historial.save()
-					
-					return Response({
-						'success': False,
-						'error': f'Error enviando correo: {str(smtp_error)}',
-						'suggestion': 'Configura RESEND_API_KEY en las variables de entorno o settings.py'
-					}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+			return Response({
+				'success': True,
+				'message': f'Envío a {email_destino} en cola de procesamiento',
+				'historial_id': historial.id,
+				'trabajo_id': trabajo.id,
+				'estado': historial.estado,
+			}, status=status.HTTP_202_ACCEPTED)
 			
 		except Empresa.DoesNotExist:
 			return Response(
@@ -349,6 +379,38 @@ class EnviarCorreoInventarioView(APIView):
 			)
 
 
+class EnviarCorreoLoteView(APIView):
+	"""
+	Envío masivo del reporte: ``empresas`` × ``destinatarios``.
+	Encola un trabajo por empresa; el worker genera cada reporte una vez
+	y lo entrega por la API de Resend: en lotes de hasta 100 correos con
+	``adjuntar_pdf=false``, o uno por petición con el PDF adjunto.
+	"""
+	permission_classes = [IsAuthenticated]
+
+	def post(self, request):
+		serializer = EnvioLoteSerializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		datos = serializer.validated_data
+
+		trabajos = encolar_envio_lote(
+			datos['empresas'],
+			request.user,
+			datos['destinatarios'],
+			incluir_analisis_ia=datos['incluir_analisis_ia'],
+			incluir_blockchain=datos['incluir_blockchain'],
+			adjuntar_pdf=datos['adjuntar_pdf'],
+		)
+		total_envios = len(datos['empresas']) * len(datos['destinatarios'])
+
+		return Response({
+			'success': True,
+			'message': f'{total_envios} envíos en cola de procesamiento',
+			'trabajos': [trabajo.id for trabajo in trabajos],
+			'total_envios': total_envios,
+		}, status=status.HTTP_202_ACCEPTED)
+
+
 class HistorialEnviosViewSet(viewsets.ReadOnlyModelViewSet):
 	queryset = HistorialEnvio.objects.select_related('empresa', 'usuario').all()
 	serializer_class = HistorialEnvioSerializer
@@ -364,6 +426,94 @@ class HistorialEnviosViewSet(viewsets.ReadOnlyModelViewSet):
 		if empresa_nit:
 			queryset = queryset.filter(empresa__nit=empresa_nit)
 		return queryset
+	
+	@action(detail=False, methods=['get'])
+	def exportar(self, request):
+		"""
+		Exporta el historial de envíos en CSV, NDJSON, Parquet o Arrow, con
+		los mismos filtros, búsqueda y orden que el listado.
+		"""
+		return respuesta_exportacion(request, COLUMNAS_HISTORIAL, self.filter_queryset(self.get_queryset()), 'historial_envios')
+	
+	@action(detail=True, methods=['get'])
+	def prueba(self, request, pk=None):
+		"""
+		Prueba de inclusión de un producto en el inventario certificado:
+		``?codigo=...``. Con ``nombre`` y ``cantidad`` también verifica la
+		línea contra la raíz del envío.
+		"""
+		historial = self.get_object()
+		codigo = request.query_params.get('codigo')
+		if not codigo:
+			return Response(
+				{'error': 'Se requiere el parámetro codigo'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		if historial.arbol_merkle_id is None:
+			return Response(
+				{'error': 'El envío no tiene certificación por producto'},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		
+		# Las hojas solo se leen si el árbol no está ya armado en la caché
+		arbol = ArbolMerkleInventario.objects.defer('hojas').get(pk=historial.arbol_merkle_id)
+		pruebas = arbol.pruebas_producto(codigo)
+		if not pruebas:
+			return Response(
+				{'error': 'El producto no está en el inventario certificado'},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		
+		respuesta = {
+			'raiz': historial.merkle_raiz,
+			'codigo': codigo,
+			'pruebas': pruebas,
+		}
+		nombre = request.query_params.get('nombre')
+		cantidad = request.query_params.get('cantidad')
+		if nombre is not None and cantidad is not None:
+			try:
+				hoja = hash_hoja(codigo, nombre, int(cantidad)).hex()
+			except ValueError:
+				return Response(
+					{'error': 'cantidad debe ser un entero'},
+					status=status.HTTP_400_BAD_REQUEST
+				)
+			respuesta['valida'] = any(
+				p['hoja'] == hoja and verificar_prueba(hoja, p['prueba'], historial.merkle_raiz)
+				for p in pruebas
+			)
+		return Response(respuesta)
+
+
+class VerificarDocumentoView(APIView):
+	"""
+	Verificación pública de un documento enviado por su hash o por el
+	prefijo de ``verificacion_url``: si se emitió, cuándo y a quién.
+	"""
+	permission_classes = [permissions.AllowAny]
+
+	def get(self, request, hash_documento):
+		try:
+			resultado = verificar_documento(hash_documento)
+		except HashInvalido as error:
+			return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+		if not resultado['valido']:
+			return Response(resultado, status=status.HTTP_404_NOT_FOUND)
+		return Response(resultado)
+
+
+class ResumenInventarioView(APIView):
+	permission_classes = [IsAuthenticated]
+
+	def get(self, request, empresa_nit):
+		if not Empresa.objects.filter(nit=empresa_nit).exists():
+			return Response(
+				{'error': 'Empresa no encontrada'},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		resumen = ResumenInventario.obtener(empresa_nit)
+		return Response(ResumenInventarioSerializer(resumen).data)
 
 
 class AnalisisInventarioView(APIView):
@@ -371,37 +521,34 @@ class AnalisisInventarioView(APIView):
 	
 	def get(self, request, empresa_nit):
 		try:
-			empresa = Empresa.objects.get(nit=empresa_nit)
-			empresa_data = {
-				'nit': empresa.nit,
-				'nombre': empresa.nombre,
-				'direccion': empresa.direccion,
-				'telefono': empresa.telefono,
-			}
+			# Métricas desde el resumen precalculado, sin leer las filas
+			if request.query_params.get('solo_metricas', '').lower() in ('1', 'true'):
+				if not Empresa.objects.filter(nit=empresa_nit).exists():
+					raise Empresa.DoesNotExist
+				resumen = ResumenInventario.obtener(empresa_nit)
+				return Response({
+					'success': True,
+					'metricas': ResumenInventarioSerializer(resumen).data,
+				})
 			
-			inventarios = Inventario.objects.filter(
-				producto__empresa__nit=empresa_nit
-			).select_related('producto')
+			empresa = Empresa.objects.get(nit=empresa_nit)
+			empresa_data = empresa_a_dict(empresa)
 			
-			inventarios_data = []
-			for inv in inventarios:
-				precio = 0
-				if inv.producto.precios:
-					try:
-						precios = inv.producto.precios if isinstance(inv.producto.precios, dict) else json.loads(inv.producto.precios)
-						precio = precios.get('COP', precios.get('USD', 0))
-					except:
-						pass
-				
-				inventarios_data.append({
-					'producto_codigo': inv.producto.codigo,
-					'producto_nombre': inv.producto.nombre,
-					'producto_precio': precio,
-					'cantidad': inv.cantidad,
+			# Refresco del tablero: solo se leen las filas cambiadas desde
+			# el análisis anterior (estado en EstadoAnalisisInventario,
+			# compartido por todos los procesos)
+			if request.query_params.get('incremental', '').lower() in ('1', 'true'):
+				return Response({
+					'success': True,
+					'analisis': analizar_inventario_incremental(empresa_data),
 				})
 			
+			# Conteos y valoración agregados en SQL; solo se leen las filas
+			# que el análisis lista (sin stock y stock bajo)
+			metricas = MetricasInventario.desde_base_de_datos(empresa_nit)
+			
 			# Generar análisis IA
-			analisis = analizar_inventario(empresa_data, inventarios_data)
+			analisis = analizar_inventario(empresa_data, metricas)
 			
 			return Response({
 				'success': True,
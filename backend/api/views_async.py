@@ -0,0 +1,224 @@
+"""
+Variantes async (ASGI) de los endpoints de reporte, análisis y correo.
+
+Usan el ORM async, generan el PDF con ``PoolPDF.ejecutar_async`` y
+entregan el correo con el cliente async de Resend, de modo que un solo
+proceso atiende muchas peticiones que están esperando a la base de datos,
+al pool de PDFs o a la red. Bajo WSGI también funcionan (Django las
+ejecuta en un event loop por petición), pero solo aprovechan la
+concurrencia servidas con ``config.asgi``.
+
+DRF no tiene vistas async: son vistas de Django que autentican con el
+mismo JWT que el resto de la API y responden el mismo JSON.
+"""
+import base64
+import binascii
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from litethinking_domain.models import Empresa, ResumenInventario
+from .analisis_incremental import analizar_inventario_incremental
+from .analitica import MetricasInventario
+from .envio_service import aenviar_ahora, encolar_envio, identificador_trabajador
+from .ia_service import analizar_inventario
+from .inventario_service import (
+	acargar_snapshot_inventario,
+	aiterar_filas_reporte,
+	empresa_a_dict,
+)
+from .pdf_cache import (
+	aabrir_pdf_por_bloques,
+	aempresa_por_bloques,
+	afirmar_filas,
+	aobtener_pdf_inventario,
+	clave_pdf_inventario,
+)
+from .pdf_pool import PoolPDFSaturado, TiempoPDFAgotado
+from .serializers import ResumenInventarioSerializer
+from .views import GenerarPDFView
+
+
+def _respuesta(datos, status_code=status.HTTP_200_OK, headers=None):
+	return JsonResponse(
+		datos,
+		status=status_code,
+		headers=headers,
+		json_dumps_params={'ensure_ascii': False},
+	)
+
+
+def requiere_autenticacion(vista):
+	"""
+	Exige un JWT válido (``Authorization: Bearer ...``) y deja el usuario
+	en ``request.user``. Responde 401 como DRF si falta o no es válido.
+	"""
+	autenticador = JWTAuthentication()
+
+	@wraps(vista)
+	async def envoltura(request, *args, **kwargs):
+		try:
+			resultado = await sync_to_async(autenticador.authenticate)(request)
+		except (InvalidToken, AuthenticationFailed) as error:
+			return _respuesta(error.detail, status.HTTP_401_UNAUTHORIZED)
+		if resultado is None:
+			return _respuesta(
+				{'detail': str(NotAuthenticated.default_detail)},
+				status.HTTP_401_UNAUTHORIZED,
+			)
+		request.user = resultado[0]
+		return await vista(request, *args, **kwargs)
+
+	# El token viaja en una cabecera: no aplica la protección CSRF de cookies
+	return csrf_exempt(envoltura)
+
+
+@require_GET
+@requiere_autenticacion
+async def generar_pdf(request, empresa_nit):
+	"""Versión async de ``GenerarPDFView``."""
+	try:
+		empresa = await Empresa.objects.aget(nit=empresa_nit)
+		filename = f"Inventario_{empresa.nombre.replace(' ', '_')}_{empresa_nit}.pdf"
+		empresa_data = empresa_a_dict(empresa)
+		if await aempresa_por_bloques(empresa_nit):
+			clave, stats = await afirmar_filas(
+				empresa_data, aiterar_filas_reporte(empresa_nit), por_bloques=True
+			)
+			if GenerarPDFView._no_modificado(request, clave):
+				return GenerarPDFView._respuesta_no_modificado(clave)
+			archivo = await aabrir_pdf_por_bloques(empresa_data, empresa_nit, stats, clave)
+			response = FileResponse(archivo, content_type='application/pdf')
+			return GenerarPDFView._con_cabeceras(response, clave, filename)
+
+		inventarios_data = await acargar_snapshot_inventario(empresa_nit, empresa_data)
+		clave = clave_pdf_inventario(empresa_data, inventarios_data)
+		if GenerarPDFView._no_modificado(request, clave):
+			return GenerarPDFView._respuesta_no_modificado(clave)
+
+		pdf_content = await aobtener_pdf_inventario(empresa_data, inventarios_data, clave=clave)
+		response = HttpResponse(pdf_content, content_type='application/pdf')
+		return GenerarPDFView._con_cabeceras(response, clave, filename)
+
+	except Empresa.DoesNotExist:
+		return _respuesta({'error': 'Empresa no encontrada'}, status.HTTP_404_NOT_FOUND)
+	except (PoolPDFSaturado, TiempoPDFAgotado) as e:
+		return _respuesta(
+			{'error': str(e)},
+			status.HTTP_503_SERVICE_UNAVAILABLE,
+			headers={'Retry-After': '5'},
+		)
+	except Exception as e:
+		return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+@requiere_autenticacion
+async def analisis_inventario(request, empresa_nit):
+	"""Versión async de ``AnalisisInventarioView``."""
+	try:
+		if request.GET.get('solo_metricas', '').lower() in ('1', 'true'):
+			if not await Empresa.objects.filter(nit=empresa_nit).aexists():
+				raise Empresa.DoesNotExist
+			resumen = await ResumenInventario.aobtener(empresa_nit)
+			metricas = await sync_to_async(lambda: ResumenInventarioSerializer(resumen).data)()
+			return _respuesta({'success': True, 'metricas': metricas})
+
+		empresa = await Empresa.objects.aget(nit=empresa_nit)
+		empresa_data = empresa_a_dict(empresa)
+		if request.GET.get('incremental', '').lower() in ('1', 'true'):
+			analisis = await sync_to_async(analizar_inventario_incremental)(empresa_data)
+			return _respuesta({'success': True, 'analisis': analisis})
+
+		metricas = await sync_to_async(MetricasInventario.desde_base_de_datos)(empresa_nit)
+
+		# El análisis es CPU (o una llamada a un LLM): fuera del event loop
+		analisis = await sync_to_async(analizar_inventario, thread_sensitive=False)(
+			empresa_data, metricas
+		)
+		return _respuesta({'success': True, 'analisis': analisis})
+
+	except Empresa.DoesNotExist:
+		return _respuesta({'error': 'Empresa no encontrada'}, status.HTTP_404_NOT_FOUND)
+	except Exception as e:
+		return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_POST
+@requiere_autenticacion
+async def enviar_correo_inventario(request):
+	"""
+	Versión async de ``EnviarCorreoInventarioView``: en lugar de dejar el
+	envío al worker, lo entrega en la misma petición. Si la entrega falla
+	el envío queda en la cola y responde 202, como la vista síncrona.
+	"""
+	try:
+		try:
+			datos = json.loads(request.body or b'{}')
+		except ValueError:
+			return _respuesta({'error': 'JSON inválido'}, status.HTTP_400_BAD_REQUEST)
+		if not isinstance(datos, dict):
+			return _respuesta({'error': 'El cuerpo debe ser un objeto JSON'}, status.HTTP_400_BAD_REQUEST)
+
+		empresa_nit = datos.get('empresa_nit')
+		email_destino = datos.get('email_destino')
+		pdf_base64 = datos.get('pdf_base64')
+
+		if not empresa_nit:
+			return _respuesta(
+				{'error': 'Se requiere el NIT de la empresa'},
+				status.HTTP_400_BAD_REQUEST,
+			)
+
+		if not email_destino:
+			return _respuesta(
+				{'error': 'Se requiere el correo de destino'},
+				status.HTTP_400_BAD_REQUEST,
+			)
+
+		try:
+			adjunto_pdf = base64.b64decode(pdf_base64) if pdf_base64 else None
+		except (binascii.Error, TypeError):
+			return _respuesta({'error': 'pdf_base64 inválido'}, status.HTTP_400_BAD_REQUEST)
+
+		empresa = await Empresa.objects.aget(nit=empresa_nit)
+		historial, trabajo = await sync_to_async(encolar_envio)(
+			empresa,
+			request.user,
+			email_destino,
+			incluir_analisis_ia=datos.get('incluir_analisis_ia', True),
+			incluir_blockchain=datos.get('incluir_blockchain', True),
+			adjunto_pdf=adjunto_pdf,
+			reservar_para=identificador_trabajador(),
+		)
+
+		if await aenviar_ahora(historial, trabajo):
+			return _respuesta({
+				'success': True,
+				'message': f'Correo enviado a {email_destino}',
+				'historial_id': historial.id,
+				'trabajo_id': trabajo.id,
+				'estado': historial.estado,
+				'documento_hash': historial.documento_hash,
+			})
+
+		return _respuesta({
+			'success': True,
+			'message': f'No se pudo enviar ahora; envío a {email_destino} en cola de reintento',
+			'historial_id': historial.id,
+			'trabajo_id': trabajo.id,
+			'estado': 'pendiente',
+		}, status.HTTP_202_ACCEPTED)
+
+	except Empresa.DoesNotExist:
+		return _respuesta({'error': 'Empresa no encontrada'}, status.HTTP_404_NOT_FOUND)
+	except Exception as e:
+		return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
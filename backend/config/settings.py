@@ -251,6 +251,7 @@ CORS_ALLOW_HEADERS = [
 #   RESEND_API_KEY = 're_xxxxxxxxxxxxx'
 
 import os
+import tempfile
 
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
 
@@ -258,6 +259,46 @@ RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
 # Si usas dominio verificado en Resend, cambia 'onboarding@resend.dev'
 EMAIL_FROM = os.environ.get('EMAIL_FROM', 'Inventario Lite Thinking <onboarding@resend.dev>')
 
+# Cliente HTTP de Resend (api/resend_client.py): una sesión con pool de
+# conexiones por proceso, timeouts en segundos y reintentos ante 429/5xx
+RESEND_TIMEOUT_CONEXION = float(os.environ.get('RESEND_TIMEOUT_CONEXION', 3.05))
+RESEND_TIMEOUT_LECTURA = float(os.environ.get('RESEND_TIMEOUT_LECTURA', 30))
+RESEND_MAX_REINTENTOS = int(os.environ.get('RESEND_MAX_REINTENTOS', 3))
+RESEND_ESPERA_MAXIMA = float(os.environ.get('RESEND_ESPERA_MAXIMA', 30))
+RESEND_TAMANIO_POOL = int(os.environ.get('RESEND_TAMANIO_POOL', 10))
+
+# Caché de PDFs de inventario (api/pdf_cache.py). PDF_CACHE_MAX_BYTES=0 la desactiva
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'inventario-pdf'))
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Inventarios con más filas se generan por bloques, sin cargarlos completos
+# en memoria, en un archivo temporal
+PDF_UMBRAL_POR_BLOQUES = int(os.environ.get('PDF_UMBRAL_POR_BLOQUES', 5000))
+
+# Pool de procesos para ReportLab (api/pdf_pool.py). Con 0 trabajadores el
+# PDF se genera en el proceso que lo pide. Con la cola llena la API responde 503
+PDF_POOL_TRABAJADORES = int(os.environ.get('PDF_POOL_TRABAJADORES', 0))
+PDF_POOL_MAX_PENDIENTES = int(os.environ.get('PDF_POOL_MAX_PENDIENTES', 0)) or None
+PDF_POOL_TIMEOUT = float(os.environ.get('PDF_POOL_TIMEOUT', 60))
+
+# Filas sin stock y con stock bajo que guarda por empresa el análisis
+# incremental (api/analisis_incremental.py). Con más, no guarda estado
+ANALISIS_INCREMENTAL_MAX_FILAS = int(os.environ.get('ANALISIS_INCREMENTAL_MAX_FILAS', 5000))
+
+# Caché en memoria de resúmenes LLM (api/llm_cache.py). LLM_CACHE_MAX_ENTRADAS=0 la desactiva
+LLM_CACHE_MAX_ENTRADAS = int(os.environ.get('LLM_CACHE_MAX_ENTRADAS', 512))
+LLM_CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', 3600))
+# Proveedores LLM (api/llm_proveedores.py): timeout por llamada, reintentos
+# del SDK y llamadas simultáneas en los resúmenes por lote
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30))
+LLM_MAX_REINTENTOS = int(os.environ.get('LLM_MAX_REINTENTOS', 2))
+LLM_CONCURRENCIA = int(os.environ.get('LLM_CONCURRENCIA', 4))
+# Tokens máximos del contexto del inventario en el prompt (api/llm_prompt.py)
+LLM_PRESUPUESTO_TOKENS = int(os.environ.get('LLM_PRESUPUESTO_TOKENS', 1200))
+
+# Segundos que la verificación pública de documentos (api/verificacion_service.py)
+# guarda en la caché de Django un documento encontrado
+VERIFICACION_CACHE_TTL = int(os.environ.get('VERIFICACION_CACHE_TTL', 300))
+
 # ═══════════════════════════════════════════════════════════════
 # CONFIGURACIÓN ALTERNATIVA - DJANGO SMTP (Gmail, Outlook, etc.)
 # ═══════════════════════════════════════════════════════════════
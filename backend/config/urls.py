@@ -22,9 +22,13 @@ from drf_spectacular.views import (
     SpectacularRedocView,
 )
 
+from api.views import VerificarDocumentoView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Verificación pública de documentos (HistorialEnvio.verificacion_url)
+    path('verificar/<str:hash_documento>', VerificarDocumentoView.as_view(), name='verificar-documento'),
     
     # Swagger / OpenAPI Documentation
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -1,11 +1,13 @@
 """
 Tests unitarios para los modelos de Core.
 """
+from decimal import Decimal
+
 from django.test import TestCase
 from django.db import IntegrityError
 from django.utils import timezone
 
-from .models import Empresa, Producto, Inventario, HistorialEnvio
+from .models import Empresa, Producto, Inventario, HistorialEnvio, ResumenInventario
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -243,3 +245,219 @@ class HistorialEnvioModelTest(TestCase):
         self.assertEqual(historial.total_productos, 10)
         self.assertEqual(historial.total_unidades, 500)
         self.assertEqual(float(historial.valor_inventario), 1000000.50)
+    
+    def test_hash_inventario_compatible(self):
+        """Test: El hash por fragmentos coincide con el JSON completo"""
+        import hashlib
+        import json
+        
+        inventarios = [
+            {'producto_codigo': 'B', 'producto_nombre': 'Ñandú', 'cantidad': 2},
+            {'producto_codigo': 'A', 'producto_nombre': 'Uno', 'cantidad': 0},
+        ]
+        datos = sorted(
+            ({'codigo': i['producto_codigo'], 'nombre': i['producto_nombre'], 'cantidad': i['cantidad']}
+             for i in inventarios),
+            key=lambda x: x['codigo'],
+        )
+        esperado = hashlib.sha256(
+            json.dumps(datos, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        self.assertEqual(HistorialEnvio.generar_hash_inventario(inventarios), esperado)
+
+
+class ArbolMerkleTest(TestCase):
+    """Tests para el árbol de Merkle del inventario"""
+    
+    def _filas(self, n):
+        return [(f'P-{i:03d}', f'Producto {i}', i % 7) for i in range(n)]
+    
+    def test_pruebas_de_inclusion(self):
+        """Test: Toda hoja tiene una prueba válida, para cualquier tamaño"""
+        from litethinking_domain.merkle import ArbolMerkle, hash_hoja, verificar_prueba
+        
+        for n in range(1, 12):
+            arbol, filas = ArbolMerkle.desde_filas(reversed(self._filas(n)))
+            self.assertEqual(filas, self._filas(n))
+            for indice, fila in enumerate(filas):
+                prueba = arbol.prueba(indice)
+                self.assertLessEqual(len(prueba), n.bit_length())
+                self.assertTrue(verificar_prueba(hash_hoja(*fila), prueba, arbol.raiz))
+            # Una línea alterada no verifica
+            codigo, nombre, cantidad = filas[0]
+            self.assertFalse(
+                verificar_prueba(hash_hoja(codigo, nombre, cantidad + 1), arbol.prueba(0), arbol.raiz)
+            )
+    
+    def test_arbol_se_arma_una_vez_por_raiz(self):
+        """Test: Las pruebas de varios productos reutilizan el árbol armado"""
+        from unittest.mock import patch
+        from litethinking_domain import merkle
+        from litethinking_domain.merkle import ArbolMerkle
+        from litethinking_domain.models import ArbolMerkleInventario
+        
+        ArbolMerkleInventario.desde_filas(self._filas(9)).guardar()
+        with patch.dict(merkle._arboles, clear=True), \
+                patch.object(ArbolMerkle, 'desde_bytes', wraps=ArbolMerkle.desde_bytes) as desde_bytes:
+            for codigo in ('P-000', 'P-004', 'P-008'):
+                guardado = ArbolMerkleInventario.objects.defer('hojas').get()
+                self.assertEqual(len(guardado.pruebas_producto(codigo)), 1)
+        self.assertEqual(desde_bytes.call_count, 1)
+    
+    def test_arbol_guardado_por_raiz(self):
+        """Test: El árbol se guarda una vez por raíz y da pruebas por código"""
+        from litethinking_domain.merkle import hash_hoja, verificar_prueba
+        from litethinking_domain.models import ArbolMerkleInventario
+        
+        filas = self._filas(6) + [('P-002', 'Producto 2', 40)]
+        ArbolMerkleInventario.desde_filas(filas).guardar()
+        ArbolMerkleInventario.desde_filas(reversed(filas)).guardar()
+        self.assertEqual(ArbolMerkleInventario.objects.count(), 1)
+        
+        guardado = ArbolMerkleInventario.objects.get()
+        self.assertEqual(guardado.total_hojas, 7)
+        pruebas = guardado.pruebas_producto('P-002')
+        self.assertEqual(len(pruebas), 2)
+        self.assertTrue(verificar_prueba(
+            hash_hoja('P-002', 'Producto 2', 40), pruebas[1]['prueba'], guardado.raiz
+        ))
+        self.assertEqual(guardado.pruebas_producto('NO-EXISTE'), [])
+
+
+class ResumenInventarioModelTest(TestCase):
+    """Tests para el mantenimiento incremental de ResumenInventario"""
+    
+    def setUp(self):
+        """Configuración inicial para cada test"""
+        self.empresa = Empresa.objects.create(
+            nit='900123456-1',
+            nombre='Empresa Test',
+            direccion='Calle 123',
+            telefono='3001234567'
+        )
+        self.producto = Producto.objects.create(
+            codigo='PROD-001',
+            nombre='Producto Test',
+            precios={'COP': 1000, 'USD': 0.25},
+            empresa=self.empresa
+        )
+    
+    def _resumen(self):
+        return ResumenInventario.objects.get(empresa=self.empresa)
+    
+    def _assert_igual_a_recalculo(self):
+        incremental = self._resumen()
+        recalculado = ResumenInventario.recalcular(self.empresa.nit)
+        for campo in ResumenInventario.CAMPOS_CONTADORES:
+            self.assertEqual(getattr(incremental, campo), getattr(recalculado, campo), campo)
+        self.assertEqual(incremental.valor_total, recalculado.valor_total)
+        self.assertEqual(incremental.valor_por_moneda, recalculado.valor_por_moneda)
+    
+    def test_crear_inventario_crea_resumen(self):
+        """Test: El primer inventario de la empresa crea el resumen"""
+        Inventario.objects.create(producto=self.producto, cantidad=5)
+        resumen = self._resumen()
+        self.assertEqual(resumen.total_productos, 1)
+        self.assertEqual(resumen.total_unidades, 5)
+        self.assertEqual(resumen.productos_stock_bajo, 1)
+        self.assertEqual(resumen.valor_total, 5000)
+        self.assertEqual(resumen.valor_por_moneda, {'COP': '5000', 'USD': '1.25'})
+    
+    def test_guardar_bloquea_la_fila_anterior(self):
+        """Test: save lee la fila anterior con select_for_update (deltas sin carreras)"""
+        from unittest.mock import patch
+        from django.db.models.query import QuerySet
+        
+        inventario = Inventario.objects.create(producto=self.producto, cantidad=5)
+        inventario.cantidad = 8
+        with patch.object(QuerySet, 'select_for_update', autospec=True,
+                          side_effect=QuerySet.select_for_update) as bloquear:
+            inventario.save()
+            self.producto.precios = {'COP': 2000}
+            self.producto.save()
+        
+        bloqueados = [llamada.args[0].model for llamada in bloquear.call_args_list]
+        self.assertIn(Inventario, bloqueados)
+        self.assertIn(Producto, bloqueados)
+        self.assertEqual(self._resumen().valor_total, 16000)
+    
+    def test_cambio_de_cantidad_mueve_de_bucket(self):
+        """Test: Actualizar la cantidad mueve el producto entre buckets"""
+        inventario = Inventario.objects.create(producto=self.producto, cantidad=0)
+        self.assertEqual(self._resumen().productos_sin_stock, 1)
+        
+        inventario.cantidad = 80
+        inventario.save()
+        resumen = self._resumen()
+        self.assertEqual(resumen.productos_sin_stock, 0)
+        self.assertEqual(resumen.productos_stock_alto, 1)
+        self.assertEqual(resumen.total_unidades, 80)
+        self._assert_igual_a_recalculo()
+    
+    def test_cambio_de_precio_actualiza_valor(self):
+        """Test: Cambiar los precios del producto recalcula el valor"""
+        Inventario.objects.create(producto=self.producto, cantidad=10)
+        self.producto.precios = {'COP': 3000}
+        self.producto.save()
+        resumen = self._resumen()
+        self.assertEqual(resumen.valor_total, 30000)
+        self.assertEqual(resumen.valor_por_moneda['COP'], '30000')
+        self.assertNotIn('USD', resumen.valor_por_moneda)
+        self._assert_igual_a_recalculo()
+    
+    def test_eliminar_inventario_descuenta(self):
+        """Test: Eliminar un inventario lo descuenta del resumen"""
+        otro = Producto.objects.create(
+            codigo='PROD-002', nombre='Otro', precios={'COP': 10}, empresa=self.empresa
+        )
+        Inventario.objects.create(producto=self.producto, cantidad=20)
+        inventario = Inventario.objects.create(producto=otro, cantidad=30)
+        inventario.delete()
+        resumen = self._resumen()
+        self.assertEqual(resumen.total_productos, 1)
+        self.assertEqual(resumen.total_unidades, 20)
+        self._assert_igual_a_recalculo()
+    
+    def test_eliminar_empresa_elimina_resumen(self):
+        """Test: Eliminar la empresa no deja resúmenes huérfanos"""
+        Inventario.objects.create(producto=self.producto, cantidad=20)
+        self.empresa.delete()
+        self.assertFalse(ResumenInventario.objects.exists())
+    
+    def test_obtener_calcula_resumen_faltante(self):
+        """Test: obtener() calcula el resumen si todavía no existe"""
+        Inventario.objects.create(producto=self.producto, cantidad=7)
+        ResumenInventario.objects.all().delete()
+        resumen = ResumenInventario.obtener(self.empresa.nit)
+        self.assertEqual(resumen.total_unidades, 7)
+        self.assertAlmostEqual(resumen.pct_stock_bajo, 100)
+    
+    def test_agregados_sql_igual_al_calculo_incremental(self):
+        """Test: La agregación en SQL coincide con la suma fila a fila"""
+        precios_y_cantidades = [
+            ({'USD': '2.5'}, 4),
+            ({'COP': None, 'USD': 3}, 12),
+            ({'COP': 'no-numerico'}, 60),
+            ({}, 0),
+            ({'EUR': 7, 'COP': '1500.50'}, 51),
+        ]
+        Inventario.objects.create(producto=self.producto, cantidad=10)
+        for indice, (precios, cantidad) in enumerate(precios_y_cantidades):
+            producto = Producto.objects.create(
+                codigo=f'AGG-{indice}', nombre=f'Agregado {indice}',
+                precios=precios, empresa=self.empresa,
+            )
+            Inventario.objects.create(producto=producto, cantidad=cantidad)
+        
+        self.assertEqual(ResumenInventario.monedas_en_uso(self.empresa.nit), ['COP', 'EUR', 'USD'])
+        with self.assertNumQueries(1):
+            agregados = ResumenInventario.agregados(self.empresa.nit, ['COP', 'EUR', 'USD'])
+        self.assertEqual(agregados['total_productos'], 6)
+        self.assertEqual(agregados['total_unidades'], 137)
+        self.assertEqual(agregados['productos_sin_stock'], 1)
+        self.assertEqual(agregados['productos_stock_alto'], 2)
+        self.assertEqual(agregados['valor_total'], Decimal('86535.5'))
+        self.assertEqual(agregados['valor_por_moneda'], {
+            'COP': '86525.5', 'EUR': '357', 'USD': '48.5',
+        })
+        self._assert_igual_a_recalculo()
@@ -8,3 +8,7 @@ class LitethinkingDomainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'litethinking_domain'
     verbose_name = 'Dominio - Lite Thinking'
+
+    def ready(self):
+        # Registra los receptores que mantienen ResumenInventario
+        from litethinking_domain import signals  # noqa: F401
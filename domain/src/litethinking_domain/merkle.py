@@ -0,0 +1,176 @@
+"""
+Árbol de Merkle del inventario
+==============================
+
+Certifica un inventario producto por producto. Cada fila es una hoja con
+su propio hash y la raíz resume todas las hojas, de modo que una prueba
+de inclusión (O(log n) hashes) demuestra que una línea forma parte del
+documento sin descargar ni volver a hashear el resto.
+
+Armar el árbol sí cuesta O(n) hashes; ``arbol_en_cache`` conserva los
+árboles ya armados por raíz para que pedir pruebas de varios productos
+del mismo envío no lo repita.
+
+Formato (verificable por terceros):
+
+- hoja: SHA-256 de ``0x00`` + JSON canónico de la fila
+  (``{"cantidad":..,"codigo":..,"nombre":..}``, llaves ordenadas, sin
+  espacios, UTF-8);
+- nodo: SHA-256 de ``0x01`` + hash izquierdo + hash derecho;
+- las hojas van ordenadas por (código, nombre, cantidad); un nodo sin
+  pareja sube tal cual al nivel siguiente;
+- la raíz de un inventario vacío es el SHA-256 de la cadena vacía.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+PREFIJO_HOJA = b'\x00'
+PREFIJO_NODO = b'\x01'
+TAMANIO_HASH = 32
+
+# Hojas de los árboles conservados por ``arbol_en_cache`` en cada proceso
+# (cada hoja ocupa unos 150 bytes contando los niveles internos)
+MAX_HOJAS_EN_CACHE = 200_000
+
+
+def datos_hoja(codigo, nombre, cantidad):
+    """JSON canónico de una fila de inventario."""
+    return json.dumps(
+        {'codigo': codigo, 'nombre': nombre, 'cantidad': cantidad},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def hash_hoja(codigo, nombre, cantidad):
+    """Hash (bytes) de la hoja de una fila de inventario."""
+    return hashlib.sha256(PREFIJO_HOJA + datos_hoja(codigo, nombre, cantidad)).digest()
+
+
+def hash_nodo(izquierdo, derecho):
+    return hashlib.sha256(PREFIJO_NODO + izquierdo + derecho).digest()
+
+
+def verificar_prueba(hoja, prueba, raiz):
+    """
+    Comprueba una prueba de inclusión.
+
+    Args:
+        hoja: hash de la hoja (bytes o hexadecimal)
+        prueba: lista de ``{'lado': 'izquierda'|'derecha', 'hash': hex}``
+            desde la hoja hacia la raíz
+        raiz: raíz esperada en hexadecimal
+    """
+    actual = bytes.fromhex(hoja) if isinstance(hoja, str) else hoja
+    for paso in prueba:
+        hermano = bytes.fromhex(paso['hash'])
+        if paso['lado'] == 'izquierda':
+            actual = hash_nodo(hermano, actual)
+        else:
+            actual = hash_nodo(actual, hermano)
+    return actual.hex() == raiz
+
+
+class ArbolMerkle:
+    """
+    Árbol de Merkle sobre una lista de hashes de hoja.
+
+    Args:
+        hojas: hashes (bytes) en el orden canónico
+    """
+
+    def __init__(self, hojas):
+        self.niveles = [list(hojas)]
+        while len(self.niveles[-1]) > 1:
+            nivel = self.niveles[-1]
+            superior = [
+                hash_nodo(nivel[i], nivel[i + 1]) if i + 1 < len(nivel) else nivel[i]
+                for i in range(0, len(nivel), 2)
+            ]
+            self.niveles.append(superior)
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """
+        Árbol de filas (código, nombre, cantidad), en cualquier orden.
+
+        Returns:
+            Tupla (árbol, filas en el orden de las hojas)
+        """
+        ordenadas = sorted(filas, key=lambda fila: (fila[0] or '', fila[1] or '', fila[2]))
+        return cls([hash_hoja(*fila) for fila in ordenadas]), ordenadas
+
+    @classmethod
+    def desde_bytes(cls, contenido):
+        """Árbol a partir de las hojas concatenadas (ver ``hojas_en_bytes``)."""
+        return cls([
+            contenido[i:i + TAMANIO_HASH] for i in range(0, len(contenido), TAMANIO_HASH)
+        ])
+
+    @property
+    def hojas(self):
+        return self.niveles[0]
+
+    def __len__(self):
+        return len(self.hojas)
+
+    def hojas_en_bytes(self):
+        """Hojas concatenadas, para guardarlas con el envío."""
+        return b''.join(self.hojas)
+
+    @property
+    def raiz(self):
+        """Raíz en hexadecimal."""
+        if not self.hojas:
+            return hashlib.sha256(b'').hexdigest()
+        return self.niveles[-1][0].hex()
+
+    def prueba(self, indice):
+        """
+        Prueba de inclusión de la hoja ``indice``.
+
+        Returns:
+            Lista de ``{'lado': 'izquierda'|'derecha', 'hash': hex}``
+        """
+        if not 0 <= indice < len(self.hojas):
+            raise IndexError('Hoja fuera del árbol de Merkle')
+        pasos = []
+        for nivel in self.niveles[:-1]:
+            hermano = indice ^ 1
+            if hermano < len(nivel):
+                pasos.append({
+                    'lado': 'izquierda' if hermano < indice else 'derecha',
+                    'hash': nivel[hermano].hex(),
+                })
+            indice //= 2
+        return pasos
+
+
+_arboles = OrderedDict()
+_arboles_lock = threading.Lock()
+
+
+def arbol_en_cache(raiz, crear):
+    """
+    Árbol de raíz ``raiz``, armado con ``crear()`` solo si no está en la
+    caché. La raíz identifica el contenido, así que un árbol guardado
+    nunca queda desactualizado. Se descartan los usados hace más tiempo
+    cuando se superan ``MAX_HOJAS_EN_CACHE`` hojas.
+    """
+    with _arboles_lock:
+        arbol = _arboles.get(raiz)
+        if arbol is not None:
+            _arboles.move_to_end(raiz)
+            return arbol
+
+    arbol = crear()
+    with _arboles_lock:
+        _arboles[raiz] = arbol
+        total = sum(len(a) for a in _arboles.values())
+        while total > MAX_HOJAS_EN_CACHE:
+            _, descartado = _arboles.popitem(last=False)
+            total -= len(descartado)
+    return arbol
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventario',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_inventario', serialize=False, to='litethinking_domain.empresa')),
+                ('total_productos', models.PositiveIntegerField(default=0)),
+                ('total_unidades', models.PositiveBigIntegerField(default=0)),
+                ('productos_sin_stock', models.PositiveIntegerField(default=0)),
+                ('productos_stock_bajo', models.PositiveIntegerField(default=0)),
+                ('productos_stock_medio', models.PositiveIntegerField(default=0)),
+                ('productos_stock_alto', models.PositiveIntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('valor_por_moneda', models.JSONField(default=dict, help_text='Valor del inventario por moneda: {"COP": "1000.00"}')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Inventario',
+                'verbose_name_plural': 'Resúmenes de Inventario',
+                'db_table': 'core_resumeninventario',
+            },
+        ),
+    ]
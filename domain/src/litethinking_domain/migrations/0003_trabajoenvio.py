@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0002_resumeninventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoEnvio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('individual', 'Envío individual')], default='individual', max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('parametros', models.JSONField(blank=True, default=dict, help_text='Opciones del envío (análisis IA, blockchain, ...)')),
+                ('adjunto_pdf', models.BinaryField(blank=True, help_text='PDF enviado por el cliente, si no se genera en el servidor', null=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, null=True)),
+                ('trabajador', models.CharField(blank=True, max_length=100)),
+                ('mensaje_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('envios', models.ManyToManyField(help_text='Registros de historial que atiende este trabajo', related_name='trabajos', to='litethinking_domain.historialenvio')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Envío',
+                'verbose_name_plural': 'Trabajos de Envío',
+                'db_table': 'core_trabajoenvio',
+                'ordering': ['disponible_desde', 'id'],
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='trabajo_cola_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0003_trabajoenvio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoenvio',
+            name='tipo',
+            field=models.CharField(choices=[('individual', 'Envío individual'), ('lote', 'Envío masivo')], default='individual', max_length=20),
+        ),
+    ]
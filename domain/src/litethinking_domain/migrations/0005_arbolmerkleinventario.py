@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0004_trabajoenvio_lote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArbolMerkleInventario',
+            fields=[
+                ('raiz', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('hojas', models.BinaryField(help_text='Hashes SHA-256 de las hojas, concatenados en orden')),
+                ('codigos', models.JSONField(default=list, help_text='Código de producto de cada hoja, en orden')),
+                ('total_hojas', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Árbol de Merkle de Inventario',
+                'verbose_name_plural': 'Árboles de Merkle de Inventario',
+                'db_table': 'core_arbolmerkleinventario',
+            },
+        ),
+        migrations.AddField(
+            model_name='historialenvio',
+            name='arbol_merkle',
+            field=models.ForeignKey(blank=True, help_text='Árbol de Merkle del inventario, para pruebas por producto', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='envios', to='litethinking_domain.arbolmerkleinventario'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:56
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0005_arbolmerkleinventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialenvio',
+            name='documento_prefijo',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Substr('documento_hash', 1, 16), output_field=models.CharField(max_length=16)),
+        ),
+        migrations.AlterField(
+            model_name='historialenvio',
+            name='contenido_hash',
+            field=models.CharField(db_index=True, help_text='Hash SHA-256 del contenido del inventario', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='historialenvio',
+            name='documento_hash',
+            field=models.CharField(db_index=True, help_text='Hash SHA-256 del PDF para verificación de autenticidad', max_length=64),
+        ),
+    ]
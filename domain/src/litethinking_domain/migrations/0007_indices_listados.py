@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0006_historialenvio_indices_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialenvio',
+            index=models.Index(fields=['-fecha_creacion'], name='historial_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialenvio',
+            index=models.Index(fields=['empresa', '-fecha_creacion'], name='historial_empresa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['-fecha_actualizacion', '-id'], name='inventario_recientes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['producto', '-fecha_actualizacion'], name='inventario_producto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre', 'id'], name='producto_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['empresa', 'nombre', 'id'], name='producto_empresa_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+"""
+Índice de búsqueda de texto completo sobre ``core_producto``.
+
+Depende del motor, así que se crea con SQL propio:
+
+- PostgreSQL: columna generada ``busqueda`` (``tsvector`` con pesos A/B/C
+  para código, nombre y características) con índice GIN, y un índice de
+  trigramas (``pg_trgm``) sobre ``codigo`` para buscar fragmentos de código.
+- SQLite: tabla FTS5 ``core_producto_busqueda`` de contenido externo,
+  mantenida por triggers sobre ``core_producto`` (también cubren
+  ``bulk_create``/``bulk_update`` y los upserts de la importación).
+
+En otros motores no hace nada y la API vuelve a la búsqueda con ``icontains``.
+
+Ojo en SQLite: si una migración posterior reconstruye ``core_producto``
+(cambios de columna), los triggers se pierden con la tabla anterior y hay
+que volver a crearlos con ``instalar``.
+"""
+from django.db import migrations
+
+SQL_POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    ALTER TABLE core_producto ADD COLUMN busqueda tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(codigo, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(nombre, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(caracteristicas, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX producto_busqueda_idx ON core_producto USING GIN (busqueda)',
+    'CREATE INDEX producto_codigo_trgm_idx ON core_producto USING GIN (codigo gin_trgm_ops)',
+]
+
+SQL_POSTGRESQL_REVERSA = [
+    'DROP INDEX IF EXISTS producto_codigo_trgm_idx',
+    'DROP INDEX IF EXISTS producto_busqueda_idx',
+    'ALTER TABLE core_producto DROP COLUMN IF EXISTS busqueda',
+]
+
+SQL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_producto_busqueda USING fts5(
+        codigo, nombre, caracteristicas,
+        content='core_producto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_producto_busqueda_ai AFTER INSERT ON core_producto BEGIN
+        INSERT INTO core_producto_busqueda(rowid, codigo, nombre, caracteristicas)
+        VALUES (new.id, new.codigo, new.nombre, new.caracteristicas);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_producto_busqueda_ad AFTER DELETE ON core_producto BEGIN
+        INSERT INTO core_producto_busqueda(core_producto_busqueda, rowid, codigo, nombre, caracteristicas)
+        VALUES ('delete', old.id, old.codigo, old.nombre, old.caracteristicas);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_producto_busqueda_au AFTER UPDATE ON core_producto BEGIN
+        INSERT INTO core_producto_busqueda(core_producto_busqueda, rowid, codigo, nombre, caracteristicas)
+        VALUES ('delete', old.id, old.codigo, old.nombre, old.caracteristicas);
+        INSERT INTO core_producto_busqueda(rowid, codigo, nombre, caracteristicas)
+        VALUES (new.id, new.codigo, new.nombre, new.caracteristicas);
+    END
+    """,
+    # Indexa los productos que ya existen
+    "INSERT INTO core_producto_busqueda(core_producto_busqueda) VALUES ('rebuild')",
+]
+
+SQL_SQLITE_REVERSA = [
+    'DROP TRIGGER IF EXISTS core_producto_busqueda_au',
+    'DROP TRIGGER IF EXISTS core_producto_busqueda_ad',
+    'DROP TRIGGER IF EXISTS core_producto_busqueda_ai',
+    'DROP TABLE IF EXISTS core_producto_busqueda',
+]
+
+
+def _ejecutar(schema_editor, por_motor):
+    for sentencia in por_motor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sentencia)
+
+
+def instalar(apps, schema_editor):
+    _ejecutar(schema_editor, {'postgresql': SQL_POSTGRESQL, 'sqlite': SQL_SQLITE})
+
+
+def desinstalar(apps, schema_editor):
+    _ejecutar(schema_editor, {'postgresql': SQL_POSTGRESQL_REVERSA, 'sqlite': SQL_SQLITE_REVERSA})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0007_indices_listados'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
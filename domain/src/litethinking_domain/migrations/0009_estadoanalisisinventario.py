@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0008_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoAnalisisInventario',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado_analisis', serialize=False, to='litethinking_domain.empresa')),
+                ('marca', models.DateTimeField(blank=True, null=True)),
+                ('filas', models.JSONField(blank=True, default=list, help_text='Filas sin stock y con stock bajo del último análisis')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado de Análisis de Inventario',
+                'verbose_name_plural': 'Estados de Análisis de Inventario',
+                'db_table': 'core_estadoanalisisinventario',
+            },
+        ),
+    ]
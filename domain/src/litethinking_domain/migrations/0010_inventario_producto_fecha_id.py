@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('litethinking_domain', '0009_estadoanalisisinventario'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventario',
+            name='inventario_producto_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['producto', '-fecha_actualizacion', '-id'], name='inventario_producto_fecha_idx'),
+        ),
+    ]
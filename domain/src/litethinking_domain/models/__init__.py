@@ -8,11 +8,19 @@ Esta es la única fuente de verdad para las entidades.
 from litethinking_domain.models.empresa import Empresa
 from litethinking_domain.models.producto import Producto
 from litethinking_domain.models.inventario import Inventario
+from litethinking_domain.models.arbol_merkle import ArbolMerkleInventario
+from litethinking_domain.models.estado_analisis import EstadoAnalisisInventario
 from litethinking_domain.models.historial_envio import HistorialEnvio
+from litethinking_domain.models.resumen_inventario import ResumenInventario
+from litethinking_domain.models.trabajo_envio import TrabajoEnvio
 
 __all__ = [
     'Empresa',
     'Producto',
     'Inventario',
+    'ArbolMerkleInventario',
+    'EstadoAnalisisInventario',
     'HistorialEnvio',
+    'ResumenInventario',
+    'TrabajoEnvio',
 ]
@@ -0,0 +1,92 @@
+"""
+Modelo ArbolMerkleInventario
+============================
+
+Hojas del árbol de Merkle (ver ``litethinking_domain.merkle``) del
+inventario certificado en un envío. La llave es la raíz, así que un mismo
+inventario enviado muchas veces (p. ej. en un lote) se guarda una sola vez
+y cada ``HistorialEnvio`` apunta a él.
+"""
+from bisect import bisect_left, bisect_right
+
+from django.db import models
+from litethinking_domain.merkle import ArbolMerkle, arbol_en_cache
+
+
+class ArbolMerkleInventario(models.Model):
+    """
+    Árbol de Merkle de un inventario.
+
+    Atributos:
+        raiz: Raíz del árbol en hexadecimal (llave primaria)
+        hojas: Hashes de las hojas concatenados (32 bytes cada uno)
+        codigos: Código de producto de cada hoja, en el mismo orden
+        total_hojas: Filas de inventario certificadas
+    """
+    raiz = models.CharField(max_length=64, primary_key=True)
+    hojas = models.BinaryField(
+        help_text='Hashes SHA-256 de las hojas, concatenados en orden'
+    )
+    codigos = models.JSONField(
+        default=list,
+        help_text='Código de producto de cada hoja, en orden'
+    )
+    total_hojas = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'core_arbolmerkleinventario'
+        verbose_name = 'Árbol de Merkle de Inventario'
+        verbose_name_plural = 'Árboles de Merkle de Inventario'
+
+    def __str__(self):
+        return f"Merkle {self.raiz[:16]} ({self.total_hojas} hojas)"
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """
+        Instancia (sin guardar) del árbol de filas (código, nombre, cantidad).
+        """
+        arbol, ordenadas = ArbolMerkle.desde_filas(filas)
+        return cls(
+            raiz=arbol.raiz,
+            hojas=arbol.hojas_en_bytes(),
+            codigos=[fila[0] or '' for fila in ordenadas],
+            total_hojas=len(arbol),
+        )
+
+    def guardar(self):
+        """Guarda el árbol si aún no existe uno con la misma raíz."""
+        type(self).objects.bulk_create([self], ignore_conflicts=True)
+
+    async def aguardar(self):
+        """Versión async de ``guardar``."""
+        await type(self).objects.abulk_create([self], ignore_conflicts=True)
+
+    def arbol(self):
+        """Árbol completo; se arma una vez por raíz (ver ``arbol_en_cache``)."""
+        return arbol_en_cache(
+            self.raiz, lambda: ArbolMerkle.desde_bytes(bytes(self.hojas))
+        )
+
+    def pruebas_producto(self, codigo):
+        """
+        Pruebas de inclusión de las filas de ``codigo`` (un producto puede
+        tener varias filas de inventario).
+
+        Returns:
+            Lista de dicts con ``indice``, ``hoja`` (hex) y ``prueba``
+        """
+        inicio = bisect_left(self.codigos, codigo)
+        fin = bisect_right(self.codigos, codigo)
+        if inicio == fin:
+            return []
+        arbol = self.arbol()
+        return [
+            {
+                'indice': indice,
+                'hoja': arbol.hojas[indice].hex(),
+                'prueba': arbol.prueba(indice),
+            }
+            for indice in range(inicio, fin)
+        ]
@@ -0,0 +1,56 @@
+"""
+Modelo EstadoAnalisisInventario
+===============================
+
+Estado guardado del análisis incremental del inventario de una empresa
+(ver ``api/analisis_incremental.py``). Vive en la base de datos para que
+todos los procesos de la API compartan el mismo estado.
+
+Los conteos, unidades y valor ya los mantiene ``ResumenInventario``; aquí
+solo se guardan las filas que lista el análisis (sin stock y stock bajo)
+y la marca de tiempo hasta la que se aplicaron los cambios.
+"""
+from django.db import models
+from litethinking_domain.models.empresa import Empresa
+
+
+class EstadoAnalisisInventario(models.Model):
+    """
+    Estado del análisis incremental de una empresa.
+
+    Atributos:
+        empresa: Empresa analizada (llave primaria)
+        marca: Hasta cuándo se aplicaron los cambios del inventario
+            (None si hay que releer las filas listadas)
+        filas: Filas listadas, cada una
+            ``[inventario_id, fecha_actualizacion, codigo, nombre, cantidad, precio]``
+    """
+    empresa = models.OneToOneField(
+        Empresa,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estado_analisis'
+    )
+    marca = models.DateTimeField(null=True, blank=True)
+    filas = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Filas sin stock y con stock bajo del último análisis'
+    )
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'core_estadoanalisisinventario'
+        verbose_name = 'Estado de Análisis de Inventario'
+        verbose_name_plural = 'Estados de Análisis de Inventario'
+
+    def __str__(self):
+        return f"Estado de análisis {self.empresa_id}: {len(self.filas)} filas"
+
+    @classmethod
+    def invalidar(cls, *empresa_ids):
+        """
+        Obliga a releer las filas listadas en el próximo análisis. Para
+        cambios que no tocan ``Inventario.fecha_actualizacion``.
+        """
+        cls.objects.filter(empresa_id__in=empresa_ids).update(marca=None)
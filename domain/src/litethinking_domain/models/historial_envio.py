@@ -3,14 +3,20 @@ Modelo HistorialEnvio
 =====================
 
 Representa el registro de envío de un reporte de inventario por correo.
-Incluye certificación blockchain con hash SHA-256.
+Incluye certificación blockchain con hash SHA-256 y, por producto, con
+un árbol de Merkle (``ArbolMerkleInventario``).
 """
 import hashlib
 import json
 from django.db import models
+from django.db.models.functions import Substr
 from django.contrib.auth.models import User
+from litethinking_domain.models.arbol_merkle import ArbolMerkleInventario
 from litethinking_domain.models.empresa import Empresa
 
+# Caracteres del hash del PDF que van en la URL de verificación
+LARGO_PREFIJO = 16
+
 
 class HistorialEnvio(models.Model):
     """
@@ -52,12 +58,30 @@ class HistorialEnvio(models.Model):
     # Certificación Blockchain
     documento_hash = models.CharField(
         max_length=64,
+        db_index=True,
         help_text='Hash SHA-256 del PDF para verificación de autenticidad'
     )
     contenido_hash = models.CharField(
         max_length=64,
+        db_index=True,
         help_text='Hash SHA-256 del contenido del inventario'
     )
+    # Prefijo de ``verificacion_url``; columna generada por la base de datos
+    # para que también la mantengan los ``update()`` masivos
+    documento_prefijo = models.GeneratedField(
+        expression=Substr('documento_hash', 1, LARGO_PREFIJO),
+        output_field=models.CharField(max_length=LARGO_PREFIJO),
+        db_persist=True,
+        db_index=True,
+    )
+    arbol_merkle = models.ForeignKey(
+        ArbolMerkleInventario,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='envios',
+        help_text='Árbol de Merkle del inventario, para pruebas por producto'
+    )
     
     # Metadatos
     total_productos = models.PositiveIntegerField(default=0)
@@ -91,6 +115,11 @@ class HistorialEnvio(models.Model):
         verbose_name = 'Historial de Envío'
         verbose_name_plural = 'Historial de Envíos'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Historial más reciente primero, global y por empresa
+            models.Index(fields=['-fecha_creacion'], name='historial_fecha_idx'),
+            models.Index(fields=['empresa', '-fecha_creacion'], name='historial_empresa_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.empresa.nombre} → {self.email_destino} ({self.estado})"
@@ -98,7 +127,7 @@ class HistorialEnvio(models.Model):
     @property
     def verificacion_url(self):
         """URL para verificar autenticidad del documento"""
-        return f"/verificar/{self.documento_hash[:16]}"
+        return f"/verificar/{self.documento_hash[:LARGO_PREFIJO]}"
     
     @classmethod
     def generar_hash(cls, contenido: bytes) -> str:
@@ -120,6 +149,14 @@ class HistorialEnvio(models.Model):
         # Ordenar para consistencia
         datos.sort(key=lambda x: x['codigo'])
         
-        # Generar hash
-        contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False)
-        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+        # Generar hash por fragmentos, sin armar el JSON completo en memoria
+        digest = hashlib.sha256()
+        codificador = json.JSONEncoder(sort_keys=True, ensure_ascii=False)
+        for fragmento in codificador.iterencode(datos):
+            digest.update(fragmento.encode('utf-8'))
+        return digest.hexdigest()
+    
+    @property
+    def merkle_raiz(self):
+        """Raíz del árbol de Merkle del inventario certificado ('' si no hay)."""
+        return self.arbol_merkle_id or ''
@@ -4,7 +4,7 @@ Modelo Inventario
 
 Representa el stock de un producto en el inventario.
 """
-from django.db import models
+from django.db import models, transaction
 from litethinking_domain.models.producto import Producto
 
 
@@ -37,9 +37,24 @@ class Inventario(models.Model):
         verbose_name = 'Inventario'
         verbose_name_plural = 'Inventarios'
         ordering = ['-fecha_actualizacion']
+        indexes = [
+            # Listado paginado por cursor (más recientes primero)
+            models.Index(fields=['-fecha_actualizacion', '-id'], name='inventario_recientes_idx'),
+            # Listado filtrado por producto (?producto=), mismo orden que el cursor
+            models.Index(
+                fields=['producto', '-fecha_actualizacion', '-id'],
+                name='inventario_producto_fecha_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.producto.nombre} - {self.cantidad} unidades"
+
+    def save(self, *args, **kwargs):
+        # pre_save bloquea la fila anterior (ver litethinking_domain.signals):
+        # el bloqueo dura hasta que post_save aplica el delta al resumen
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
     
     @property
     def esta_agotado(self):
@@ -5,7 +5,9 @@ Modelo Producto
 Representa un producto del catálogo de una empresa.
 Incluye soporte para precios en múltiples monedas.
 """
-from django.db import models
+import json
+
+from django.db import models, transaction
 from litethinking_domain.models.empresa import Empresa
 
 
@@ -20,6 +22,9 @@ class Producto(models.Model):
         precios: Diccionario de precios por moneda (JSONField)
         empresa: Empresa propietaria del producto
     """
+    # Orden de preferencia al elegir el precio de referencia del producto
+    MONEDAS_REFERENCIA = ('COP', 'USD')
+
     codigo = models.CharField(
         max_length=50,
         unique=True,
@@ -49,10 +54,44 @@ class Producto(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['nombre']
+        indexes = [
+            # Listado paginado por cursor, global y por empresa
+            models.Index(fields=['nombre', 'id'], name='producto_nombre_idx'),
+            models.Index(fields=['empresa', 'nombre', 'id'], name='producto_empresa_nombre_idx'),
+        ]
+        # El índice de texto completo (FTS5 / tsvector + GIN) depende del
+        # motor y se crea con SQL en la migración 0008_busqueda_productos
 
     def __str__(self):
         return f"{self.nombre} ({self.codigo})"
+
+    def save(self, *args, **kwargs):
+        # Igual que Inventario.save: la fila anterior queda bloqueada hasta
+        # que post_save actualiza el resumen
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
     
     def obtener_precio(self, moneda: str = 'COP'):
         """Obtiene el precio en una moneda específica."""
         return self.precios.get(moneda.upper())
+
+    @classmethod
+    def precio_referencia(cls, precios):
+        """
+        Obtiene el precio de referencia (COP, o USD si no hay COP).
+        Acepta el dict de precios o su representación JSON; retorna 0
+        si no hay un precio válido.
+        """
+        if not precios:
+            return 0
+        if not isinstance(precios, dict):
+            try:
+                precios = json.loads(precios)
+            except (TypeError, ValueError):
+                return 0
+            if not isinstance(precios, dict):
+                return 0
+        for moneda in cls.MONEDAS_REFERENCIA:
+            if moneda in precios:
+                return precios[moneda] or 0
+        return 0
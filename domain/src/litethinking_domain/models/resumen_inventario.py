@@ -0,0 +1,347 @@
+"""
+Modelo ResumenInventario
+========================
+
+Agregados precalculados del inventario de una empresa.
+Se mantienen al día de forma incremental en cada escritura de
+Inventario o Producto (ver ``litethinking_domain.signals``), de modo que
+los tableros y el análisis leen una sola fila en lugar de recorrer todo
+el inventario.
+
+``ResumenInventario.agregados`` calcula los mismos valores con una sola
+consulta de agregación (conteos por bucket, suma de unidades y valor por
+moneda extrayendo las llaves de ``Producto.precios``), en PostgreSQL y en
+SQLite, sin traer las filas a Python.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import Regex
+from litethinking_domain.models.empresa import Empresa
+from litethinking_domain.models.estado_analisis import EstadoAnalisisInventario
+from litethinking_domain.models.producto import Producto
+
+
+def _decimal(valor):
+    """Convierte un precio (int, float, str) a Decimal sin errores de float."""
+    try:
+        return Decimal(str(valor or 0))
+    except (ArithmeticError, ValueError):
+        return Decimal('0')
+
+
+# Precios que se pueden convertir a número en SQL sin error
+PATRON_PRECIO_NUMERICO = r'^-?[0-9]+(\.[0-9]+)?$'
+DECIMAL_AGREGADO = DecimalField(max_digits=30, decimal_places=6)
+
+
+def _texto_decimal(valor):
+    """Decimal sin ceros de relleno, como los acumula ``_sumar`` ('5000.00' -> '5000')."""
+    valor = valor.normalize()
+    if valor.as_tuple().exponent > 0:
+        valor = valor.quantize(1)
+    return str(valor)
+
+
+def _precio_en(moneda):
+    """
+    Expresión con el precio del producto en ``moneda`` (0 si falta o no es
+    numérico), leído de ``producto__precios``.
+    """
+    texto = KeyTextTransform(moneda, 'producto__precios')
+    return Case(
+        When(Regex(texto, PATRON_PRECIO_NUMERICO), then=Cast(texto, DECIMAL_AGREGADO)),
+        default=Value(Decimal('0')),
+        output_field=DECIMAL_AGREGADO,
+    )
+
+
+def _valor(precio):
+    return Coalesce(
+        Sum(F('cantidad') * precio, output_field=DECIMAL_AGREGADO),
+        Value(Decimal('0')),
+        output_field=DECIMAL_AGREGADO,
+    )
+
+
+class ResumenInventario(models.Model):
+    """
+    Resumen agregado del inventario de una empresa.
+
+    Atributos:
+        empresa: Empresa resumida (llave primaria)
+        total_productos: Filas de inventario
+        total_unidades: Suma de cantidades
+        productos_sin_stock: Filas con cantidad 0
+        productos_stock_bajo: Filas con cantidad entre 1 y 10
+        productos_stock_medio: Filas con cantidad entre 11 y 50
+        productos_stock_alto: Filas con cantidad mayor a 50
+        valor_total: Valor con el precio de referencia (COP o USD)
+        valor_por_moneda: Valor por cada moneda de ``Producto.precios``
+    """
+    UMBRAL_STOCK_BAJO = 10
+    UMBRAL_STOCK_MEDIO = 50
+
+    CAMPOS_CONTADORES = (
+        'total_productos',
+        'total_unidades',
+        'productos_sin_stock',
+        'productos_stock_bajo',
+        'productos_stock_medio',
+        'productos_stock_alto',
+    )
+
+    empresa = models.OneToOneField(
+        Empresa,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resumen_inventario'
+    )
+    total_productos = models.PositiveIntegerField(default=0)
+    total_unidades = models.PositiveBigIntegerField(default=0)
+    productos_sin_stock = models.PositiveIntegerField(default=0)
+    productos_stock_bajo = models.PositiveIntegerField(default=0)
+    productos_stock_medio = models.PositiveIntegerField(default=0)
+    productos_stock_alto = models.PositiveIntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    valor_por_moneda = models.JSONField(
+        default=dict,
+        help_text='Valor del inventario por moneda: {"COP": "1000.00"}'
+    )
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'core_resumeninventario'
+        verbose_name = 'Resumen de Inventario'
+        verbose_name_plural = 'Resúmenes de Inventario'
+
+    def __str__(self):
+        return f"Resumen {self.empresa_id}: {self.total_productos} productos"
+
+    # ───────────────────────────────────────────────────────────────
+    # Contribución de una fila de inventario
+    # ───────────────────────────────────────────────────────────────
+
+    @classmethod
+    def campo_bucket(cls, cantidad):
+        """Nombre del contador de stock al que pertenece una cantidad."""
+        if cantidad == 0:
+            return 'productos_sin_stock'
+        if cantidad <= cls.UMBRAL_STOCK_BAJO:
+            return 'productos_stock_bajo'
+        if cantidad <= cls.UMBRAL_STOCK_MEDIO:
+            return 'productos_stock_medio'
+        return 'productos_stock_alto'
+
+    @classmethod
+    def contribucion(cls, cantidad, precios, signo=1):
+        """
+        Aporte de una fila de inventario a los agregados.
+
+        Returns:
+            Tupla (contadores, valor_referencia, valores_por_moneda)
+        """
+        contadores = dict.fromkeys(cls.CAMPOS_CONTADORES, 0)
+        contadores['total_productos'] = signo
+        contadores['total_unidades'] = signo * cantidad
+        contadores[cls.campo_bucket(cantidad)] = signo
+
+        valor = signo * cantidad * _decimal(Producto.precio_referencia(precios))
+        monedas = {}
+        if isinstance(precios, dict):
+            for moneda, precio in precios.items():
+                monedas[moneda] = signo * cantidad * _decimal(precio)
+        return contadores, valor, monedas
+
+    # ───────────────────────────────────────────────────────────────
+    # Mantenimiento
+    # ───────────────────────────────────────────────────────────────
+
+    def _sumar(self, contadores, valor, monedas):
+        for campo, delta in contadores.items():
+            setattr(self, campo, getattr(self, campo) + delta)
+        self.valor_total = _decimal(self.valor_total) + valor
+        por_moneda = dict(self.valor_por_moneda or {})
+        for moneda, delta in monedas.items():
+            total = _decimal(por_moneda.get(moneda)) + delta
+            if total:
+                por_moneda[moneda] = _texto_decimal(total)
+            else:
+                por_moneda.pop(moneda, None)
+        self.valor_por_moneda = por_moneda
+
+    @classmethod
+    def aplicar_cambios(cls, empresa_id, cambios, crear=True):
+        """
+        Aplica aportes incrementales al resumen de una empresa.
+
+        Args:
+            empresa_id: NIT de la empresa
+            cambios: lista de (cantidad, precios, signo) a sumar (+1) o restar (-1)
+            crear: si la empresa aún no tiene resumen, recalcularlo completo
+                desde la base de datos (que ya refleja la escritura en curso)
+        """
+        if not cambios:
+            return
+        with transaction.atomic():
+            resumen = (
+                cls.objects.select_for_update()
+                .filter(empresa_id=empresa_id)
+                .first()
+            )
+            if resumen is None:
+                if crear:
+                    cls.recalcular(empresa_id)
+                return
+            for cantidad, precios, signo in cambios:
+                resumen._sumar(*cls.contribucion(cantidad, precios, signo))
+            resumen.save()
+
+    @classmethod
+    def recalcular(cls, empresa_id):
+        """
+        Recalcula desde cero el resumen de una empresa. Tras una operación
+        masiva, también invalida el estado del análisis incremental.
+        """
+        agregados = cls.agregados(empresa_id, cls.monedas_en_uso(empresa_id))
+        resumen = cls(empresa_id=empresa_id, **agregados)
+        resumen.save()
+        EstadoAnalisisInventario.invalidar(empresa_id)
+        return resumen
+
+    # ───────────────────────────────────────────────────────────────
+    # Agregación en la base de datos
+    # ───────────────────────────────────────────────────────────────
+
+    @classmethod
+    def agregados(cls, empresa_id, monedas=(), inventarios=None):
+        """
+        Calcula los agregados del inventario de una empresa en una sola
+        consulta.
+
+        Args:
+            empresa_id: NIT de la empresa
+            monedas: monedas de ``valor_por_moneda`` (ver ``monedas_en_uso``)
+            inventarios: queryset de Inventario a agregar (por defecto,
+                todo el de la empresa)
+
+        Returns:
+            dict con los campos de ``CAMPOS_CONTADORES``, ``valor_total``
+            y ``valor_por_moneda``
+        """
+        from litethinking_domain.models.inventario import Inventario
+
+        if inventarios is None:
+            inventarios = Inventario.objects.filter(producto__empresa_id=empresa_id)
+
+        # Precio de referencia: la primera moneda de MONEDAS_REFERENCIA
+        # presente en precios (igual que Producto.precio_referencia)
+        referencia = Case(
+            *[
+                When(Q(producto__precios__has_key=moneda), then=_precio_en(moneda))
+                for moneda in Producto.MONEDAS_REFERENCIA
+            ],
+            default=Value(Decimal('0')),
+            output_field=DECIMAL_AGREGADO,
+        )
+        expresiones = {
+            'total_productos': Count('pk'),
+            'total_unidades': Coalesce(Sum('cantidad'), 0),
+            'productos_sin_stock': Count('pk', filter=Q(cantidad=0)),
+            'productos_stock_bajo': Count(
+                'pk', filter=Q(cantidad__gt=0, cantidad__lte=cls.UMBRAL_STOCK_BAJO)
+            ),
+            'productos_stock_medio': Count(
+                'pk', filter=Q(cantidad__gt=cls.UMBRAL_STOCK_BAJO, cantidad__lte=cls.UMBRAL_STOCK_MEDIO)
+            ),
+            'productos_stock_alto': Count('pk', filter=Q(cantidad__gt=cls.UMBRAL_STOCK_MEDIO)),
+            'valor_total': _valor(referencia),
+        }
+        for indice, moneda in enumerate(monedas):
+            expresiones[f'valor_moneda_{indice}'] = _valor(_precio_en(moneda))
+
+        # order_by() quita el orden por defecto del modelo de la consulta
+        fila = inventarios.order_by().aggregate(**expresiones)
+
+        valor_por_moneda = {}
+        for indice, moneda in enumerate(monedas):
+            valor = fila.pop(f'valor_moneda_{indice}')
+            if valor:
+                valor_por_moneda[moneda] = _texto_decimal(valor)
+        fila['valor_por_moneda'] = valor_por_moneda
+        return fila
+
+    @classmethod
+    def monedas_en_uso(cls, empresa_id):
+        """Monedas que aparecen en ``precios`` de los productos de la empresa."""
+        tabla = connection.ops.quote_name(Producto._meta.db_table)
+        columna_empresa = connection.ops.quote_name(Producto._meta.get_field('empresa').column)
+        if connection.vendor == 'postgresql':
+            sql = (
+                f"SELECT DISTINCT jsonb_object_keys(precios) FROM {tabla} "
+                f"WHERE {columna_empresa} = %s AND jsonb_typeof(precios) = 'object'"
+            )
+        elif connection.vendor == 'sqlite':
+            sql = (
+                f"SELECT DISTINCT llave.key FROM {tabla}, json_each({tabla}.precios) AS llave "
+                f"WHERE {tabla}.{columna_empresa} = %s AND json_type({tabla}.precios) = 'object'"
+            )
+        else:
+            monedas = set()
+            for precios in Producto.objects.filter(empresa_id=empresa_id).values_list('precios', flat=True):
+                if isinstance(precios, dict):
+                    monedas.update(precios)
+            return sorted(monedas)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [empresa_id])
+            return sorted(moneda for (moneda,) in cursor.fetchall())
+
+    # ───────────────────────────────────────────────────────────────
+    # Lectura
+    # ───────────────────────────────────────────────────────────────
+
+    @classmethod
+    def obtener(cls, empresa_id):
+        """
+        Retorna el resumen de la empresa, calculándolo la primera vez
+        (p. ej. para empresas anteriores a la creación de esta tabla).
+        """
+        resumen = cls.objects.select_related('empresa').filter(empresa_id=empresa_id).first()
+        if resumen is None:
+            resumen = cls.recalcular(empresa_id)
+        return resumen
+
+    @classmethod
+    async def aobtener(cls, empresa_id):
+        """Versión async de ``obtener`` (ORM async)."""
+        resumen = await cls.objects.select_related('empresa').filter(empresa_id=empresa_id).afirst()
+        if resumen is None:
+            resumen = await sync_to_async(cls.recalcular)(empresa_id)
+        return resumen
+
+    @property
+    def productos_stock_saludable(self):
+        return self.productos_stock_medio + self.productos_stock_alto
+
+    def _porcentaje(self, valor):
+        if not self.total_productos:
+            return 0
+        return (valor / self.total_productos) * 100
+
+    @property
+    def pct_sin_stock(self):
+        return self._porcentaje(self.productos_sin_stock)
+
+    @property
+    def pct_stock_bajo(self):
+        return self._porcentaje(self.productos_stock_bajo)
+
+    @property
+    def pct_stock_saludable(self):
+        if not self.total_productos:
+            return 100
+        return self._porcentaje(self.productos_stock_saludable)
@@ -0,0 +1,143 @@
+"""
+Modelo TrabajoEnvio
+===================
+
+Cola persistente (en base de datos) de los envíos de reportes por correo.
+La API crea el trabajo y responde de inmediato; un proceso aparte
+(``manage.py procesar_envios``) toma los trabajos, genera el PDF y hace
+la entrega.
+"""
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from litethinking_domain.models.historial_envio import HistorialEnvio
+
+
+class TrabajoEnvio(models.Model):
+    """
+    Trabajo pendiente de la cola de envíos.
+
+    Un trabajo se "toma" con una actualización condicional (solo una
+    instancia del worker lo consigue) y queda bloqueado durante
+    ``DURACION_BLOQUEO``; si el worker muere, otro lo retoma al vencer.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    TIPO_CHOICES = [
+        ('individual', 'Envío individual'),
+        ('lote', 'Envío masivo'),
+    ]
+
+    DURACION_BLOQUEO = timedelta(minutes=10)
+    ESPERA_BASE_REINTENTO = timedelta(seconds=30)
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='individual')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    envios = models.ManyToManyField(
+        HistorialEnvio,
+        related_name='trabajos',
+        help_text='Registros de historial que atiende este trabajo'
+    )
+    parametros = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Opciones del envío (análisis IA, blockchain, ...)'
+    )
+    adjunto_pdf = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='PDF enviado por el cliente, si no se genera en el servidor'
+    )
+
+    # Control de reintentos y bloqueo
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    mensaje_error = models.TextField(blank=True)
+
+    # Timestamps
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_trabajoenvio'
+        verbose_name = 'Trabajo de Envío'
+        verbose_name_plural = 'Trabajos de Envío'
+        ordering = ['disponible_desde', 'id']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde'], name='trabajo_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Trabajo {self.pk} ({self.tipo}, {self.estado})"
+
+    @classmethod
+    def disponibles(cls, ahora=None):
+        """Trabajos pendientes listos, o en proceso con el bloqueo vencido."""
+        ahora = ahora or timezone.now()
+        return cls.objects.filter(
+            Q(estado='pendiente', disponible_desde__lte=ahora)
+            | Q(estado='procesando', bloqueado_hasta__lt=ahora)
+        )
+
+    @classmethod
+    def tomar_siguiente(cls, trabajador):
+        """
+        Reserva el siguiente trabajo disponible para ``trabajador``.
+
+        Returns:
+            TrabajoEnvio reservado, o None si la cola está vacía
+        """
+        ahora = timezone.now()
+        candidatos = cls.disponibles(ahora).values_list('pk', flat=True)[:10]
+        for pk in candidatos:
+            # La actualización condicional garantiza que un solo worker lo tome
+            tomados = cls.disponibles(ahora).filter(pk=pk).update(
+                estado='procesando',
+                trabajador=trabajador,
+                bloqueado_hasta=ahora + cls.DURACION_BLOQUEO,
+                fecha_inicio=ahora,
+                intentos=models.F('intentos') + 1,
+            )
+            if tomados:
+                return cls.objects.get(pk=pk)
+        return None
+
+    def marcar_completado(self):
+        self.estado = 'completado'
+        self.bloqueado_hasta = None
+        self.mensaje_error = ''
+        self.fecha_fin = timezone.now()
+        self.save(update_fields=['estado', 'bloqueado_hasta', 'mensaje_error', 'fecha_fin'])
+
+    def registrar_fallo(self, error):
+        """
+        Registra un intento fallido. Vuelve a la cola con espera exponencial
+        mientras queden intentos.
+
+        Returns:
+            True si el trabajo se reintentará, False si quedó fallido
+        """
+        self.mensaje_error = str(error)
+        self.bloqueado_hasta = None
+        reintentar = self.intentos < self.max_intentos
+        if reintentar:
+            self.estado = 'pendiente'
+            self.disponible_desde = timezone.now() + self.ESPERA_BASE_REINTENTO * (2 ** (self.intentos - 1))
+        else:
+            self.estado = 'fallido'
+            self.fecha_fin = timezone.now()
+        self.save(update_fields=[
+            'estado', 'mensaje_error', 'bloqueado_hasta', 'disponible_desde', 'fecha_fin',
+        ])
+        return reintentar
@@ -0,0 +1,142 @@
+"""
+Señales del Dominio
+===================
+
+Mantienen ``ResumenInventario`` al día en cada escritura de Inventario o
+Producto. Antes de guardar se lee (y bloquea) el estado anterior de la
+fila y después se aplica la diferencia (restar el aporte viejo, sumar el
+nuevo), todo en la transacción que abre ``save``.
+
+Las operaciones masivas (``QuerySet.update``, ``bulk_create``,
+``bulk_update``) no disparan señales: quien las use debe llamar a
+``ResumenInventario.recalcular`` para las empresas afectadas.
+
+Los cambios de Producto (precio, empresa, código o nombre) no tocan la
+fecha de sus filas de inventario, así que además invalidan el estado del
+análisis incremental (``EstadoAnalisisInventario``).
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from litethinking_domain.models import (
+    EstadoAnalisisInventario,
+    Inventario,
+    Producto,
+    ResumenInventario,
+)
+
+
+def _bloquear(consulta):
+    """
+    Bloquea la fila que se va a guardar hasta el final de la transacción:
+    dos guardados concurrentes de la misma fila no calculan su delta desde
+    el mismo estado anterior. ``Inventario.save`` y ``Producto.save`` abren
+    la transacción; fuera de una (``save_base`` directo) no se bloquea.
+    """
+    if not transaction.get_connection(consulta.db).in_atomic_block:
+        return consulta
+    return consulta.select_for_update(of=('self',))
+
+
+@receiver(pre_save, sender=Inventario)
+def capturar_inventario_anterior(sender, instance, raw=False, **kwargs):
+    instance._resumen_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._resumen_anterior = (
+        _bloquear(Inventario.objects.filter(pk=instance.pk))
+        .values_list('cantidad', 'producto__precios', 'producto__empresa_id')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Inventario)
+def actualizar_resumen_inventario(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    precios, empresa_id = (
+        Producto.objects
+        .filter(pk=instance.producto_id)
+        .values_list('precios', 'empresa_id')
+        .get()
+    )
+    anterior = getattr(instance, '_resumen_anterior', None)
+    instance._resumen_anterior = None
+
+    if anterior is None:
+        ResumenInventario.aplicar_cambios(empresa_id, [(instance.cantidad, precios, 1)])
+        return
+
+    cantidad_ant, precios_ant, empresa_ant = anterior
+    if (cantidad_ant, precios_ant, empresa_ant) == (instance.cantidad, precios, empresa_id):
+        return
+    if empresa_ant == empresa_id:
+        ResumenInventario.aplicar_cambios(empresa_id, [
+            (cantidad_ant, precios_ant, -1),
+            (instance.cantidad, precios, 1),
+        ])
+    else:
+        ResumenInventario.aplicar_cambios(empresa_ant, [(cantidad_ant, precios_ant, -1)])
+        ResumenInventario.aplicar_cambios(empresa_id, [(instance.cantidad, precios, 1)])
+
+
+@receiver(post_delete, sender=Inventario)
+def descontar_inventario_eliminado(sender, instance, **kwargs):
+    producto = (
+        Producto.objects
+        .filter(pk=instance.producto_id)
+        .values_list('precios', 'empresa_id')
+        .first()
+    )
+    if producto is None:
+        return
+    precios, empresa_id = producto
+    # Sin crear: durante el borrado en cascada de la empresa el resumen
+    # puede haberse eliminado ya
+    ResumenInventario.aplicar_cambios(
+        empresa_id, [(instance.cantidad, precios, -1)], crear=False
+    )
+
+
+@receiver(pre_save, sender=Producto)
+def capturar_producto_anterior(sender, instance, raw=False, **kwargs):
+    instance._resumen_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._resumen_anterior = (
+        _bloquear(Producto.objects.filter(pk=instance.pk))
+        .values_list('precios', 'empresa_id', 'codigo', 'nombre')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Producto)
+def actualizar_resumen_producto(sender, instance, created, raw=False, **kwargs):
+    anterior = getattr(instance, '_resumen_anterior', None)
+    instance._resumen_anterior = None
+    if raw or anterior is None:
+        return
+
+    precios_ant, empresa_ant, codigo_ant, nombre_ant = anterior
+    actual = (instance.precios, instance.empresa_id, instance.codigo, instance.nombre)
+    if anterior == actual:
+        return
+    EstadoAnalisisInventario.invalidar(empresa_ant, instance.empresa_id)
+    if (precios_ant, empresa_ant) == actual[:2]:
+        return
+
+    cantidades = list(
+        Inventario.objects
+        .filter(producto_id=instance.pk)
+        .values_list('cantidad', flat=True)
+    )
+    if not cantidades:
+        return
+    salida = [(cantidad, precios_ant, -1) for cantidad in cantidades]
+    entrada = [(cantidad, instance.precios, 1) for cantidad in cantidades]
+    if empresa_ant == instance.empresa_id:
+        ResumenInventario.aplicar_cambios(empresa_ant, salida + entrada)
+    else:
+        ResumenInventario.aplicar_cambios(empresa_ant, salida)
+        ResumenInventario.aplicar_cambios(instance.empresa_id, entrada)
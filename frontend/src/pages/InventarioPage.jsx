@@ -307,7 +307,7 @@ const InventarioPage = () => {
       
       if (resultado.success) {
         setEmailResponse(resultado)
-        setSuccessMessage(`📧 Correo enviado exitosamente a ${emailDestino}${resultado.hash_documento ? ' (Certificado Blockchain)' : ''}${resultado.alertas_count > 0 ? ` - ${resultado.alertas_count} alertas IA` : ''}`)
+        setSuccessMessage(`📧 ${resultado.message || `Envío a ${emailDestino} en cola de procesamiento`}`)
         setIsEmailModalOpen(false)
         setEmailDestino('')
       } else {